@@ -1,39 +1,106 @@
 from typing import Dict, List
 import requests
-from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError
+from concurrent.futures import TimeoutError
 import time
+from utils.async_executor import PRIORITY_STATE, PRIORITY_TRADE, PRIORITY_UI
+from utils.rate_limit import RateGovernor, METHOD_GROUPS
+from utils.resilience import (
+    AmbiguousOrderError,
+    CircuitBreaker,
+    InvalidRequestError,
+    TransientError,
+    classify,
+    is_quiet,
+    retry_call,
+    backoff_delay,
+)
+from config import (
+    ORDER_TIMEOUT,
+    ORDER_PLACE_ATTEMPTS,
+    ORDER_PLACE_DEADLINE,
+    ORDER_RETRY_DELAY,
+    ORDER_BATCH_LIMIT,
+    BYBIT_RATE_LIMITS,
+    BYBIT_RECV_WINDOW,
+)
+
+# retCode Bybit: ордер с таким orderLinkId уже существует
+ERR_DUPLICATE_LINK_ID = 110072
+# retCode Bybit: timestamp запроса вне recv_window
+ERR_TIMESTAMP = 10002
+
+
+class _NullLogger:
+    """Логгер клиента без логгера приложения (проверка ключей в окне настроек)"""
+
+    def _skip(self, message: str, data: dict | None = None):
+        pass
+
+    debug = info = warning = error = _skip
 
 
 class BybitAPI:
-    def __init__(self, api_key: str, api_secret: str):
+    def __init__(self, api_key: str, api_secret: str, executor=None, clock=None, logger=None):
         self.api_key = api_key
         self.api_secret = api_secret
+        # Выставление ордеров пишет в лог приложения: у движока без окна нет консоли
+        self.logger = logger or _NullLogger()
         self.session = None
+        # Сессия только для выставления ордеров: короткий таймаут, одна попытка
+        self.order_session = None
         self.last_error = None
-        self._executor = ThreadPoolExecutor(max_workers=5)
+        # Общий PriorityExecutor приложения; без него параллельные запросы идут последовательно
+        self._executor = executor
+        # Лимиты запросов аккаунта: торговля не должна упираться в опрос
+        self.governor = RateGovernor()
+        # Circuit breaker на группу эндпоинтов: при деградации биржи - быстрый отказ
+        self.breakers = {group: CircuitBreaker(group) for group in BYBIT_RATE_LIMITS}
+        # ClockService: при отказе по timestamp - внеочередной замер часов
+        self.clock = clock
         self._request_timeout = 10  # секунды
-        self._retry_attempts = 2
 
     def connect(self):
         try:
-            from pybit.unified_trading import HTTP
-            self.session = HTTP(
-                testnet=True,
-                api_key=self.api_key,
-                api_secret=self.api_secret,
-                recv_window=20000,  # Увеличено с 10000 до 20000
-            )
+            # Узкое окно: timestamp подписи исправляет ClockService
+            self.session = self._make_session()
+            self.order_session = self._make_session(timeout=ORDER_TIMEOUT)
+            self.governor.attach(self.session)
+            self.governor.attach(self.order_session)
         except Exception as e:
             self.session = None
+            self.order_session = None
             self.last_error = f"Init Error: {str(e)}"
 
+    def _make_session(self, **kwargs):
+        """
+        HTTP-сессия pybit без собственных повторов
+
+        Повторы, лимиты и resync часов - наши (_call/retry_call): pybit
+        иначе сам спит на 10006 и расширяет recv_window на 10002, а наружу
+        отдаёт безликое "Retries exceeded". max_retries=1 - одна попытка
+        (при 0 pybit не отправляет запрос вовсе).
+        """
+        from pybit.unified_trading import HTTP
+        session = HTTP(
+            testnet=True,
+            api_key=self.api_key,
+            api_secret=self.api_secret,
+            recv_window=BYBIT_RECV_WINDOW,
+            max_retries=1,
+            retry_delay=0,
+            **kwargs,
+        )
+        # Пустой набор в конструкторе pybit заменяет своим по умолчанию
+        session.retry_codes = set()
+        return session
+
     def test_connection(self) -> bool:
         self.last_error = None
         if not self.session:
             self.last_error = "Session not initialized"
             return False
         try:
-            self.session.get_api_key_information()
+            self._call(PRIORITY_STATE, self.session.get_api_key_information)
             return True
         except Exception as e:
             self.last_error = str(e)
@@ -44,7 +111,7 @@ class BybitAPI:
             return 0.0
         try:
             def _fetch():
-                data = self.session.get_wallet_balance(accountType="UNIFIED")
+                data = self._call(PRIORITY_STATE, self.session.get_wallet_balance, accountType="UNIFIED")
                 if isinstance(data, dict):
                     list_data = data.get("result", {}).get("list", [])
                     if list_data:
@@ -62,46 +129,76 @@ class BybitAPI:
         try:
             def _fetch():
                 if symbol:
-                    res = self.session.get_positions(category="linear", symbol=symbol)
+                    res = self._call(PRIORITY_STATE, self.session.get_positions, category="linear", symbol=symbol)
                 else:
-                    res = self.session.get_positions(category="linear")
+                    res = self._call(PRIORITY_STATE, self.session.get_positions, category="linear")
                 return res.get("result", {}).get("list", []) if isinstance(res, dict) else []
 
             return self._retry_request(_fetch)
         except Exception:
             return []
 
-    def _retry_request(self, func, *args, **kwargs):
+    def _call(self, priority: str, method, **kwargs):
         """
-        Выполняет запрос с повторными попытками при таймауте
+        Вызов метода сессии pybit через ограничитель запросов и circuit breaker
+
+        Любая ошибка выходит наружу классифицированной (utils.resilience).
+        Временные ошибки размыкают цепь группы; отказ биржи по существу
+        запроса означает, что биржа отвечает, и цепь не трогает.
+        """
+        group = METHOD_GROUPS.get(method.__name__)
+        breaker = self.breakers.get(group)
+        try:
+            self.governor.acquire(group, priority)
+        except Exception as e:
+            raise classify(e) from e
+        if breaker is not None:
+            breaker.check()
+        try:
+            result = method(**kwargs)
+        except Exception as e:
+            err = classify(e, order=group == "order")
+            if err.code == ERR_TIMESTAMP and self.clock is not None:
+                self.clock.resync()
+            if breaker is not None:
+                if isinstance(err, TransientError):
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+            raise err from e
+        if breaker is not None:
+            breaker.record_success()
+        return result
 
-        Args:
-            func: Функция для выполнения
-            *args, **kwargs: Параметры функции
+    def rate_headroom(self) -> Dict[str, dict]:
+        """Запас лимита запросов по группам эндпоинтов"""
+        return self.governor.headroom()
 
-        Returns:
-            Результат функции или значение по умолчанию при ошибке
+    def circuit_states(self) -> Dict[str, dict]:
+        """Состояние circuit breaker по группам эндпоинтов"""
+        return {group: breaker.snapshot() for group, breaker in self.breakers.items()}
+
+    def _retry_request(self, func, *args, **kwargs):
         """
-        last_exception = None
+        Выполняет запрос с повторами при временных ошибках
 
-        for attempt in range(self._retry_attempts):
-            try:
-                return func(*args, **kwargs)
-            except Exception as e:
-                last_exception = e
-                error_str = str(e)
-
-                # Если это таймаут или recv_window ошибка и есть еще попытки - ждем и пробуем снова
-                if any(x in error_str.lower() for x in ["timed out", "timeout", "recv_window", "timestamp"]):
-                    if attempt < self._retry_attempts - 1:
-                        time.sleep(1)  # Увеличена задержка до 1 секунды
-                        continue
-                # Для других ошибок сразу выходим
-                break
+        Повторы - с экспоненциальной задержкой и джиттером в пределах
+        RETRY_DEADLINE; отказ биржи, ошибки ключей и отключённая цепь не
+        повторяются. Наружу выходит классифицированная ошибка.
+        """
+        return retry_call(func, *args, **kwargs)
 
-        # Если все попытки исчерпаны, выбрасываем последнее исключение
-        if last_exception:
-            raise last_exception
+    def get_server_time_ms(self) -> float:
+        """Время сервера Bybit, мс (публичный запрос, без подписи)"""
+        if not self.session:
+            return 0.0
+        res = self._call(PRIORITY_STATE, self.session.get_server_time)
+        result = res.get("result", {}) if isinstance(res, dict) else {}
+        if result.get("timeNano"):
+            return int(result["timeNano"]) / 1e6
+        if result.get("timeSecond"):
+            return int(result["timeSecond"]) * 1000.0
+        return float(res.get("time", 0) or 0)
 
     def get_open_orders(self, symbol: str | None = None) -> List[Dict]:
         """Получение открытых ордеров с retry-логикой"""
@@ -111,21 +208,21 @@ class BybitAPI:
         try:
             def _fetch():
                 if symbol:
-                    res = self.session.get_open_orders(category="linear", symbol=symbol)
+                    res = self._call(PRIORITY_STATE, self.session.get_open_orders, category="linear", symbol=symbol)
                 else:
-                    res = self.session.get_open_orders(category="linear", settleCoin="USDT")
+                    res = self._call(PRIORITY_STATE, self.session.get_open_orders, category="linear", settleCoin="USDT")
                 return res.get("result", {}).get("list", []) if isinstance(res, dict) else []
 
             return self._retry_request(_fetch)
 
         except Exception as e:
-            # Логируем только если это не таймаут (чтобы не спамить)
-            error_str = str(e)
-            if not any(x in error_str.lower() for x in ["timed out", "timeout", "retrying"]):
+            # Логируем только если это не временная ошибка (чтобы не спамить)
+            if not is_quiet(e):
                 print(f"DEBUG: Exception in get_open_orders: {e}")
             return []
 
-    def get_order_history(self, symbol: str | None = None, limit: int = 50) -> List[Dict]:
+    def get_order_history(self, symbol: str | None = None, limit: int = 50,
+                          priority: str = PRIORITY_STATE) -> List[Dict]:
         """Получение истории ордеров с retry-логикой"""
         if not self.session:
             return []
@@ -142,17 +239,45 @@ class BybitAPI:
                 else:
                     params["settleCoin"] = "USDT"
 
-                res = self.session.get_order_history(**params)
+                res = self._call(priority, self.session.get_order_history, **params)
                 return res.get("result", {}).get("list", []) if isinstance(res, dict) else []
 
             return self._retry_request(_fetch)
 
         except Exception as e:
-            error_str = str(e)
-            if not any(x in error_str.lower() for x in ["timed out", "timeout", "retrying"]):
+            if not is_quiet(e):
                 print(f"DEBUG: Exception in get_order_history: {e}")
             return []
 
+    def get_order_history_page(self, start_ms: int, end_ms: int, cursor: str | None = None,
+                               limit: int = 50, priority: str = PRIORITY_UI) -> tuple:
+        """
+        Страница исполненных ордеров за окно [start_ms, end_ms] (не больше 7 дней)
+
+        Returns:
+            (ордера, nextPageCursor или ""); ошибки не глотаются - курсор
+            синхронизации не должен сдвинуться мимо непрочитанной страницы
+        """
+        if not self.session:
+            raise TransientError("Session not initialized")
+        params = {
+            "category": "linear",
+            "settleCoin": "USDT",
+            "orderStatus": "Filled",
+            "startTime": int(start_ms),
+            "endTime": int(end_ms),
+            "limit": limit,
+        }
+        if cursor:
+            params["cursor"] = cursor
+
+        def _fetch():
+            res = self._call(priority, self.session.get_order_history, **params)
+            result = res.get("result", {}) if isinstance(res, dict) else {}
+            return result.get("list", []) or [], result.get("nextPageCursor", "") or ""
+
+        return self._retry_request(_fetch)
+
     def get_orders_parallel(self) -> tuple:
         """
         Параллельная загрузка открытых и исполненных ордеров с обработкой таймаутов
@@ -164,9 +289,13 @@ class BybitAPI:
             return [], []
 
         try:
+            if self._executor is None:
+                return self.get_open_orders(), self.get_order_history(None, 10)
+
             # Запускаем два запроса параллельно с увеличенным таймаутом
-            future_open = self._executor.submit(self.get_open_orders)
-            future_history = self._executor.submit(self.get_order_history, None, 10)
+            future_open = self._executor.submit(PRIORITY_STATE, self.get_open_orders)
+            future_history = self._executor.submit(PRIORITY_STATE, self.get_order_history, None, 10)
+            self._executor.wait([future_open, future_history], timeout=20)
 
             open_orders = []
             filled_orders = []
@@ -178,8 +307,7 @@ class BybitAPI:
                 # Если таймаут - просто возвращаем пустой список
                 pass
             except Exception as e:
-                error_str = str(e)
-                if not any(x in error_str.lower() for x in ["timed out", "timeout", "retrying"]):
+                if not is_quiet(e):
                     print(f"DEBUG: Error fetching open orders: {e}")
 
             try:
@@ -187,52 +315,190 @@ class BybitAPI:
             except TimeoutError:
                 pass
             except Exception as e:
-                error_str = str(e)
-                if not any(x in error_str.lower() for x in ["timed out", "timeout", "retrying"]):
+                if not is_quiet(e):
                     print(f"DEBUG: Error fetching order history: {e}")
 
             return open_orders, filled_orders
 
         except Exception as e:
-            error_str = str(e)
-            if not any(x in error_str.lower() for x in ["timed out", "timeout", "retrying"]):
+            if not is_quiet(e):
                 print(f"DEBUG: Exception in get_orders_parallel: {e}")
             return [], []
 
-    def place_order(self, symbol: str, side: str, qty: float, order_type: str, price: float | None = None) -> str:
+    @staticmethod
+    def _placement(order_id: str = "", error: str | None = None, unknown: bool = False) -> Dict:
+        """
+        Результат выставления ордера: {"order_id", "error", "unknown"}
+
+        unknown - orderId нет, но ордер мог быть принят биржей (таймаут без
+        ответа, найти по orderLinkId не удалось); это не отказ. Ошибка
+        возвращается вместе с результатом: ордера разных символов
+        выставляются параллельно, общий last_error они бы перетирали.
+        """
+        return {"order_id": order_id, "error": error, "unknown": unknown}
+
+    def place_order(self, symbol: str, side: str, qty: float, order_type: str, price: float | None = None,
+                    order_link_id: str | None = None) -> Dict:
         if not self.session:
-            return ""
+            return self._placement(error="Session not initialized")
+        params = {"category": "linear", "symbol": symbol, "side": side, "orderType": order_type, "qty": str(qty)}
+        if price is not None:
+            params["price"] = str(price)
+        if order_link_id:
+            params["orderLinkId"] = order_link_id
+            return self._place_idempotent(params)
         try:
-            params = {"category": "linear", "symbol": symbol, "side": side, "orderType": order_type, "qty": str(qty)}
-            if price is not None:
-                params["price"] = str(price)
-
-            res = self.session.place_order(**params)
-            order_id = str(res.get("result", {}).get("orderId", ""))
-            return order_id
+            res = self._call(PRIORITY_TRADE, self.session.place_order, **params)
+            return self._placement(str(res.get("result", {}).get("orderId", "")))
         except Exception as e:
-            print(f"DEBUG: Exception placing order: {e}")
-            return ""
+            self.logger.warning("Ордер не выставлен", {"symbol": symbol, "error": str(e)})
+            return self._placement(error=str(e), unknown=isinstance(e, AmbiguousOrderError))
 
     def place_conditional_order(self, symbol: str, side: str, qty: float, order_type: str, trigger_price: float,
-                                price: float | None = None) -> str:
+                                price: float | None = None, order_link_id: str | None = None) -> Dict:
         if not self.session:
-            return ""
+            return self._placement(error="Session not initialized")
+        params = {"category": "linear", "symbol": symbol, "side": side, "orderType": order_type, "qty": str(qty),
+                  "triggerPrice": str(trigger_price)}
+        if price is not None:
+            params["price"] = str(price)
+        if order_link_id:
+            params["orderLinkId"] = order_link_id
+            return self._place_idempotent(params)
         try:
-            params = {"category": "linear", "symbol": symbol, "side": side, "orderType": order_type, "qty": str(qty),
-                      "triggerPrice": str(trigger_price)}
-            if price is not None:
-                params["price"] = str(price)
-            res = self.session.place_order(**params)
-            return str(res.get("result", {}).get("orderId", ""))
-        except Exception:
+            res = self._call(PRIORITY_TRADE, self.session.place_order, **params)
+            return self._placement(str(res.get("result", {}).get("orderId", "")))
+        except Exception as e:
+            return self._placement(error=str(e), unknown=isinstance(e, AmbiguousOrderError))
+
+    def place_batch_order(self, orders: List[Dict]) -> Dict[str, Dict]:
+        """
+        Выставить несколько ордеров пакетами place_batch_order
+
+        orders - параметры ордеров как у place_order (без category),
+        orderLinkId обязателен. Возвращает {orderLinkId: результат _placement}.
+        Если пакет целиком не прошёл (отказ или неясный исход), его ордера
+        выставляются по одному через _place_idempotent - orderLinkId не
+        даст создать дубль уже принятого ордера.
+        """
+        if not self.session:
+            return {o["orderLinkId"]: self._placement(error="Session not initialized") for o in orders}
+        results = {o["orderLinkId"]: self._placement() for o in orders}
+        session = self.order_session or self.session
+
+        for i in range(0, len(orders), ORDER_BATCH_LIMIT):
+            chunk = orders[i:i + ORDER_BATCH_LIMIT]
+            maybe_sent = False
+            try:
+                res = self._call(PRIORITY_TRADE, session.place_batch_order, category="linear", request=chunk)
+                items = res.get("result", {}).get("list", []) or []
+                infos = (res.get("retExtInfo") or {}).get("list", []) or []
+            except Exception as e:
+                # Неясный исход пакета: его ордера могли быть приняты
+                maybe_sent = isinstance(e, AmbiguousOrderError)
+                self.logger.warning("Пакет ордеров не прошёл, выставляем по одному",
+                                    {"orders": len(chunk), "error": str(e)})
+                items, infos = [], []
+
+            for pos, item in enumerate(items):
+                # Ответы идут в порядке запроса
+                link_id = item.get("orderLinkId") or (chunk[pos]["orderLinkId"] if pos < len(chunk) else "")
+                if link_id not in results:
+                    continue
+                info = infos[pos] if pos < len(infos) else {}
+                code = int(info.get("code", 0) or 0)
+                if code == 0 and item.get("orderId"):
+                    results[link_id]["order_id"] = str(item["orderId"])
+                elif code == ERR_DUPLICATE_LINK_ID:
+                    symbol = next(o["symbol"] for o in chunk if o["orderLinkId"] == link_id)
+                    results[link_id]["order_id"] = self.find_order_by_link_id(symbol, link_id)
+                else:
+                    results[link_id]["error"] = info.get("msg") or "Order not placed"
+
+            # Ордера без ответа в пакете - по одному
+            for order in chunk:
+                r = results[order["orderLinkId"]]
+                if r["order_id"] or r["error"]:
+                    continue
+                results[order["orderLinkId"]] = self._place_idempotent({"category": "linear", **order}, maybe_sent)
+        return results
+
+    def _place_idempotent(self, params: Dict, maybe_sent: bool = False) -> Dict:
+        """
+        Выставить ордер с orderLinkId, повторяя при неясном исходе
+
+        Таймаут или сетевая ошибка не говорят, принят ли ордер, поэтому
+        сначала ищем его по orderLinkId и только потом отправляем снова.
+        Повторная отправка уже принятого ордера отклоняется биржей
+        (ERR_DUPLICATE_LINK_ID) - тогда тоже берём id найденного ордера.
+        maybe_sent - ордер уже мог уйти раньше (неясный исход пакета).
+        Если исход не выяснен до ORDER_PLACE_DEADLINE, а запрос мог дойти
+        до биржи, результат - unknown, а не отказ.
+        """
+        symbol = params["symbol"]
+        link_id = params["orderLinkId"]
+        session = self.order_session or self.session
+        deadline = time.monotonic() + ORDER_PLACE_DEADLINE
+        error = None
+
+        for attempt in range(1, ORDER_PLACE_ATTEMPTS + 1):
+            try:
+                res = self._call(PRIORITY_TRADE, session.place_order, **params)
+                return self._placement(str(res.get("result", {}).get("orderId", "")))
+            except TransientError as e:
+                # Таймаут, обрыв, лимит - ищем по orderLinkId; принят мог быть
+                # только ордер с неясным исходом (лимит или отказ соединения - нет)
+                error = str(e)
+                maybe_sent = maybe_sent or isinstance(e, AmbiguousOrderError)
+            except InvalidRequestError as e:
+                if e.code != ERR_DUPLICATE_LINK_ID:
+                    # Биржа ответила отказом - ордера с этим orderLinkId нет
+                    self.logger.warning("Ордер отклонён биржей", {"orderLinkId": link_id, "error": str(e)})
+                    return self._placement(error=str(e))
+                maybe_sent = True
+            except Exception as e:
+                # Ключи/права или отключённая цепь - этот запрос не исполнен
+                self.logger.warning("Ордер не отправлен", {"orderLinkId": link_id, "error": str(e)})
+                return self._placement(error=str(e), unknown=maybe_sent)
+
+            order_id = self.find_order_by_link_id(symbol, link_id)
+            if order_id:
+                if attempt > 1 or error:
+                    self.logger.debug("Ордер найден по orderLinkId", {"orderLinkId": link_id, "attempt": attempt})
+                return self._placement(order_id)
+            delay = backoff_delay(attempt, base=ORDER_RETRY_DELAY)
+            if time.monotonic() + delay >= deadline:
+                break
+            time.sleep(delay)
+
+        if not maybe_sent:
+            return self._placement(error=error or "Order not placed")
+        self.logger.warning("Исход ордера неизвестен", {
+            "orderLinkId": link_id, "attempts": ORDER_PLACE_ATTEMPTS, "error": error,
+        })
+        return self._placement(error=error or "Order state unknown", unknown=True)
+
+    def find_order_by_link_id(self, symbol: str, order_link_id: str) -> str:
+        """orderId ордера по orderLinkId (открытые и недавно закрытые); "" если не найден"""
+        session = self.order_session or self.session
+        if not session:
             return ""
+        for query in (session.get_open_orders, session.get_order_history):
+            try:
+                res = self._call(PRIORITY_TRADE, query, category="linear", symbol=symbol, orderLinkId=order_link_id)
+                items = res.get("result", {}).get("list", []) if isinstance(res, dict) else []
+                for item in items:
+                    if item.get("orderLinkId") == order_link_id and item.get("orderId"):
+                        return str(item["orderId"])
+            except Exception:
+                continue
+        return ""
 
     def cancel_order(self, symbol: str, order_id: str) -> bool:
         if not self.session:
             return False
         try:
-            res = self.session.cancel_order(category="linear", symbol=symbol, orderId=order_id)
+            res = self._call(PRIORITY_TRADE, self.session.cancel_order, category="linear", symbol=symbol, orderId=order_id)
             return bool(res.get("retCode", 0) == 0)
         except Exception:
             return False
@@ -241,28 +507,29 @@ class BybitAPI:
         if not self.session:
             return False
         try:
-            self.session.cancel_all_orders(category="linear", symbol=symbol)
+            self._call(PRIORITY_TRADE, self.session.cancel_all_orders, category="linear", symbol=symbol)
             return True
         except Exception:
             return False
 
     def get_ticker(self, symbol: str) -> Dict:
         """Получение цены с retry-логикой"""
-        if self.session:
-            try:
-                def _fetch():
-                    res = self.session.get_tickers(category="linear", symbol=symbol)
-                    items = res.get("result", {}).get("list", [])
-                    price = float(items[0].get("lastPrice", 0.0)) if items else 0.0
-                    return {"symbol": symbol, "price": price}
+        if not self.session:
+            return {"symbol": symbol, "price": 0.0}
+        try:
+            def _fetch():
+                res = self._call(PRIORITY_UI, self.session.get_tickers, category="linear", symbol=symbol)
+                items = res.get("result", {}).get("list", [])
+                price = float(items[0].get("lastPrice", 0.0)) if items else 0.0
+                return {"symbol": symbol, "price": price}
 
-                return self._retry_request(_fetch)
-            except Exception:
-                pass
+            return self._retry_request(_fetch)
+        except Exception:
+            pass
 
-        # Fallback на публичный API
+        # Fallback на публичный API той же среды (testnet/mainnet), что и сессия
         try:
-            r = requests.get("https://api.bybit.com/v5/market/tickers",
+            r = requests.get(f"{self.session.endpoint}/v5/market/tickers",
                              params={"category": "linear", "symbol": symbol},
                              timeout=5)
             j = r.json() if r.content else {}
@@ -272,46 +539,48 @@ class BybitAPI:
         except Exception:
             return {"symbol": symbol, "price": 0.0}
 
-    def get_tickers(self, symbols: List[str]) -> Dict[str, float]:
-        """Batch загрузка цен с обработкой ошибок"""
-        if not symbols:
-            return {}
+    def get_all_tickers(self) -> Dict[str, float]:
+        """
+        Последние цены всех linear-контрактов одним запросом
 
-        # Если меньше 5 символов - batch запрос эффективнее
-        if len(symbols) <= 5 and self.session:
-            try:
-                def _fetch():
-                    res = self.session.get_tickers(category="linear")
-                    items = res.get("result", {}).get("list", [])
-                    out = {}
-                    symbol_set = set(symbols)
-                    for item in items:
-                        sym = item.get("symbol")
-                        if sym in symbol_set:
-                            out[sym] = float(item.get("lastPrice", 0.0))
-                    # Заполняем отсутствующие нулями
-                    for s in symbols:
-                        if s not in out:
-                            out[s] = 0.0
-                    return out
-
-                return self._retry_request(_fetch)
-            except Exception:
-                pass
+        Без запасного запроса к публичному API: цены идут в отчёты о
+        сделках и должны быть из той же среды, что и торговля; при ошибке
+        MarketSnapshot оставит прежние цены, и они устареют по ttl.
+        """
+        def _parse(items) -> Dict[str, float]:
+            out = {}
+            for item in items:
+                sym = item.get("symbol")
+                try:
+                    out[sym] = float(item.get("lastPrice", 0.0) or 0.0)
+                except (TypeError, ValueError):
+                    continue
+            return out
 
-        # Fallback: параллельная загрузка для каждого символа
-        out = {}
-        futures = {self._executor.submit(self.get_ticker, s): s for s in symbols}
-        for future in as_completed(futures, timeout=20):
-            try:
-                result = future.result(timeout=5)
-                out[result["symbol"]] = result["price"]
-            except Exception:
-                symbol = futures[future]
-                out[symbol] = 0.0
+        if not self.session:
+            return {}
+        try:
+            def _fetch():
+                res = self._call(PRIORITY_UI, self.session.get_tickers, category="linear")
+                return _parse(res.get("result", {}).get("list", []))
+
+            return self._retry_request(_fetch)
+        except Exception:
+            return {}
 
-        return out
+    def get_tickers(self, symbols: List[str]) -> Dict[str, float]:
+        """Цены по списку символов (всегда один bulk-запрос)"""
+        if not symbols:
+            return {}
+        data = self.get_all_tickers()
+        return {s: data.get(s, 0.0) for s in symbols}
 
     def shutdown(self):
-        """Закрытие executor"""
-        self._executor.shutdown(wait=False)
\ No newline at end of file
+        """Закрыть HTTP-соединения обеих сессий клиента (пул потоков общий, его не трогаем)"""
+        for session in (self.session, self.order_session):
+            client = getattr(session, "client", None)
+            if client is not None:
+                try:
+                    client.close()
+                except Exception:
+                    pass
\ No newline at end of file
@@ -1,15 +1,52 @@
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Dict, List
-from config import API_TIMEOUT
+from config import API_TIMEOUT, MASTER_API_TIMEOUTS, MASTER_POOL_SIZE
+
+
+def _make_session(pool_size: int = MASTER_POOL_SIZE, on_response=None) -> requests.Session:
+    """HTTP-сессия с keep-alive и ограниченным пулом соединений"""
+    session = requests.Session()
+    if on_response is not None:
+        session.hooks["response"].append(on_response)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({
+        "Accept-Encoding": "gzip, deflate",
+        "Connection": "keep-alive",
+    })
+    return session
+
+
+class MasterRejectedError(RuntimeError):
+    """Мастер отклонил запрос по существу (4xx или success: false) - повтор не поможет"""
+
+
+def is_rejection(status: int) -> bool:
+    """Неуспешный ответ - отказ по существу: 200 с success: false и 4xx, кроме 401/408/429"""
+    return status == 200 or (400 <= status < 500 and status not in (401, 408, 429))
+
+
+def _failure(status: int, message: str) -> RuntimeError:
+    if is_rejection(status):
+        return MasterRejectedError(message)
+    return RuntimeError(message)
 
 
 class MasterAPI:
-    def __init__(self, base_url: str, token: str | None = None):
+    def __init__(self, base_url: str, token: str | None = None, session: requests.Session | None = None):
+        self.base_url = self.normalize_url(base_url)
+        self.token = token
+        self.session = session or _make_session()
+
+    @staticmethod
+    def normalize_url(base_url: str) -> str:
         base_url = base_url.strip().rstrip("/")
         if not base_url.endswith("/api"):
             base_url = f"{base_url}/api"
-        self.base_url = base_url
-        self.token = token
+        return base_url
 
     def _headers(self):
         h = {"Content-Type": "application/json"}
@@ -20,9 +57,12 @@ class MasterAPI:
     def _url(self, path: str) -> str:
         return f"{self.base_url}/{path.lstrip('/')}"
 
+    def _timeout(self, endpoint: str) -> float:
+        return MASTER_API_TIMEOUTS.get(endpoint, API_TIMEOUT)
+
     def init(self, uid: str) -> Dict:
         url = self._url("/terminal/init")
-        r = requests.post(url, json={"uid": uid}, headers=self._headers(), timeout=API_TIMEOUT)
+        r = self.session.post(url, json={"uid": uid}, headers=self._headers(), timeout=self._timeout("init"))
         data = r.json() if r.content else {}
         data = data if isinstance(data, dict) else {}
         if r.status_code == 200 and data.get("success"):
@@ -33,7 +73,7 @@ class MasterAPI:
 
     def get_status(self) -> Dict:
         url = self._url("/data/status")
-        r = requests.get(url, headers=self._headers(), timeout=API_TIMEOUT)
+        r = self.session.get(url, headers=self._headers(), timeout=self._timeout("status"))
         data = r.json() if r.content else {}
         data = data if isinstance(data, dict) else {}
         if r.status_code == 200 and data.get("success"):
@@ -44,7 +84,7 @@ class MasterAPI:
 
     def get_orders(self) -> Dict:
         url = self._url("/data/orders")
-        r = requests.get(url, headers=self._headers(), timeout=API_TIMEOUT)
+        r = self.session.get(url, headers=self._headers(), timeout=self._timeout("orders"))
         data = r.json() if r.content else {}
         data = data if isinstance(data, dict) else {}
         if r.status_code == 200 and data.get("success"):
@@ -55,27 +95,78 @@ class MasterAPI:
 
     def send_log(self, data: Dict) -> Dict:
         url = self._url("/data/log")
-        r = requests.post(url, json=data, headers=self._headers(), timeout=API_TIMEOUT)
+        r = self.session.post(url, json=data, headers=self._headers(), timeout=self._timeout("log"))
         resp = r.json() if r.content else {}
         resp = resp if isinstance(resp, dict) else {}
         if r.status_code == 200:
             return resp
-        return {"success": False, "message": resp.get("message", "Log send error")}
+        return {"success": False, "message": resp.get("message", "Log send error"), "status": r.status_code}
+
+    def open_trade(self, data: Dict, idempotency_key: str | None = None) -> Dict:
+        """
+        Открыть сделку на мастере
 
-    def open_trade(self, data: Dict) -> Dict:
+        idempotency_key - постоянный ключ сделки: повтор после потерянного
+        ответа должен вернуть ту же сделку, а не открыть вторую.
+        """
         url = self._url("/data/trade/open")
-        r = requests.post(url, json=data, headers=self._headers(), timeout=API_TIMEOUT)
+        headers = self._headers()
+        if idempotency_key:
+            headers["Idempotency-Key"] = idempotency_key
+        r = self.session.post(url, json=data, headers=headers, timeout=self._timeout("trade"))
         resp = r.json() if r.content else {}
         resp = resp if isinstance(resp, dict) else {}
         if r.status_code == 200 and resp.get("success"):
             return resp
-        raise RuntimeError(resp.get("message", "Open trade error"))
+        raise _failure(r.status_code, resp.get("message", "Open trade error"))
 
     def close_trade(self, data: Dict) -> Dict:
         url = self._url("/data/trade/close")
-        r = requests.post(url, json=data, headers=self._headers(), timeout=API_TIMEOUT)
+        r = self.session.post(url, json=data, headers=self._headers(), timeout=self._timeout("trade"))
         resp = r.json() if r.content else {}
         resp = resp if isinstance(resp, dict) else {}
         if r.status_code == 200 and resp.get("success"):
             return resp
-        raise RuntimeError(resp.get("message", "Close trade error"))
+        raise _failure(r.status_code, resp.get("message", "Close trade error"))
+
+    def close(self):
+        self.session.close()
+
+
+class MasterAPIPool:
+    """
+    Долгоживущие HTTP-сессии мастер-API - по одной на base URL
+
+    Сессия переиспользует keep-alive соединения между опросами, поэтому
+    poll -> command -> log не платят за TCP+TLS рукопожатие каждый раз.
+    Токен у каждого клиента свой: get() возвращает лёгкий MasterAPI поверх
+    общей сессии, и вход/обновление токена в одном потоке не подменяют
+    заголовок Authorization запросам outbox и планировщика в других.
+    """
+
+    def __init__(self, pool_size: int = MASTER_POOL_SIZE, on_response=None):
+        self.pool_size = pool_size
+        # Хук requests на каждый ответ мастера (замер часов по Date)
+        self.on_response = on_response
+        self._sessions: Dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def get(self, base_url: str, token: str | None = None) -> MasterAPI:
+        """Клиент для base URL с токеном token (сессия общая)"""
+        key = MasterAPI.normalize_url(base_url)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = _make_session(self.pool_size, self.on_response)
+                self._sessions[key] = session
+        return MasterAPI(key, token, session=session)
+
+    def close(self):
+        with self._lock:
+            sessions: List[requests.Session] = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            try:
+                session.close()
+            except Exception:
+                pass
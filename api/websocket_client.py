@@ -1,10 +1,300 @@
+import hashlib
+import hmac
+import json
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set
+from config import (
+    BYBIT_WS_PUBLIC_URL,
+    BYBIT_WS_PRIVATE_URL,
+    WS_PING_INTERVAL,
+    WS_RECONNECT_DELAY,
+    WS_RECONNECT_MAX_DELAY,
+    WS_SUBSCRIBE_BATCH,
+)
+
+
 class WebSocketClient:
-    def __init__(self, logger):
+    """
+    Публичный поток Bybit (tickers.<SYMBOL>) с автопереподключением
+
+    Работает в собственном потоке: подключается, подписывается на все
+    топики, отправляет ping и при любом обрыве переподключается с
+    экспоненциальной задержкой. URL передаётся в конструктор, поэтому
+    клиент можно направить на локальный тестовый сервер.
+    """
+
+    def __init__(self, logger, url: str = BYBIT_WS_PUBLIC_URL,
+                 ping_interval: float = WS_PING_INTERVAL,
+                 reconnect_delay: float = WS_RECONNECT_DELAY,
+                 max_reconnect_delay: float = WS_RECONNECT_MAX_DELAY):
         self.logger = logger
+        self.url = url
+        self.ping_interval = ping_interval
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+
         self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self._ws = None
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._connected = threading.Event()
+        self._stop_event = threading.Event()
+
+        self._topics: Set[str] = set()
+        self._ticker_callbacks: List[Callable[[str, Dict], None]] = []
+        self._status_callbacks: List[Callable[[bool], None]] = []
+
+        self.last_message_at = 0.0
+        self.reconnects = 0
+
+    # ------------------------------------------------------------------
+    # Публичный интерфейс
+    # ------------------------------------------------------------------
+
+    def on_ticker(self, callback: Callable[[str, Dict], None]):
+        """Подписка на обновления тикеров: callback(symbol, data)"""
+        self._ticker_callbacks.append(callback)
+
+    def on_status(self, callback: Callable[[bool], None]):
+        """Подписка на смену состояния соединения: callback(connected)"""
+        self._status_callbacks.append(callback)
+
+    def set_symbols(self, symbols: Iterable[str]):
+        """Установить набор символов; при активном соединении досылает subscribe/unsubscribe"""
+        self.set_topics({f"tickers.{s}" for s in symbols})
+
+    def set_topics(self, topics: Iterable[str]):
+        new_topics = set(topics)
+        with self._lock:
+            added = sorted(new_topics - self._topics)
+            removed = sorted(self._topics - new_topics)
+            self._topics = new_topics
+
+        if self.is_connected():
+            try:
+                if removed:
+                    self._send_topics("unsubscribe", removed)
+                if added:
+                    self._send_topics("subscribe", added)
+            except Exception as e:
+                # Соединение переподключится и подпишется заново на полный набор
+                self.logger.warning("WebSocket subscribe error", {"url": self.url, "error": str(e)})
 
     def start(self):
+        if self._running:
+            return
         self._running = True
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
 
     def stop(self):
         self._running = False
+        self._stop_event.set()
+        self._close_socket()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def is_connected(self) -> bool:
+        return self._connected.is_set()
+
+    # ------------------------------------------------------------------
+    # Основной цикл
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        delay = self.reconnect_delay
+        failures = 0
+        while self._running:
+            try:
+                self._connect()
+                delay = self.reconnect_delay
+                failures = 0
+                self._read_loop()
+            except Exception as e:
+                failures += 1
+                if self._running:
+                    # Во время длительного обрыва не спамим лог каждой попыткой
+                    log = self.logger.warning if failures == 1 else self.logger.debug
+                    log("WebSocket connection error", {"url": self.url, "error": str(e)})
+            finally:
+                self._close_socket()
+                self._set_connected(False)
+
+            if not self._running:
+                break
+            self.reconnects += 1
+            self._stop_event.wait(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def _connect(self):
+        import websocket
+
+        ws = websocket.create_connection(self.url, timeout=10)
+        self._ws = ws
+        self.last_message_at = time.time()
+        self._on_open()
+
+        with self._lock:
+            topics = sorted(self._topics)
+        if topics:
+            self._send_topics("subscribe", topics)
+
+        self._set_connected(True)
+        self.logger.info("WebSocket подключен", {"url": self.url, "topics": len(topics)})
+
+    def _read_loop(self):
+        import websocket
+
+        self._ws.settimeout(1.0)
+        last_ping = time.time()
+        while self._running:
+            now = time.time()
+            if now - last_ping >= self.ping_interval:
+                self._send({"op": "ping"})
+                last_ping = now
+            # Нет ни данных, ни pong за два интервала - соединение мёртвое
+            if now - self.last_message_at > self.ping_interval * 2:
+                raise ConnectionError("WebSocket stale: no messages")
+
+            try:
+                raw = self._ws.recv()
+            except websocket.WebSocketTimeoutException:
+                continue
+
+            if raw is None or raw == "":
+                raise ConnectionError("WebSocket closed by server")
+
+            self.last_message_at = time.time()
+            try:
+                msg = json.loads(raw)
+            except ValueError:
+                continue
+            if isinstance(msg, dict):
+                self._dispatch(msg)
+
+    def _dispatch(self, msg: Dict):
+        topic = msg.get("topic")
+        if topic:
+            self._handle_topic(topic, msg)
+            return
+
+        op = msg.get("op")
+        if op in ("subscribe", "unsubscribe") and msg.get("success") is False:
+            self.logger.warning("WebSocket subscribe rejected", {"url": self.url, "message": msg.get("ret_msg")})
+
+    def _handle_topic(self, topic: str, msg: Dict):
+        if not topic.startswith("tickers."):
+            return
+        data = msg.get("data") or {}
+        symbol = data.get("symbol") or topic.split(".", 1)[1]
+        for cb in list(self._ticker_callbacks):
+            try:
+                cb(symbol, data)
+            except Exception as e:
+                self.logger.error("Ticker handler error", {"symbol": symbol, "error": str(e)})
+
+    # ------------------------------------------------------------------
+    # Вспомогательные методы
+    # ------------------------------------------------------------------
+
+    def _on_open(self):
+        """Хук для наследников (например, авторизация приватного потока)"""
+        pass
+
+    def _send(self, payload: Dict):
+        ws = self._ws
+        if ws is None:
+            raise ConnectionError("WebSocket not connected")
+        with self._send_lock:
+            ws.send(json.dumps(payload))
+
+    def _send_topics(self, op: str, topics: List[str]):
+        for i in range(0, len(topics), WS_SUBSCRIBE_BATCH):
+            self._send({"op": op, "args": topics[i:i + WS_SUBSCRIBE_BATCH]})
+
+    def _close_socket(self):
+        ws = self._ws
+        self._ws = None
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+
+    def _set_connected(self, connected: bool):
+        if connected == self._connected.is_set():
+            return
+        if connected:
+            self._connected.set()
+        else:
+            self._connected.clear()
+        for cb in list(self._status_callbacks):
+            try:
+                cb(connected)
+            except Exception:
+                pass
+
+
+class PrivateWebSocketClient(WebSocketClient):
+    """
+    Приватный поток Bybit: order, position, execution, wallet
+
+    Перед подпиской проходит авторизацию (op=auth); при ошибке авторизации
+    соединение рвётся и переподключается по общим правилам базового клиента.
+    """
+
+    TOPICS = ("order", "position", "execution", "wallet")
+
+    def __init__(self, logger, api_key: str, api_secret: str, url: str = BYBIT_WS_PRIVATE_URL, **kwargs):
+        super().__init__(logger, url=url, **kwargs)
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self._topic_callbacks: Dict[str, List[Callable[[List[Dict]], None]]] = {}
+        self.set_topics(self.TOPICS)
+
+    def on_topic(self, topic: str, callback: Callable[[List[Dict]], None]):
+        """Подписка на приватный топик: callback(list_of_updates)"""
+        self._topic_callbacks.setdefault(topic, []).append(callback)
+
+    def _on_open(self):
+        import websocket
+
+        expires = int((time.time() + 10) * 1000)
+        signature = hmac.new(
+            self.api_secret.encode("utf-8"),
+            f"GET/realtime{expires}".encode("utf-8"),
+            hashlib.sha256
+        ).hexdigest()
+        self._send({"op": "auth", "args": [self.api_key, expires, signature]})
+
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            try:
+                raw = self._ws.recv()
+            except websocket.WebSocketTimeoutException:
+                break
+            try:
+                msg = json.loads(raw)
+            except ValueError:
+                continue
+            if isinstance(msg, dict) and msg.get("op") == "auth":
+                if msg.get("success"):
+                    return
+                raise PermissionError(msg.get("ret_msg") or "WebSocket auth failed")
+        raise TimeoutError("WebSocket auth timeout")
+
+    def _handle_topic(self, topic: str, msg: Dict):
+        # Топики приходят как "order", "order.linear" и т.п.
+        name = topic.split(".", 1)[0]
+        data = msg.get("data") or []
+        if isinstance(data, dict):
+            data = [data]
+        for cb in list(self._topic_callbacks.get(name, [])):
+            try:
+                cb(data)
+            except Exception as e:
+                self.logger.error("Private stream handler error", {"topic": name, "error": str(e)})
@@ -1,12 +1,156 @@
 API_TIMEOUT = 15
+# Таймауты мастер-API по эндпоинтам (секунды); poll-запросы короткие
+MASTER_API_TIMEOUTS = {
+    "init": 15,
+    "status": 5,
+    "orders": 5,
+    "log": 10,
+    "trade": 10,
+}
+MASTER_POOL_SIZE = 4
 POLLING_INTERVAL = 2
 ORDERS_UPDATE_INTERVAL = 6
 PRICE_UPDATE_INTERVAL = 5
 BALANCE_UPDATE_INTERVAL = 60
 HISTORY_UPDATE_INTERVAL = 70
 TOKEN_REFRESH_INTERVAL = 900
+CLOCK_SYNC_INTERVAL = 60
+SCHEDULER_WORKERS = 4
+SCHEDULER_LATE_WARNING = 1.0
 LEVERAGE = 77
 LOG_RETENTION_DAYS = 30
 DATABASE_NAME = "terminal.db"
 
 HISTORY_ORDERS_LIMIT = 20
+# Инкрементальная синхронизация истории: страница Bybit (max 50), окно
+# запроса (Bybit - не больше 7 дней), перекрытие с прошлой синхронизацией,
+# глубина и шаг фоновой догрузки старых страниц
+HISTORY_PAGE_LIMIT = 50
+HISTORY_WINDOW_MS = 7 * 24 * 3600 * 1000
+HISTORY_SYNC_OVERLAP_MS = 60 * 1000
+HISTORY_BACKFILL_DAYS = 90
+HISTORY_BACKFILL_INTERVAL = 20
+
+# Параллельные "полосы" исполнения команд (по одной на символ)
+COMMAND_EXECUTOR_WORKERS = 8
+
+# Общий пул потоков с классами приоритета (по убыванию важности):
+# исполнение сделок, обновление состояния, данные для UI.
+# Отчёты мастеру отправляет собственный поток outbox
+EXECUTOR_WORKERS = 16
+EXECUTOR_PRIORITIES = ("trade", "state", "ui")
+# Сколько потоков пула одновременно может занять класс
+EXECUTOR_CLASS_LIMITS = {"trade": COMMAND_EXECUTOR_WORKERS, "state": 6, "ui": 4}
+# Размер очереди класса; сверх него задача отклоняется
+EXECUTOR_QUEUE_SIZES = {"trade": 1000, "state": 100, "ui": 100}
+
+# Выставление ордеров: отдельная HTTP-сессия с коротким таймаутом и без
+# внутренних повторов pybit; повторы - наши, по orderLinkId без дублей
+ORDER_TIMEOUT = 0.5
+ORDER_PLACE_ATTEMPTS = 4
+ORDER_PLACE_DEADLINE = 5
+ORDER_RETRY_DELAY = 0.2
+# Окно приёма запроса Bybit, мс: подписи идут по часам ClockService
+BYBIT_RECV_WINDOW = 5000
+
+# Синхронизация часов: замеров в окне, предел дрейфа, минимум секунд между
+# внеочередными замерами, смещение, о котором стоит предупредить (мс)
+CLOCK_SAMPLES = 16
+CLOCK_MAX_DRIFT_PPM = 500
+CLOCK_RESYNC_MIN_INTERVAL = 5
+CLOCK_SKEW_WARN_MS = 1000
+# Замеры старше (мс) не участвуют в оценке; скачок смещения больше порога
+# (мс, сверх RTT) - шаг часов (NTP, сон/пробуждение): окно замеров сбрасывается
+CLOCK_SAMPLE_MAX_AGE_MS = 10 * 60 * 1000
+CLOCK_STEP_MS = 100
+
+# Максимум ордеров в одном запросе place_batch_order (linear)
+ORDER_BATCH_LIMIT = 10
+
+# Лимиты запросов Bybit по группам эндпоинтов (запросов в секунду на аккаунт)
+BYBIT_RATE_LIMITS = {
+    "order": 10,
+    "order_query": 50,
+    "position": 50,
+    "account": 50,
+    "market": 120,
+}
+# Доля лимита группы, которую могут расходовать только торговые запросы
+BYBIT_RATE_RESERVE = 0.3
+# Сколько секунд низкоприоритетный запрос ждёт токен, прежде чем будет отброшен
+BYBIT_RATE_DEFER = 1.0
+
+# Повторы запросов к бирже: экспоненциальная задержка с джиттером
+RETRY_ATTEMPTS = 3
+RETRY_BASE_DELAY = 0.2
+RETRY_MAX_DELAY = 2.0
+RETRY_DEADLINE = 8.0
+# Circuit breaker группы эндпоинтов: ошибок подряд до отключения, секунд до пробного запроса
+BREAKER_FAILURES = 5
+BREAKER_RESET_TIMEOUT = 15
+
+# Общий снимок рынка: сколько секунд цена символа считается свежей
+MARKET_SNAPSHOT_TTL = 5
+
+# WebSocket Bybit
+BYBIT_WS_PUBLIC_URL = "wss://stream-testnet.bybit.com/v5/public/linear"
+BYBIT_WS_PRIVATE_URL = "wss://stream-testnet.bybit.com/v5/private"
+WS_PING_INTERVAL = 20
+WS_RECONNECT_DELAY = 1
+WS_RECONNECT_MAX_DELAY = 30
+WS_SUBSCRIBE_BATCH = 10
+
+# При живом приватном потоке REST-опрос ордеров/баланса/истории - только сверка
+STREAM_RECONCILE_INTERVAL = 300
+
+# Outbox отчётов мастеру
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_POLL_INTERVAL = 1.0
+OUTBOX_RETRY_BASE = 1.0
+OUTBOX_RETRY_MAX = 300
+OUTBOX_DRAIN_TIMEOUT = 10
+# Попыток до перевода записи в dead-letter; сколько секунд закрытие сделки
+# ждёт подтверждения её открытия мастером
+OUTBOX_MAX_ATTEMPTS = 20
+OUTBOX_CLOSE_WAIT_TIMEOUT = 3600
+# Сколько отчёт о рыночном ордере ждёт цену исполнения из приватного потока
+FILL_WAIT_TIMEOUT = 10
+
+# EventBus: события, для которых важен только последний снимок
+EVENT_COALESCED = (
+    "on_price_updated",
+    "on_positions_updated",
+    "on_orders_updated",
+    "on_history_updated",
+    "on_balance_updated",
+    "on_clock_skew",
+)
+EVENT_QUEUE_SIZE = 1000
+
+# Частота кадров отрисовки главного окна
+UI_RENDER_FPS = 15
+
+# Панель лога: размер кольцевого буфера и скорость вставки
+LOG_VIEW_MAX_LINES = 500
+LOG_VIEW_FLUSH_MS = 100
+LOG_VIEW_MAX_LINES_PER_TICK = 50
+LOG_VIEW_MAX_PENDING = 2000
+
+# Виртуальная таблица истории: запас строк сверху/снизу видимого окна
+HISTORY_VIEW_MARGIN = 20
+
+# Канал движок <-> UI (headless-движок и окно в разных процессах)
+IPC_HOST = "127.0.0.1"
+IPC_PORT = 47800
+IPC_KEY_FILE = "ipc.key"
+IPC_CALL_TIMEOUT = 30
+IPC_RECONNECT_DELAY = 2
+IPC_FORWARDED_EVENTS = EVENT_COALESCED + (
+    "on_api_status",
+    "on_bybit_status",
+    "on_ui_log",
+    "on_execution",
+)
+# Настройки с секретами не уходят в снимок для окна; у счетов - поля ключей
+IPC_SECRET_SETTINGS = ("bybit_api_key", "bybit_api_secret", "token")
+IPC_SECRET_ACCOUNT_FIELDS = ("api_key", "api_secret")
@@ -1,13 +1,21 @@
+import time
 from typing import Dict
 from services.price_service import PriceService
+from services.market_data import MarketSnapshot
 from services.balance_service import BalanceService
 from services.position_service import PositionService
 from services.order_service import OrderService
 from services.history_service import HistoryService
 from services.sync_service import SyncService
+from services.account_service import AccountService, AccountContext, PRIMARY_ACCOUNT
+from services.clock_service import ClockService
+from services.symbol_registry import SymbolRegistry
 from utils.helpers import timestamp_ms
-from utils.async_executor import AsyncExecutor
+from utils.async_executor import AsyncExecutor, KeyedExecutor, PriorityExecutor, PRIORITY_STATE
+from utils.resilience import is_quiet
 from api.bybit_api import BybitAPI
+from api.master_api import MasterAPIPool
+from api.websocket_client import WebSocketClient, PrivateWebSocketClient
 from config import (
     PRICE_UPDATE_INTERVAL,
     BALANCE_UPDATE_INTERVAL,
@@ -15,7 +23,10 @@ from config import (
     POLLING_INTERVAL,
     TOKEN_REFRESH_INTERVAL,
     HISTORY_UPDATE_INTERVAL,
-    HISTORY_ORDERS_LIMIT
+    HISTORY_BACKFILL_INTERVAL,
+    STREAM_RECONCILE_INTERVAL,
+    CLOCK_SYNC_INTERVAL,
+    CLOCK_SKEW_WARN_MS,
 )
 
 
@@ -28,29 +39,77 @@ class App:
         self.logger = logger
         self.db = db
 
-        # Async executor для параллельных операций
-        self.executor = AsyncExecutor(max_workers=10)
+        # Единый пул потоков: сделки > отчёты > состояние > данные UI
+        self.pool = PriorityExecutor()
+        # Параллельное обновление состояния (баланс, позиции, ордера)
+        self.executor = AsyncExecutor(self.pool, PRIORITY_STATE)
+        # Исполнение команд: параллельно по символам, по порядку внутри символа
+        self.command_executor = KeyedExecutor(executor=self.pool)
 
         # Инициализация репозиториев
         from database.repositories.symbol_repository import SymbolRepository
+        from database.repositories.trade_repo import TradeRepository
+        from database.repositories.order_history_repo import OrderHistoryRepository
+        from database.repositories.sync_state_repo import SyncStateRepository
         self.symbol_repo = SymbolRepository(db)
+        self.trade_repo = TradeRepository(db)
+        self.history_repo = OrderHistoryRepository(db)
+        # Чтение истории для UI - своё соединение: прокрутка не ждёт синхронизацию
+        from database.db import Database
+        self.history_view_db = Database(db.db_path, readonly=True)
+        self.history_view_repo = OrderHistoryRepository(self.history_view_db)
 
         # Инициализация сервисов
+        # Общий снимок цен: поток тикеров + один bulk-запрос вместо запроса на символ
+        self.market = MarketSnapshot(logger)
         self.price_service = PriceService(logger)
+        self.price_service.set_market(self.market)
         self.balance_service = BalanceService(logger)
         self.position_service = PositionService(logger)
         self.order_service = OrderService(logger)
         self.history_service = HistoryService(logger)
+        self.history_service.set_repository(self.history_repo, SyncStateRepository(db))
         self.sync_service = SyncService(logger)
+        # Дополнительные счета, на которые расходятся команды мастера
+        self.account_service = AccountService(logger)
+
+        # Смещение часов относительно Bybit/мастера; подписи pybit - по нему
+        self.clock = ClockService(logger)
+        self.clock.install()
+        self._clock_warned = False
+
+        # Общий keep-alive пул для мастер-API (авторизация + синхронизация)
+        self.master_pool = MasterAPIPool(on_response=self.clock.observe_master)
+        self.auth.set_master_pool(self.master_pool)
+        self.sync_service.set_master_pool(self.master_pool)
+
+        # Отчёты мастеру (логи, открытие/закрытие сделок) через outbox
+        from services.outbox_service import OutboxService
+        self.outbox = OutboxService(logger, db, self.master_api)
 
         # Bybit API
-        self.bybit = BybitAPI("", "")
+        self.bybit = BybitAPI("", "", executor=self.pool, clock=self.clock, logger=self.logger)
+        self.clock.set_bybit(self.bybit)
+        self.market.set_bybit(self.bybit)
         self.price_service.set_bybit(self.bybit)
         self.balance_service.set_bybit(self.bybit)
         self.position_service.set_bybit(self.bybit)
         self.order_service.set_bybit(self.bybit)
         self.history_service.set_bybit(self.bybit)
 
+        # Публичный поток цен; REST-опрос цен работает только пока он отключён
+        self.ws_client = WebSocketClient(logger)
+        self.ws_client.on_ticker(self._on_ticker)
+        self.ws_client.on_status(self._on_ws_status)
+
+        # Приватный поток создаётся в configure_bybit (нужны ключи)
+        self.private_stream = None
+        self._last_reconcile: Dict[str, float] = {}
+
+        # Спецификации символов в памяти: исполнение команд не ходит в БД
+        self.symbol_registry = SymbolRegistry(logger, self.symbol_repo)
+        self.symbol_registry.subscribe(self._on_symbols_changed)
+
         # Загружаем символы из БД
         self._load_symbols_from_db()
 
@@ -61,39 +120,65 @@ class App:
 
         # Trade Service
         from services.trade_service import TradeService
-        self.trade_service = TradeService(self.bybit, logger)
+        self.trade_service = TradeService(self.bybit, logger, self.market)
+
+    def master_api(self):
+        """Клиент мастер-API из общего пула с текущим URL и токеном"""
+        url = self.settings.get("api_url", "")
+        token = self.auth.get_token()
+        if not url or not token:
+            raise RuntimeError("API URL or token not configured")
+        return self.master_pool.get(url, token)
 
     def _load_symbols_from_db(self):
         try:
-            symbols_data = self.symbol_repo.get_active_symbols_data()
-            if symbols_data:
-                self.price_service.update_symbols(symbols_data)
-                self.logger.info(f"Loaded {len(symbols_data)} symbols from DB")
+            count = self.symbol_registry.load()
+            if count:
+                self.logger.info(f"Loaded {count} symbols from DB")
         except Exception as e:
             self.logger.error("Failed to load symbols from DB", {"error": str(e)})
 
+    def _on_symbols_changed(self, specs, changes):
+        """Набор символов изменился - цены и поток тикеров на новый список"""
+        self.price_service.update_symbols(list(specs))
+        self.ws_client.set_symbols(specs.keys())
+
     def start(self):
         if self.started:
             return
         self._schedule_tasks()
+        self.ws_client.start()
+        self.outbox.start()
         self.started = True
         self.events.emit("on_connected", {"ts": timestamp_ms()})
 
     def stop(self):
         self.scheduler.stop()
+        self.ws_client.stop()
+        if self.private_stream:
+            self.private_stream.stop()
         self.executor.shutdown()
+        self.command_executor.shutdown()
+        self.account_service.shutdown()
+        self.outbox.stop()
+        self.master_pool.close()
+        self.bybit.shutdown()
+        self.pool.shutdown()
         self.started = False
         self.events.emit("on_disconnected", {"ts": timestamp_ms()})
 
     def _schedule_tasks(self):
         # Сразу обновляем токен и пары при старте
         self._refresh_token()
-        self.scheduler.add_task("poll_status", POLLING_INTERVAL, self._poll_status)
+        # Опрос команд мастера не ждёт в пуле за HTTP-задачами (история, баланс)
+        self.scheduler.add_task("poll_status", POLLING_INTERVAL, self._poll_status, dedicated=True)
         self.scheduler.add_task("update_prices", PRICE_UPDATE_INTERVAL, self._update_prices)
         self.scheduler.add_task("update_balance", BALANCE_UPDATE_INTERVAL, self._update_balance)
         self.scheduler.add_task("update_orders", ORDERS_UPDATE_INTERVAL, self._update_orders)
         self.scheduler.add_task("update_history", HISTORY_UPDATE_INTERVAL, self._update_history)
+        self.scheduler.add_task("backfill_history", HISTORY_BACKFILL_INTERVAL, self._backfill_history)
         self.scheduler.add_task("refresh_token", TOKEN_REFRESH_INTERVAL, self._refresh_token)
+        self.scheduler.add_task("sync_clock", CLOCK_SYNC_INTERVAL, self._sync_clock)
         self.scheduler.start()
 
     def _poll_status(self):
@@ -115,28 +200,97 @@ class App:
             else:
                 self.logger.error("API polling error", {"error": error_str})
 
+    def _on_ticker(self, symbol: str, data: dict):
+        if self.price_service.apply_ticker(symbol, data):
+            self.events.emit("on_price_updated", self.price_service.get_all_prices())
+
+    def _on_ws_status(self, connected: bool):
+        if connected:
+            self.logger.info("Цены: поток WebSocket активен")
+        else:
+            self.logger.warning("Цены: WebSocket отключен, опрос REST")
+
     def _update_prices(self):
         if not self.connected_bybit:
             return
+        # Пока поток живой, цены приходят push-ом
+        if self.ws_client.is_connected():
+            return
         try:
             self.price_service.fetch_prices()
             self.events.emit("on_price_updated", self.price_service.get_all_prices())
         except Exception as e:
             self.logger.error("Update prices error", {"error": str(e)})
 
+    def _on_private_status(self, connected: bool):
+        if connected:
+            self.logger.info("Приватный поток Bybit активен, REST - только сверка")
+        else:
+            self.logger.warning("Приватный поток Bybit отключен, опрос REST")
+
+    def _on_stream_orders(self, updates: list):
+        if self.order_service.apply_order_updates(updates):
+            self.events.emit("on_orders_updated", self.order_service.get_all_orders())
+        if self.history_service.apply_order_updates(updates):
+            self.events.emit("on_history_updated", self.history_service.get_all_orders_history())
+
+    def _on_stream_positions(self, updates: list):
+        if self.position_service.apply_position_updates(updates):
+            self.events.emit("on_positions_updated", self.position_service.positions)
+
+    def _on_stream_executions(self, updates: list):
+        # Фактические цены исполнения - в придержанные отчёты мастеру
+        for order_id, fill in self.order_service.apply_executions(updates).items():
+            try:
+                self.outbox.apply_fill(order_id, fill)
+            except Exception as e:
+                self.logger.error("Apply fill error", {"order_id": order_id, "error": str(e)})
+        for e in updates:
+            self.logger.info("Исполнение", {
+                "symbol": e.get("symbol"),
+                "side": e.get("side"),
+                "qty": e.get("execQty"),
+                "price": e.get("execPrice"),
+                "order_id": e.get("orderId"),
+            })
+        self.events.emit("on_execution", list(updates))
+
+    def _on_stream_wallet(self, updates: list):
+        if self.balance_service.apply_wallet_update(updates):
+            self.events.emit("on_balance_updated", {
+                "wallet": self.balance_service.wallet_balance,
+                "trading": self.balance_service.trading_balance
+            })
+
+    def fills_streaming(self) -> bool:
+        """Приходят ли исполнения основного счёта из приватного потока"""
+        return self.private_stream is not None and self.private_stream.is_connected()
+
+    def _poll_due(self, name: str) -> bool:
+        """При живом приватном потоке REST-опрос выполняется только как редкая сверка"""
+        now = time.time()
+        stream_live = self.private_stream is not None and self.private_stream.is_connected()
+        if stream_live and now - self._last_reconcile.get(name, 0) < STREAM_RECONCILE_INTERVAL:
+            return False
+        self._last_reconcile[name] = now
+        return True
+
     def _update_balance(self):
         """Обновление баланса и позиций (параллельно)"""
         if not self.connected_bybit:
             return
+        # Торговый баланс задаётся в настройках и в потоке wallet его нет -
+        # обновляем на каждом интервале, даже когда REST-опрос пропускается
+        trading_changed = self._refresh_trading_balance()
+        if not self._poll_due("balance"):
+            if trading_changed:
+                self.events.emit("on_balance_updated", {
+                    "wallet": self.balance_service.wallet_balance,
+                    "trading": self.balance_service.trading_balance
+                })
+            return
 
         try:
-            # Сначала устанавливаем trading balance (быстрая операция)
-            try:
-                tb = float(self.settings.get("trading_balance", "0"))
-                self.balance_service.set_trading_balance(tb)
-            except Exception as e:
-                self.logger.error("Failed to set trading balance", {"error": str(e)})
-
             # Параллельное выполнение двух операций (balance и positions)
             tasks = {
                 'balance': lambda: self.balance_service.fetch_wallet_balance(),
@@ -164,15 +318,28 @@ class App:
                 self.logger.error("Failed to emit balance", {"error": str(e)})
 
         except Exception as e:
-            error_str = str(e)
-            # Не логируем таймауты как серьезные ошибки
-            if "timed out" not in error_str.lower() and "timeout" not in error_str.lower():
-                self.logger.error("Update balance error", {"error": error_str})
+            # Не логируем временные ошибки (таймауты, лимиты, отключённая цепь) как серьезные
+            if not is_quiet(e):
+                self.logger.error("Update balance error", {"error": str(e)})
+
+    def _refresh_trading_balance(self) -> bool:
+        """Торговый баланс из настроек; True если значение изменилось"""
+        try:
+            tb = float(self.settings.get("trading_balance", "0"))
+        except Exception as e:
+            self.logger.error("Failed to set trading balance", {"error": str(e)})
+            return False
+        if tb == self.balance_service.trading_balance:
+            return False
+        self.balance_service.set_trading_balance(tb)
+        return True
 
     def _update_orders(self):
         """Обновление ТОЛЬКО открытых ордеров"""
         if not self.connected_bybit:
             return
+        if not self._poll_due("orders"):
+            return
         try:
             # Получаем только открытые ордера
             self.order_service.fetch_open_orders()
@@ -187,16 +354,36 @@ class App:
         """Обновление истории ордеров (с интервалом 60с)"""
         if not self.connected_bybit:
             return
+        if not self._poll_due("history"):
+            return
         try:
-            # Получаем историю исполненных ордеров
-            self.history_service.fetch_orders_history(symbol=None, limit=HISTORY_ORDERS_LIMIT)
-
-            # Отправляем историю
-            history = self.history_service.get_all_orders_history()
-            self.events.emit("on_history_updated", history)
+            # Только новые исполнения с прошлой синхронизации; при ошибке история не меняется
+            if self.history_service.sync_history():
+                self.events.emit("on_history_updated", self.history_service.get_all_orders_history())
         except Exception as e:
             self.logger.error("Update history error", {"error": str(e)})
 
+    def _backfill_history(self):
+        """Фоновая догрузка старых страниц истории по одной"""
+        if not self.connected_bybit:
+            return
+        try:
+            if self.history_service.backfill_step():
+                self.events.emit("on_history_updated", self.history_service.get_all_orders_history())
+        except Exception as e:
+            self.logger.error("Backfill history error", {"error": str(e)})
+
+    def _sync_clock(self):
+        """Замер смещения часов; результат - в строку статуса"""
+        if not self.clock.sync():
+            return
+        snap = self.clock.snapshot()
+        skewed = abs(snap["offset_ms"]) > CLOCK_SKEW_WARN_MS
+        if skewed and not self._clock_warned:
+            self.logger.warning("Локальные часы расходятся с Bybit", snap)
+        self._clock_warned = skewed
+        self.events.emit("on_clock_skew", snap)
+
     def _refresh_token(self):
         try:
             token = self.auth.refresh_token()
@@ -211,30 +398,50 @@ class App:
             self.logger.error("Token refresh error", {"error": str(e)})
 
     def update_symbols(self, pairs: Dict[str, dict]):
-        """Обновляет символы в БД и в сервисе цен"""
+        """Обновляет символы в БД и реестре; подписчики получают изменения"""
         try:
-            self.symbol_repo.save_symbols(pairs)
-            active_symbols = self.symbol_repo.get_active_symbols_data()
-            self.price_service.update_symbols(active_symbols)
+            self.symbol_registry.update(pairs)
         except Exception as e:
             self.logger.error("Failed to update symbols", {"error": str(e)})
 
+    def command_targets(self, symbol: str):
+        """Счета, на которых исполняется команда по символу: основной + дополнительные"""
+        primary = AccountContext(PRIMARY_ACCOUNT, self.trade_service, self._primary_ratio, primary=True)
+        return [primary] + self.account_service.followers(symbol)
+
+    def _primary_ratio(self) -> float:
+        mb = float(self.balance_service.master_balance or 0.0)
+        tb = float(self.balance_service.trading_balance or 0.0)
+        return tb / mb if mb > 0 else 0.0
+
     def configure_bybit(self):
         key = self.settings.get("bybit_api_key", "")
         secret = self.settings.get("bybit_api_secret", "")
 
+        # Дополнительные счета не зависят от ключей основного
+        try:
+            self.account_service.configure(self.settings, self.balance_service, self.pool, self.market)
+        except Exception as e:
+            self.logger.error("Accounts configure error", {"error": str(e)})
+
         if not key or not secret:
             self.connected_bybit = False
+            self._restart_private_stream(key, secret)
             self.events.emit("on_bybit_status", {"status": False})
             return
 
-        self.bybit = BybitAPI(key, secret)
+        previous = self.bybit
+        self.bybit = BybitAPI(key, secret, executor=self.pool, clock=self.clock, logger=self.logger)
         self.bybit.connect()
+        # Часы - до первого подписанного запроса: окно recv_window узкое
+        self.clock.set_bybit(self.bybit)
+        self._sync_clock()
         self.connected_bybit = self.bybit.test_connection()
 
         self.events.emit("on_bybit_status", {"status": self.connected_bybit})
 
         # Обновляем ссылки на API во всех сервисах
+        self.market.set_bybit(self.bybit)
         self.price_service.set_bybit(self.bybit)
         self.balance_service.set_bybit(self.bybit)
         self.position_service.set_bybit(self.bybit)
@@ -242,7 +449,13 @@ class App:
         self.history_service.set_bybit(self.bybit)
 
         from services.trade_service import TradeService
-        self.trade_service = TradeService(self.bybit, self.logger)
+        self.trade_service = TradeService(self.bybit, self.logger, self.market)
+
+        # Старый клиент больше никем не используется - закрываем его соединения
+        if previous is not self.bybit:
+            previous.shutdown()
+
+        self._restart_private_stream(key, secret)
 
         if self.connected_bybit:
             self.logger.info("Bybit connected successfully")
@@ -251,6 +464,25 @@ class App:
         else:
             self.logger.warning(f"Bybit connection failed: {self.bybit.last_error}")
 
+    def _restart_private_stream(self, key: str, secret: str):
+        """Пересоздать приватный поток под текущие ключи"""
+        if self.private_stream:
+            self.private_stream.stop()
+            self.private_stream = None
+        self._last_reconcile.clear()
+
+        if not self.connected_bybit:
+            return
+
+        stream = PrivateWebSocketClient(self.logger, key, secret)
+        stream.on_status(self._on_private_status)
+        stream.on_topic("order", self._on_stream_orders)
+        stream.on_topic("position", self._on_stream_positions)
+        stream.on_topic("execution", self._on_stream_executions)
+        stream.on_topic("wallet", self._on_stream_wallet)
+        stream.start()
+        self.private_stream = stream
+
     def _initial_data_load(self):
         """Параллельная загрузка всех данных при подключении"""
         if not self.connected_bybit:
@@ -259,8 +491,7 @@ class App:
         try:
             # Сначала синхронно загружаем баланс для корректной инициализации
             self.balance_service.fetch_wallet_balance()
-            tb = float(self.settings.get("trading_balance", "0"))
-            self.balance_service.set_trading_balance(tb)
+            self._refresh_trading_balance()
 
             # Эмитим начальные значения баланса
             self.events.emit("on_balance_updated", {
@@ -273,7 +504,7 @@ class App:
                 'prices': lambda: self._update_prices(),
                 'orders': lambda: self._update_orders(),
                 'positions': lambda: self.position_service.fetch_positions(),
-                'history': lambda: self.history_service.fetch_orders_history()
+                'history': lambda: self.history_service.sync_history()
             }
             self.executor.run_parallel(tasks)
 
@@ -10,13 +10,23 @@ class AuthManager:
         self._token: Optional[str] = None
         self._info: Dict = {}
         self._pairs: Dict = {}
+        self.master_pool = None
+
+    def set_master_pool(self, pool):
+        """Установка общего пула HTTP-сессий мастер-API"""
+        self.master_pool = pool
+
+    def _api(self, url: str, token: Optional[str] = None) -> MasterAPI:
+        if self.master_pool:
+            return self.master_pool.get(url, token)
+        return MasterAPI(url, token)
 
     def login(self, url: str, uid: str) -> Tuple[str, Dict, Dict]:
         if not is_valid_url(url):
             raise ValueError("Invalid URL")
         if not is_valid_uuid(uid):
             raise ValueError("Invalid UID")
-        api = MasterAPI(url)
+        api = self._api(url)
         res = api.init(uid)
         self._token = res.get("token", "")
         info = res.get("info", {})
@@ -39,7 +49,7 @@ class AuthManager:
         if not uid:
              return self._token or ""
         try:
-            api = MasterAPI(url, self._token)
+            api = self._api(url, self._token)
             res = api.init(uid)
 
             new_token = res.get("token", "")
@@ -1,17 +1,155 @@
+import threading
+import time
+from collections import deque
+from config import EVENT_COALESCED, EVENT_QUEUE_SIZE
+
+
+class _Subscriber:
+    """
+    Подписчик со своей очередью и своим потоком доставки
+
+    Для "coalesced" событий хранится только последнее значение: если
+    обработчик не успевает, промежуточные снимки заменяются новыми.
+    Для остальных событий - ограниченная очередь, при переполнении
+    отбрасываются самые старые элементы.
+    """
+
+    def __init__(self, bus, event_name, callback, coalesce: bool, maxlen: int):
+        self.bus = bus
+        self.event_name = event_name
+        self.callback = callback
+        self.coalesce = coalesce
+        self._queue = deque(maxlen=maxlen)
+        self._latest = None
+        self._has_latest = False
+        self._cond = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, daemon=True, name=f"events:{event_name}")
+        self._thread.start()
+
+    def put(self, data):
+        with self._cond:
+            if self.coalesce:
+                if self._has_latest:
+                    self.bus._count(self.event_name, "coalesced")
+                self._latest = data
+                self._has_latest = True
+            else:
+                if len(self._queue) == self._queue.maxlen:
+                    self.bus._count(self.event_name, "dropped")
+                self._queue.append(data)
+            self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while self._running and not self._has_latest and not self._queue:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                if self.coalesce:
+                    data = self._latest
+                    self._latest = None
+                    self._has_latest = False
+                else:
+                    data = self._queue.popleft()
+            self.bus._deliver(self.event_name, self.callback, data)
+
+
 class EventBus:
-    def __init__(self):
+    """
+    Шина событий
+
+    По умолчанию (queued=False) обработчики вызываются синхронно в потоке
+    emit. В режиме queued=True у каждого подписчика своя очередь и поток
+    доставки, emit не ждёт обработчиков; события из EVENT_COALESCED
+    доставляются только в последнем значении.
+    """
+
+    def __init__(self, queued: bool = False, coalesce=EVENT_COALESCED, queue_size: int = EVENT_QUEUE_SIZE):
+        self.queued = queued
+        self.coalesce = set(coalesce)
+        self.queue_size = queue_size
         self._subs = {}
+        self._lock = threading.Lock()
+        self._stats = {}
 
     def subscribe(self, event_name, callback):
-        self._subs.setdefault(event_name, set()).add(callback)
+        with self._lock:
+            subs = self._subs.setdefault(event_name, {})
+            if callback in subs:
+                return
+            sub = None
+            if self.queued:
+                sub = _Subscriber(self, event_name, callback, event_name in self.coalesce, self.queue_size)
+            subs[callback] = sub
 
     def unsubscribe(self, event_name, callback):
-        if event_name in self._subs and callback in self._subs[event_name]:
-            self._subs[event_name].remove(callback)
+        with self._lock:
+            sub = self._subs.get(event_name, {}).pop(callback, None)
+        if sub is not None:
+            sub.stop()
 
     def emit(self, event_name, data):
-        for cb in list(self._subs.get(event_name, [])):
-            try:
-                cb(data)
-            except Exception:
-                pass
+        self._count(event_name, "emitted")
+        with self._lock:
+            subs = list(self._subs.get(event_name, {}).items())
+        for cb, sub in subs:
+            if sub is not None:
+                sub.put(data)
+            else:
+                self._deliver(event_name, cb, data)
+
+    def close(self):
+        """Остановить потоки доставки всех подписчиков"""
+        with self._lock:
+            subs = [sub for s in self._subs.values() for sub in s.values() if sub is not None]
+        for sub in subs:
+            sub.stop()
+
+    def get_stats(self) -> dict:
+        """Счётчики по событиям: emitted, delivered, coalesced, dropped, errors, время обработчиков"""
+        with self._lock:
+            return {name: dict(s) for name, s in self._stats.items()}
+
+    def _deliver(self, event_name, callback, data):
+        started = time.perf_counter()
+        error = None
+        try:
+            callback(data)
+        except Exception as e:
+            error = str(e)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            s = self._stats_for(event_name)
+            s["delivered"] += 1
+            s["handler_time_total"] += elapsed
+            s["handler_time_max"] = max(s["handler_time_max"], elapsed)
+            if error is not None:
+                s["errors"] += 1
+                s["last_error"] = error
+
+    def _count(self, event_name, key):
+        with self._lock:
+            self._stats_for(event_name)[key] += 1
+
+    def _stats_for(self, event_name):
+        s = self._stats.get(event_name)
+        if s is None:
+            s = {
+                "emitted": 0,
+                "delivered": 0,
+                "coalesced": 0,
+                "dropped": 0,
+                "errors": 0,
+                "last_error": None,
+                "handler_time_total": 0.0,
+                "handler_time_max": 0.0,
+            }
+            self._stats[event_name] = s
+        return s
@@ -0,0 +1,580 @@
+"""
+Канал между процессом движка (headless) и процессом окна
+
+Сообщения (pickle поверх multiprocessing.connection, доступ по ключу
+из data/ipc.key, только localhost):
+    UI -> движок:  ("call", id, method, args, kwargs) - ждёт ответа
+                   ("notify", method, args, kwargs)   - без ответа
+    движок -> UI:  ("result", id, ok, value)
+                   ("event", name, data)
+При подключении UI запрашивает снимок состояния, дальше получает события.
+"""
+import itertools
+import os
+import secrets
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from functools import partial
+from multiprocessing.connection import Listener, Client
+from pathlib import Path
+from core.events import EventBus
+from config import (
+    IPC_HOST,
+    IPC_PORT,
+    IPC_KEY_FILE,
+    IPC_CALL_TIMEOUT,
+    IPC_RECONNECT_DELAY,
+    IPC_FORWARDED_EVENTS,
+    IPC_SECRET_SETTINGS,
+    IPC_SECRET_ACCOUNT_FIELDS,
+    EVENT_COALESCED,
+    EVENT_QUEUE_SIZE,
+)
+
+
+def load_authkey(data_dir: Path, create: bool = False) -> bytes:
+    """Общий ключ канала; создаётся движком, читается окном"""
+    path = Path(data_dir) / IPC_KEY_FILE
+    if not path.exists():
+        if not create:
+            raise RuntimeError(f"IPC key not found: {path}")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(secrets.token_hex(32), encoding="utf-8")
+        try:
+            os.chmod(path, 0o600)
+        except OSError:
+            pass
+    return path.read_text(encoding="utf-8").strip().encode()
+
+
+class _ClientSession:
+    """
+    Подключённое окно на стороне движка
+
+    Обработчики событий только кладут данные в очередь сессии, отправкой
+    занимается отдельный поток, так что медленный или зависший UI не
+    задерживает потоки движка. Для coalesced-событий хранится только
+    последний снимок.
+    """
+
+    def __init__(self, server, conn, name: str):
+        self.server = server
+        self.conn = conn
+        self.name = name
+        self._send_lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._latest = {}
+        self._queue = deque(maxlen=EVENT_QUEUE_SIZE)
+        self._running = True
+        self._handlers = {}
+
+    def start(self):
+        for event_name in IPC_FORWARDED_EVENTS:
+            handler = partial(self.push, event_name)
+            self._handlers[event_name] = handler
+            self.server.app.events.subscribe(event_name, handler)
+        threading.Thread(target=self._write_loop, daemon=True, name=f"ipc-out:{self.name}").start()
+        threading.Thread(target=self._read_loop, daemon=True, name=f"ipc-in:{self.name}").start()
+
+    def close(self):
+        with self._cond:
+            if not self._running:
+                return
+            self._running = False
+            self._cond.notify()
+        for event_name, handler in self._handlers.items():
+            self.server.app.events.unsubscribe(event_name, handler)
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+        self.server._forget(self)
+
+    def push(self, event_name, data):
+        # Снимаем копию: сервисы продолжают менять свои списки/словари
+        if isinstance(data, list):
+            data = list(data)
+        elif isinstance(data, dict):
+            data = dict(data)
+        with self._cond:
+            if event_name in EVENT_COALESCED:
+                self._latest[event_name] = data
+            else:
+                self._queue.append((event_name, data))
+            self._cond.notify()
+
+    def send(self, msg) -> bool:
+        try:
+            with self._send_lock:
+                self.conn.send(msg)
+            return True
+        except (OSError, EOFError, ValueError):
+            self.close()
+            return False
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                while self._running and not self._latest and not self._queue:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                batch = list(self._queue)
+                self._queue.clear()
+                batch.extend(self._latest.items())
+                self._latest = {}
+            for event_name, data in batch:
+                if not self.send(("event", event_name, data)):
+                    return
+
+    def _read_loop(self):
+        while self._running:
+            try:
+                msg = self.conn.recv()
+            except (OSError, EOFError):
+                break
+            except Exception as e:
+                self.server.logger.warning("IPC: некорректное сообщение", {"client": self.name, "error": str(e)})
+                continue
+            kind = msg[0]
+            if kind == "call":
+                _, call_id, method, args, kwargs = msg
+                # Вызовы вроде configure_bybit долгие - не блокируем приём
+                threading.Thread(target=self._run_call, args=(call_id, method, args, kwargs), daemon=True).start()
+            elif kind == "notify":
+                _, method, args, kwargs = msg
+                try:
+                    self.server.dispatch(method, args, kwargs)
+                except Exception as e:
+                    self.server.logger.warning("IPC notify error", {"method": method, "error": str(e)})
+        self.close()
+
+    def _run_call(self, call_id, method, args, kwargs):
+        try:
+            value = self.server.dispatch(method, args, kwargs)
+            self.send(("result", call_id, True, value))
+        except Exception as e:
+            self.send(("result", call_id, False, str(e)))
+
+
+class EngineServer:
+    """
+    IPC-сервер движка: раздаёт окнам снимок состояния и события,
+    принимает от них команды пользователя
+    """
+
+    def __init__(self, app, data_dir: Path, host: str = IPC_HOST, port: int = IPC_PORT):
+        self.app = app
+        self.logger = app.logger
+        self.address = (host, port)
+        self._authkey = load_authkey(data_dir, create=True)
+        self._listener = None
+        self._thread = None
+        self._running = False
+        self._sessions = set()
+        self._lock = threading.Lock()
+        self._seq = itertools.count(1)
+        self._methods = {
+            "snapshot": self.snapshot,
+            "configure_bybit": self._configure_bybit,
+            "update_symbols": app.update_symbols,
+            "auth_login": app.auth.login,
+            "auth_logout": app.auth.logout,
+            "settings_set": app.settings.set,
+            "settings_delete": app.settings.delete,
+            "settings_save": app.settings.save,
+            "set_master_balance": self._set_master_balance,
+            "log": self._log,
+        }
+
+    def start(self):
+        if self._running:
+            return
+        self._listener = Listener(self.address, authkey=self._authkey)
+        self._running = True
+        self._thread = threading.Thread(target=self._accept_loop, daemon=True, name="ipc-accept")
+        self._thread.start()
+        self.logger.info("IPC: ожидание подключения окна", {"address": f"{self.address[0]}:{self.address[1]}"})
+
+    def stop(self):
+        if not self._running:
+            return
+        self._running = False
+        # accept() не прерывается закрытием сокета - будим его своим подключением
+        try:
+            Client(self.address, authkey=self._authkey).close()
+        except Exception:
+            pass
+        try:
+            self._listener.close()
+        except OSError:
+            pass
+        if self._thread:
+            self._thread.join(timeout=2)
+        with self._lock:
+            sessions = list(self._sessions)
+        for session in sessions:
+            session.close()
+
+    def dispatch(self, method: str, args=(), kwargs=None):
+        func = self._methods.get(method)
+        if func is None:
+            raise ValueError(f"Unknown IPC method: {method}")
+        return func(*args, **(kwargs or {}))
+
+    def snapshot(self) -> dict:
+        app = self.app
+        return {
+            "connected_api": app.connected_api,
+            "connected_bybit": app.connected_bybit,
+            "authenticated": app.auth.is_authenticated(),
+            "wallet": app.balance_service.wallet_balance,
+            "trading": app.balance_service.trading_balance,
+            "master": app.balance_service.master_balance,
+            "settings": self._public_settings(),
+            # Какие секреты заданы - окно не затирает их пустым полем
+            "secret_settings": [k for k in IPC_SECRET_SETTINGS if app.settings.get(k)],
+            "prices": app.price_service.get_all_prices(),
+            "positions": list(app.position_service.positions),
+            "orders": app.order_service.get_all_orders(),
+            "history": app.history_service.get_all_orders_history(),
+            "clock": app.clock.snapshot(),
+            "db_path": str(app.db.db_path),
+        }
+
+    def _public_settings(self) -> dict:
+        """Настройки для окна без ключей Bybit и токена"""
+        settings = self.app.settings
+        public = {}
+        for key in settings.keys():
+            if key in IPC_SECRET_SETTINGS:
+                continue
+            value = settings.get(key)
+            if key == "accounts" and isinstance(value, list):
+                value = [
+                    {f: v for f, v in acc.items() if f not in IPC_SECRET_ACCOUNT_FIELDS} if isinstance(acc, dict) else acc
+                    for acc in value
+                ]
+            public[key] = value
+        return public
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                if not self._running:
+                    return
+                continue
+            except Exception as e:
+                # Неверный ключ и т.п.
+                self.logger.warning("IPC: подключение отклонено", {"error": str(e)})
+                continue
+            if not self._running:
+                conn.close()
+                return
+            session = _ClientSession(self, conn, f"ui-{next(self._seq)}")
+            with self._lock:
+                self._sessions.add(session)
+            session.start()
+            self.logger.info("IPC: окно подключено", {"client": session.name})
+
+    def _forget(self, session):
+        with self._lock:
+            if session not in self._sessions:
+                return
+            self._sessions.discard(session)
+        if self._running:
+            self.logger.info("IPC: окно отключено", {"client": session.name})
+
+    def _configure_bybit(self) -> bool:
+        self.app.configure_bybit()
+        return self.app.connected_bybit
+
+    def _set_master_balance(self, value):
+        self.app.balance_service.master_balance = float(value)
+
+    def _log(self, level: str, message: str, data=None):
+        write = getattr(self.logger, str(level).lower(), self.logger.info)
+        write(message, data)
+
+
+class _RemoteSettings:
+    """
+    Настройки движка: чтение из локальной копии, запись через канал
+
+    Секреты (IPC_SECRET_SETTINGS) в копию не приходят: окно видит их
+    пустыми, и пустое значение заданного на движке секрета не записывается.
+    """
+
+    def __init__(self, app):
+        self._app = app
+        self._data = {}
+        self._secrets = set()
+
+    def get(self, key: str, default=None):
+        return self._data.get(key, default)
+
+    def set(self, key: str, value, secure: bool = False):
+        if key in self._secrets and not value:
+            return
+        self._app.call("settings_set", key, value, secure=secure)
+        if key in IPC_SECRET_SETTINGS:
+            self._secrets.add(key)
+            return
+        self._data[key] = value
+
+    def delete(self, key: str):
+        self._app.call("settings_delete", key)
+        self._data.pop(key, None)
+        self._secrets.discard(key)
+
+    def keys(self):
+        return list(self._data.keys())
+
+    def save(self):
+        self._app.call("settings_save")
+
+    def load(self):
+        pass
+
+
+class _RemoteAuth:
+    def __init__(self, app):
+        self._app = app
+        self._authenticated = False
+
+    def login(self, url: str, uid: str):
+        result = self._app.call("auth_login", url, uid)
+        self._authenticated = True
+        return result
+
+    def logout(self):
+        self._app.call("auth_logout")
+        self._authenticated = False
+
+    def is_authenticated(self) -> bool:
+        return self._authenticated
+
+    def load_session(self):
+        # Сессией владеет движок, состояние приходит в снимке
+        pass
+
+
+class _RemoteBalance:
+    def __init__(self, app):
+        self._app = app
+        self.wallet_balance = 0.0
+        self.trading_balance = 0.0
+        self._master_balance = 0.0
+
+    @property
+    def master_balance(self) -> float:
+        return self._master_balance
+
+    @master_balance.setter
+    def master_balance(self, value):
+        self._app.call("set_master_balance", value)
+        self._master_balance = float(value)
+
+    def validate_trading_balance(self, amount: float) -> bool:
+        return float(amount) <= self.wallet_balance
+
+
+class _RemoteLogger:
+    """Логи окна пишутся движком в общий файл и возвращаются событием on_ui_log"""
+
+    def __init__(self, app):
+        self._app = app
+
+    def debug(self, message: str, data: dict | None = None):
+        self._app.notify("log", "DEBUG", message, data)
+
+    def info(self, message: str, data: dict | None = None):
+        self._app.notify("log", "INFO", message, data)
+
+    def warning(self, message: str, data: dict | None = None):
+        self._app.notify("log", "WARNING", message, data)
+
+    def error(self, message: str, data: dict | None = None):
+        self._app.notify("log", "ERROR", message, data)
+
+    def set_sink(self, callback):
+        pass
+
+
+class RemoteApp:
+    """
+    Заместитель App для окна, подключённого к движку в другом процессе
+
+    Повторяет ту часть интерфейса App, которой пользуются окна и фреймы.
+    Состояние приходит снимком при подключении и событиями после него;
+    команды (настройки, вход/выход, configure_bybit) выполняет движок.
+    Закрытие окна или разрыв связи торговлю не останавливают.
+    """
+
+    remote = True
+
+    def __init__(self, data_dir: Path, host: str = IPC_HOST, port: int = IPC_PORT):
+        self.address = (host, port)
+        self._authkey = load_authkey(data_dir)
+        self.events = EventBus(queued=True)
+        self.logger = _RemoteLogger(self)
+        self.settings = _RemoteSettings(self)
+        self.auth = _RemoteAuth(self)
+        self.balance_service = _RemoteBalance(self)
+        self.connected_api = False
+        self.connected_bybit = False
+        self.started = False
+        self.db = None
+        self.history_view_repo = None
+        self._conn = None
+        self._send_lock = threading.Lock()
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._running = False
+
+    def connect(self):
+        """Подключиться к движку и загрузить снимок состояния"""
+        self._conn = Client(self.address, authkey=self._authkey)
+        self._running = True
+        threading.Thread(target=self._read_loop, args=(self._conn,), daemon=True, name="ipc-in").start()
+        self._apply_snapshot(self.call("snapshot"))
+
+    def start(self):
+        """Движок уже работает - только раздаём окну текущее состояние"""
+        snap = self.call("snapshot")
+        self._apply_snapshot(snap)
+        self.events.emit("on_api_status", {"status": snap["connected_api"]})
+        self.events.emit("on_bybit_status", {"status": snap["connected_bybit"]})
+        self.events.emit("on_balance_updated", {"wallet": snap["wallet"], "trading": snap["trading"]})
+        self.events.emit("on_price_updated", snap["prices"])
+        self.events.emit("on_positions_updated", snap["positions"])
+        self.events.emit("on_orders_updated", snap["orders"])
+        self.events.emit("on_history_updated", snap["history"])
+        if snap.get("clock"):
+            self.events.emit("on_clock_skew", snap["clock"])
+        self.started = True
+
+    def stop(self):
+        """Отключиться от движка (движок продолжает работу)"""
+        self._running = False
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except OSError:
+                pass
+        self._fail_pending("IPC connection closed")
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def configure_bybit(self):
+        self.connected_bybit = bool(self.call("configure_bybit"))
+
+    def update_symbols(self, pairs):
+        self.call("update_symbols", pairs)
+
+    def call(self, method: str, *args, **kwargs):
+        call_id = next(self._ids)
+        fut = Future()
+        with self._pending_lock:
+            self._pending[call_id] = fut
+        try:
+            self._send(("call", call_id, method, args, kwargs))
+            return fut.result(timeout=IPC_CALL_TIMEOUT)
+        finally:
+            with self._pending_lock:
+                self._pending.pop(call_id, None)
+
+    def notify(self, method: str, *args, **kwargs):
+        try:
+            self._send(("notify", method, args, kwargs))
+        except (OSError, ConnectionError):
+            pass
+
+    def _send(self, msg):
+        conn = self._conn
+        if conn is None:
+            raise ConnectionError("Not connected to engine")
+        try:
+            with self._send_lock:
+                conn.send(msg)
+        except (OSError, ValueError) as e:
+            raise ConnectionError(str(e))
+
+    def _apply_snapshot(self, snap: dict):
+        self.connected_api = snap.get("connected_api", False)
+        self.connected_bybit = snap.get("connected_bybit", False)
+        self.auth._authenticated = snap.get("authenticated", False)
+        self.balance_service.wallet_balance = snap.get("wallet", 0.0)
+        self.balance_service.trading_balance = snap.get("trading", 0.0)
+        self.balance_service._master_balance = snap.get("master", 0.0)
+        self.settings._data = dict(snap.get("settings") or {})
+        self.settings._secrets = set(snap.get("secret_settings") or ())
+        if self.db is None and snap.get("db_path"):
+            # История читается из той же SQLite, пишет в неё только движок
+            from database.db import Database
+            from database.repositories.order_history_repo import OrderHistoryRepository
+            self.db = Database(Path(snap["db_path"]), readonly=True)
+            self.history_view_repo = OrderHistoryRepository(self.db)
+
+    def _read_loop(self, conn):
+        while True:
+            try:
+                msg = conn.recv()
+            except (OSError, EOFError):
+                break
+            kind = msg[0]
+            if kind == "result":
+                _, call_id, ok, value = msg
+                with self._pending_lock:
+                    fut = self._pending.get(call_id)
+                if fut is not None:
+                    if ok:
+                        fut.set_result(value)
+                    else:
+                        fut.set_exception(RuntimeError(value))
+            elif kind == "event":
+                _, event_name, data = msg
+                self._track(event_name, data)
+                self.events.emit(event_name, data)
+
+        self._fail_pending("IPC connection lost")
+        if self._running and conn is self._conn:
+            self.connected_api = False
+            self.events.emit("on_api_status", {"status": False})
+            self.events.emit("on_ui_log", {"level": "WARNING", "message": "Связь с движком потеряна, переподключение...",
+                                           "data": {}, "ts": int(time.time() * 1000)})
+            threading.Thread(target=self._reconnect, daemon=True, name="ipc-reconnect").start()
+
+    def _reconnect(self):
+        while self._running:
+            time.sleep(IPC_RECONNECT_DELAY)
+            try:
+                self.connect()
+                self.start()
+                self.logger.info("IPC: окно переподключено к движку")
+                return
+            except Exception:
+                continue
+
+    def _track(self, event_name: str, data):
+        if event_name == "on_api_status":
+            self.connected_api = data.get("status", False)
+        elif event_name == "on_bybit_status":
+            self.connected_bybit = data.get("status", False)
+        elif event_name == "on_balance_updated":
+            self.balance_service.wallet_balance = data.get("wallet", self.balance_service.wallet_balance)
+            self.balance_service.trading_balance = data.get("trading", self.balance_service.trading_balance)
+
+    def _fail_pending(self, reason: str):
+        with self._pending_lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for fut in pending:
+            if not fut.done():
+                fut.set_exception(ConnectionError(reason))
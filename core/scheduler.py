@@ -1,39 +1,167 @@
+import heapq
+import itertools
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from config import SCHEDULER_WORKERS, SCHEDULER_LATE_WARNING
 
 
 class Scheduler:
-    def __init__(self, logger):
+    """
+    Планировщик периодических задач
+
+    Дедлайны хранятся в куче, поток планировщика спит на Condition до
+    ближайшего из них и передаёт задачу в пул воркеров, поэтому медленная
+    задача не задерживает остальные. Одна и та же задача не запускается
+    повторно, пока не завершился предыдущий запуск. Период считается от
+    дедлайна, а не от момента запуска, так что расписание не "плывёт".
+    Задача с dedicated=True выполняется в собственном потоке и не ждёт
+    в очереди пула за задачами, заблокированными на HTTP.
+    """
+
+    def __init__(self, logger, max_workers: int = SCHEDULER_WORKERS):
         self.logger = logger
+        self.max_workers = max_workers
         self.tasks = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
         self._running = False
         self._thread = None
+        self._pool = None
+        # Отдельный поток для каждой dedicated-задачи
+        self._lanes = {}
 
-    def add_task(self, name, interval, callback):
-        self.tasks[name] = {"interval": interval, "callback": callback, "next": time.time() + interval}
+    def add_task(self, name, interval, callback, dedicated: bool = False):
+        with self._cond:
+            old = self.tasks.get(name)
+            task = {
+                "interval": interval,
+                "callback": callback,
+                "dedicated": dedicated,
+                "next": time.monotonic() + interval,
+                "gen": (old["gen"] + 1) if old else 0,
+                "running": False,
+                "stats": old["stats"] if old else self._empty_stats(),
+            }
+            self.tasks[name] = task
+            heapq.heappush(self._heap, (task["next"], next(self._seq), name, task["gen"]))
+            self._cond.notify()
 
     def remove_task(self, name):
-        if name in self.tasks:
-            del self.tasks[name]
+        with self._cond:
+            if name in self.tasks:
+                # Запись в куче станет "устаревшей" и будет пропущена
+                del self.tasks[name]
+                lane = self._lanes.pop(name, None)
+                if lane:
+                    lane.shutdown(wait=False)
+                self._cond.notify()
 
     def start(self):
         if self._running:
             return
         self._running = True
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="scheduler")
         self._thread = threading.Thread(target=self._loop, daemon=True)
         self._thread.start()
 
-    def stop(self):
-        self._running = False
+    def stop(self, wait: bool = True):
+        """Остановить планировщик; при wait=True дождаться выполняющихся задач"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self._thread = None
+        with self._cond:
+            pools = list(self._lanes.values()) + ([self._pool] if self._pool else [])
+            self._lanes = {}
+            self._pool = None
+        for pool in pools:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+    def get_stats(self) -> dict:
+        """Статистика по задачам: число запусков, время выполнения, опоздание старта"""
+        with self._cond:
+            return {name: dict(t["stats"], running=t["running"]) for name, t in self.tasks.items()}
+
+    @staticmethod
+    def _empty_stats():
+        return {
+            "runs": 0,
+            "errors": 0,
+            "skipped": 0,
+            "last_duration": 0.0,
+            "max_duration": 0.0,
+            "last_lateness": 0.0,
+            "max_lateness": 0.0,
+        }
 
     def _loop(self):
-        while self._running:
-            now = time.time()
-            for name, t in list(self.tasks.items()):
-                if now >= t["next"]:
-                    try:
-                        t["callback"]()
-                    except Exception as e:
-                        self.logger.error("Scheduler task error", {"task": name, "error": str(e)})
-                    t["next"] = now + t["interval"]
-            time.sleep(0.1)
+        while True:
+            with self._cond:
+                if not self._running:
+                    return
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                deadline, _, name, gen = self._heap[0]
+                now = time.monotonic()
+                if deadline > now:
+                    self._cond.wait(deadline - now)
+                    continue
+                heapq.heappop(self._heap)
+
+                task = self.tasks.get(name)
+                if task is None or task["gen"] != gen:
+                    continue
+
+                # Следующий дедлайн - от текущего; пропущенные периоды не догоняем
+                interval = task["interval"]
+                nxt = deadline + interval
+                if nxt <= now:
+                    nxt = now + interval - ((now - deadline) % interval)
+                task["next"] = nxt
+                heapq.heappush(self._heap, (nxt, next(self._seq), name, gen))
+
+                if task["running"]:
+                    task["stats"]["skipped"] += 1
+                    continue
+                task["running"] = True
+                pool = self._pool
+                if task["dedicated"] and pool is not None:
+                    pool = self._lanes.get(name)
+                    if pool is None:
+                        pool = self._lanes[name] = ThreadPoolExecutor(
+                            max_workers=1, thread_name_prefix=f"scheduler-{name}"
+                        )
+
+            try:
+                pool.submit(self._run_task, name, task, deadline)
+            except (RuntimeError, AttributeError):
+                # Пул уже остановлен
+                with self._cond:
+                    task["running"] = False
+                return
+
+    def _run_task(self, name, task, deadline):
+        started = time.monotonic()
+        stats = task["stats"]
+        if started - deadline > SCHEDULER_LATE_WARNING:
+            self.logger.warning("Scheduler task started late", {"task": name, "late_s": round(started - deadline, 3)})
+        try:
+            task["callback"]()
+        except Exception as e:
+            stats["errors"] += 1
+            self.logger.error("Scheduler task error", {"task": name, "error": str(e)})
+        finally:
+            duration = time.monotonic() - started
+            lateness = started - deadline
+            with self._cond:
+                task["running"] = False
+                stats["runs"] += 1
+                stats["last_duration"] = duration
+                stats["max_duration"] = max(stats["max_duration"], duration)
+                stats["last_lateness"] = lateness
+                stats["max_lateness"] = max(stats["max_lateness"], lateness)
@@ -1,36 +1,60 @@
 import sqlite3
+import threading
 from pathlib import Path
 from config import DATABASE_NAME
 
 
 class Database:
-    def __init__(self, db_path: Path):
+    def __init__(self, db_path: Path, readonly: bool = False):
         self.db_path = db_path
+        self.readonly = readonly
         self.conn = None
+        # Одно соединение на все потоки - операции сериализуются
+        self._lock = threading.RLock()
         self._connect()
 
     def _connect(self):
-        self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        if self.readonly:
+            # Отдельное соединение только для чтения (UI): не ждёт блокировку
+            # пишущего соединения, в WAL не ждёт и его транзакции
+            self.conn = sqlite3.connect(f"{self.db_path.resolve().as_uri()}?mode=ro", uri=True,
+                                        check_same_thread=False)
+        else:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            # WAL: читатели из других соединений не блокируются записью
+            self.conn.execute("PRAGMA journal_mode=WAL")
         self.conn.row_factory = sqlite3.Row
 
     def execute(self, sql: str, params: tuple = ()):
-        cur = self.conn.cursor()
-        cur.execute(sql, params)
-        self.conn.commit()
-        return cur
+        with self._lock:
+            cur = self.conn.cursor()
+            cur.execute(sql, params)
+            self.conn.commit()
+            return cur
+
+    def executemany(self, sql: str, seq_of_params):
+        """Пакетная запись одной транзакцией"""
+        with self._lock:
+            cur = self.conn.cursor()
+            cur.executemany(sql, seq_of_params)
+            self.conn.commit()
+            return cur
 
     def fetch_one(self, sql: str, params: tuple = ()):
-        cur = self.conn.cursor()
-        cur.execute(sql, params)
-        return cur.fetchone()
+        with self._lock:
+            cur = self.conn.cursor()
+            cur.execute(sql, params)
+            return cur.fetchone()
 
     def fetchall(self, sql: str, params: tuple = ()):
-        cur = self.conn.cursor()
-        cur.execute(sql, params)
-        return cur.fetchall()
+        with self._lock:
+            cur = self.conn.cursor()
+            cur.execute(sql, params)
+            return cur.fetchall()
 
     def close(self):
-        if self.conn:
-            self.conn.close()
-            self.conn = None
+        with self._lock:
+            if self.conn:
+                self.conn.close()
+                self.conn = None
@@ -57,10 +57,56 @@ def migrations_sql():
             status INTEGER DEFAULT 1,
             updated_at TIMESTAMP
         );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY,
+            kind TEXT,
+            payload TEXT,
+            attempts INTEGER DEFAULT 0,
+            next_attempt_at INTEGER,
+            last_error TEXT,
+            created_at INTEGER,
+            ref TEXT,
+            filled_at INTEGER,
+            dead_at INTEGER
+        );
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_outbox_next_attempt ON outbox(next_attempt_at);
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_outbox_ref ON outbox(ref);
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS order_history (
+            order_id TEXT PRIMARY KEY,
+            symbol TEXT,
+            side TEXT,
+            order_type TEXT,
+            qty REAL,
+            price REAL,
+            avg_price REAL,
+            status TEXT,
+            created_time INTEGER,
+            updated_time INTEGER
+        );
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_order_history_updated ON order_history(updated_time);
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_order_history_symbol ON order_history(symbol, updated_time);
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_order_history_side ON order_history(side, updated_time);
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_order_history_status ON order_history(status, updated_time);
         """
     ]
 
 
 def run_migrations(db):
     for sql in migrations_sql():
-        db.execute(sql)
\ No newline at end of file
+        db.execute(sql)
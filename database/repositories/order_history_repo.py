@@ -0,0 +1,120 @@
+from typing import Dict, List, Optional
+
+
+def _float(value) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _int(value) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+class OrderHistoryRepository:
+    """
+    Локальная история ордеров (таблица order_history)
+
+    Сортировка и фильтры выполняются в SQL по индексам, строки
+    возвращаются в формате ответа Bybit (orderId, orderStatus, ...).
+    """
+
+    # Колонка таблицы UI -> выражение сортировки
+    SORT_COLUMNS = {
+        "id": "order_id",
+        "time": "updated_time",
+        "symbol": "symbol",
+        "side": "side",
+        "type": "order_type",
+        "qty": "qty",
+        "price": "CASE WHEN avg_price > 0 THEN avg_price ELSE price END",
+        "status": "status",
+    }
+
+    def __init__(self, db):
+        self.db = db
+
+    def upsert_orders(self, orders: List[Dict]):
+        rows = []
+        for o in orders:
+            order_id = o.get("orderId")
+            if not order_id:
+                continue
+            rows.append((
+                order_id,
+                o.get("symbol", ""),
+                o.get("side", ""),
+                o.get("orderType", ""),
+                _float(o.get("qty")),
+                _float(o.get("price")),
+                _float(o.get("avgPrice")),
+                o.get("orderStatus", ""),
+                _int(o.get("createdTime")),
+                _int(o.get("updatedTime") or o.get("createdTime")),
+            ))
+        if rows:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO order_history (order_id, symbol, side, order_type, qty, price, avg_price, status, created_time, updated_time) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    @staticmethod
+    def _where(filters: Optional[Dict]):
+        clauses = []
+        params = []
+        filters = filters or {}
+        for key, column in (("symbol", "symbol"), ("side", "side"), ("status", "status")):
+            if filters.get(key):
+                clauses.append(f"{column} = ?")
+                params.append(filters[key])
+        if filters.get("since_ms"):
+            clauses.append("updated_time >= ?")
+            params.append(int(filters["since_ms"]))
+        where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+        return where, tuple(params)
+
+    def count(self, filters: Optional[Dict] = None) -> int:
+        where, params = self._where(filters)
+        row = self.db.fetch_one(f"SELECT COUNT(*) AS cnt FROM order_history{where}", params)
+        return int(row["cnt"]) if row else 0
+
+    def fetch_page(self, filters: Optional[Dict] = None, sort: str = "time", descending: bool = True,
+                   offset: int = 0, limit: int = 50) -> List[Dict]:
+        where, params = self._where(filters)
+        order_expr = self.SORT_COLUMNS.get(sort, "updated_time")
+        direction = "DESC" if descending else "ASC"
+        rows = self.db.fetchall(
+            f"SELECT * FROM order_history{where} ORDER BY {order_expr} {direction}, order_id {direction} LIMIT ? OFFSET ?",
+            params + (int(limit), int(offset)),
+        )
+        return [self._to_order(r) for r in rows]
+
+    def fetch_latest(self, limit: int) -> List[Dict]:
+        return self.fetch_page(limit=limit)
+
+    def get_symbols(self) -> List[str]:
+        rows = self.db.fetchall("SELECT DISTINCT symbol FROM order_history ORDER BY symbol")
+        return [r["symbol"] for r in rows if r["symbol"]]
+
+    def get_statuses(self) -> List[str]:
+        rows = self.db.fetchall("SELECT DISTINCT status FROM order_history ORDER BY status")
+        return [r["status"] for r in rows if r["status"]]
+
+    @staticmethod
+    def _to_order(r) -> Dict:
+        return {
+            "orderId": r["order_id"],
+            "symbol": r["symbol"],
+            "side": r["side"],
+            "orderType": r["order_type"],
+            "qty": r["qty"],
+            "price": r["price"],
+            "avgPrice": r["avg_price"],
+            "orderStatus": r["status"],
+            "createdTime": r["created_time"],
+            "updatedTime": r["updated_time"],
+        }
@@ -0,0 +1,78 @@
+import json
+import time
+
+
+class OutboxRepository:
+    def __init__(self, db):
+        self.db = db
+
+    def add(self, kind: str, payload: dict, ref: str | None = None, hold_ms: int = 0) -> int:
+        ts = int(time.time() * 1000)
+        cur = self.db.execute(
+            "INSERT INTO outbox(kind, payload, attempts, next_attempt_at, created_at, ref) VALUES(?,?,0,?,?,?)",
+            (kind, json.dumps(payload, ensure_ascii=False), ts + hold_ms, ts, ref),
+        )
+        return cur.lastrowid
+
+    def fetch_unfilled(self, ref: str):
+        """Записи ордера ref, в которые ещё не подставлено исполнение"""
+        rows = self.db.fetchall(
+            "SELECT * FROM outbox WHERE ref = ? AND filled_at IS NULL ORDER BY id ASC", (ref,)
+        )
+        return [self._entry(r) for r in rows]
+
+    def set_filled(self, entry_id: int, payload: dict, next_attempt_at: int):
+        """Сохранить отчёт с ценой исполнения; отметка filled_at мастеру не уходит"""
+        self.db.execute(
+            "UPDATE outbox SET payload = ?, next_attempt_at = ?, filled_at = ? WHERE id = ?",
+            (json.dumps(payload, ensure_ascii=False), next_attempt_at, int(time.time() * 1000), entry_id),
+        )
+
+    def fetch_due(self, now_ms: int, limit: int):
+        rows = self.db.fetchall(
+            "SELECT * FROM outbox WHERE dead_at IS NULL AND next_attempt_at <= ? ORDER BY id ASC LIMIT ?",
+            (now_ms, limit),
+        )
+        return [self._entry(r) for r in rows]
+
+    @staticmethod
+    def _entry(r) -> dict:
+        try:
+            payload = json.loads(r["payload"] or "{}")
+        except ValueError:
+            payload = {}
+        return {"id": r["id"], "kind": r["kind"], "payload": payload, "attempts": r["attempts"],
+                "next_attempt_at": r["next_attempt_at"], "created_at": r["created_at"]}
+
+    def delete(self, entry_id: int):
+        self.db.execute("DELETE FROM outbox WHERE id = ?", (entry_id,))
+
+    def reschedule(self, entry_id: int, next_attempt_at: int, attempts: int, error: str):
+        self.db.execute(
+            "UPDATE outbox SET next_attempt_at = ?, attempts = ?, last_error = ? WHERE id = ?",
+            (next_attempt_at, attempts, error, entry_id),
+        )
+
+    def mark_dead(self, entry_id: int, attempts: int, error: str):
+        """Dead-letter: запись больше не отправляется, но остаётся для разбора"""
+        self.db.execute(
+            "UPDATE outbox SET dead_at = ?, attempts = ?, last_error = ? WHERE id = ?",
+            (int(time.time() * 1000), attempts, error, entry_id),
+        )
+
+    def has_pending(self, kind: str, local_trade_id: int) -> bool:
+        """Есть ли живая запись kind по локальной сделке"""
+        row = self.db.fetch_one(
+            "SELECT id FROM outbox WHERE kind = ? AND dead_at IS NULL "
+            "AND json_extract(payload, '$.local_trade_id') = ? LIMIT 1",
+            (kind, local_trade_id),
+        )
+        return row is not None
+
+    def count_pending(self) -> int:
+        row = self.db.fetch_one("SELECT COUNT(*) AS cnt FROM outbox WHERE dead_at IS NULL")
+        return int(row["cnt"]) if row else 0
+
+    def count_dead(self) -> int:
+        row = self.db.fetch_one("SELECT COUNT(*) AS cnt FROM outbox WHERE dead_at IS NOT NULL")
+        return int(row["cnt"]) if row else 0
@@ -0,0 +1,30 @@
+import json
+
+
+class SyncStateRepository:
+    """
+    Курсоры инкрементальной синхронизации с биржей
+
+    Хранятся в таблице settings (ключ -> JSON), переживают перезапуск.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def get(self, key: str, default=None):
+        row = self.db.fetch_one("SELECT value FROM settings WHERE key = ?", (key,))
+        if not row or row["value"] is None:
+            return default
+        try:
+            return json.loads(row["value"])
+        except (TypeError, ValueError):
+            return default
+
+    def set(self, key: str, value):
+        self.db.execute(
+            "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+            (key, json.dumps(value)),
+        )
+
+    def delete(self, key: str):
+        self.db.execute("DELETE FROM settings WHERE key = ?", (key,))
@@ -7,3 +7,40 @@ class TradeRepository:
             "INSERT INTO trades(master_trade_id, server_trade_id, symbol, side, entry_qty, entry_price, status, opened_at) VALUES(?,?,?,?,?,?,?,CURRENT_TIMESTAMP)",
             (master_trade_id, server_trade_id, symbol, side, entry_qty, entry_price, status),
         )
+
+    def open_local(self, symbol: str, side: str, entry_qty: float, entry_price: float, opened_at: int) -> int:
+        """Локальная запись об открытой сделке; server_trade_id проставится после ответа мастера"""
+        cur = self.db.execute(
+            "INSERT INTO trades (symbol, side, entry_qty, entry_price, status, opened_at) VALUES (?, ?, ?, ?, 'open', ?)",
+            (symbol, side, entry_qty, entry_price, opened_at),
+        )
+        return cur.lastrowid
+
+    def find_oldest_open(self, symbol: str):
+        """Самая старая открытая сделка по символу (FIFO)"""
+        return self.db.fetch_one(
+            "SELECT * FROM trades WHERE symbol = ? AND status = 'open' ORDER BY opened_at ASC, id ASC LIMIT 1",
+            (symbol,),
+        )
+
+    def close_local(self, trade_id: int, exit_qty: float, exit_price: float, closed_at: int):
+        self.db.execute(
+            "UPDATE trades SET status = 'closed', closed_at = ?, exit_price = ?, exit_qty = ? WHERE id = ?",
+            (closed_at, exit_price, exit_qty, trade_id),
+        )
+
+    def set_entry_price(self, trade_id: int, entry_price: float):
+        self.db.execute("UPDATE trades SET entry_price = ? WHERE id = ?", (entry_price, trade_id))
+
+    def set_exit_price(self, trade_id: int, exit_price: float):
+        self.db.execute("UPDATE trades SET exit_price = ? WHERE id = ?", (exit_price, trade_id))
+
+    def mark_unresolved(self, trade_id: int):
+        """Отчёт по сделке не доставлен мастеру - нужна ручная сверка"""
+        self.db.execute("UPDATE trades SET status = 'unresolved' WHERE id = ?", (trade_id,))
+
+    def set_server_trade_id(self, trade_id: int, server_trade_id: int):
+        self.db.execute("UPDATE trades SET server_trade_id = ? WHERE id = ?", (server_trade_id, trade_id))
+
+    def get(self, trade_id: int):
+        return self.db.fetch_one("SELECT * FROM trades WHERE id = ?", (trade_id,))
@@ -0,0 +1,166 @@
+"""
+Headless-запуск движка копирования (без tkinter/PIL)
+
+    python -m headless --api-url https://... --uid <UID>
+
+Параметры берутся из аргументов командной строки, затем из переменных
+окружения TERMINAL_*, затем из data/settings.json. SIGTERM/SIGINT
+останавливают планировщик, дожидаются текущих команд и отправки outbox.
+
+С --ipc движок принимает подключение окна: python main.py --attach
+(окно можно закрывать и открывать заново, торговля не прерывается).
+"""
+import argparse
+import os
+import signal
+import sys
+import threading
+from pathlib import Path
+
+from core.app import App
+from core.auth import AuthManager
+from core.events import EventBus
+from core.scheduler import Scheduler
+from database.db import Database
+from database.migrations import run_migrations
+from storage.settings import Settings
+from utils.logger import Logger
+from config import DATABASE_NAME, LOG_RETENTION_DAYS, IPC_PORT
+
+
+def get_base_dir() -> Path:
+    if getattr(sys, 'frozen', False):
+        return Path(sys.executable).parent
+    return Path(__file__).resolve().parent
+
+
+def parse_args(argv=None):
+    env = os.environ.get
+    base_dir = get_base_dir()
+    parser = argparse.ArgumentParser(prog="python -m headless", description="ManekiTerminal headless engine")
+    parser.add_argument("--data-dir", default=env("TERMINAL_DATA_DIR", str(base_dir / "data")))
+    parser.add_argument("--logs-dir", default=env("TERMINAL_LOGS_DIR", str(base_dir / "logs")))
+    parser.add_argument("--api-url", default=env("TERMINAL_API_URL", ""), help="URL мастер-сервера")
+    parser.add_argument("--uid", default=env("TERMINAL_UID", ""), help="UID терминала")
+    parser.add_argument("--bybit-key", default=env("TERMINAL_BYBIT_API_KEY", ""))
+    parser.add_argument("--bybit-secret", default=env("TERMINAL_BYBIT_API_SECRET", ""))
+    parser.add_argument("--trading-balance", default=env("TERMINAL_TRADING_BALANCE", ""))
+    parser.add_argument("--ipc", action="store_true", default=bool(env("TERMINAL_IPC", "")),
+                        help="Принимать подключения окна (python main.py --attach)")
+    parser.add_argument("--ipc-port", type=int, default=int(env("TERMINAL_IPC_PORT", IPC_PORT)))
+    parser.add_argument("--verbose", action="store_true", default=bool(env("TERMINAL_VERBOSE", "")),
+                        help="Дублировать лог в stdout")
+    return parser.parse_args(argv)
+
+
+def build_app(args):
+    data_dir = Path(args.data_dir)
+    logs_dir = Path(args.logs_dir)
+    logs_dir.mkdir(parents=True, exist_ok=True)
+    data_dir.mkdir(parents=True, exist_ok=True)
+
+    db = Database(data_dir / DATABASE_NAME)
+    run_migrations(db)
+
+    logger = Logger(logs_dir, retention_days=LOG_RETENTION_DAYS)
+
+    settings = Settings(data_dir)
+    if args.api_url:
+        settings.set("api_url", args.api_url)
+    if args.bybit_key:
+        settings.set("bybit_api_key", args.bybit_key, secure=True)
+    if args.bybit_secret:
+        settings.set("bybit_api_secret", args.bybit_secret, secure=True)
+    if args.trading_balance:
+        settings.set("trading_balance", float(args.trading_balance))
+
+    auth = AuthManager(settings, logger)
+    events = EventBus()
+    scheduler = Scheduler(logger)
+    app = App(auth, events, scheduler, settings, logger, db)
+
+    def _sink(level, message, data, ts):
+        # Подключённые окна получают лог событием, как и в обычном режиме
+        events.emit("on_ui_log", {"level": level, "message": message, "data": data, "ts": ts})
+        if args.verbose:
+            print(f"[{level}] {message} {data or ''}", flush=True)
+
+    logger.set_sink(_sink)
+    return app
+
+
+def login(app, args) -> bool:
+    """
+    Авторизация на мастере - тот же порядок, что и в окне входа
+
+    Сохранённый токен не содержит баланс мастера, поэтому при известных
+    URL и UID всегда выполняется полноценный init.
+    """
+    auth = app.auth
+    auth.load_session()
+
+    uid = args.uid or app.settings.get("uid", "")
+    url = app.settings.get("api_url", "")
+    if not url or not uid:
+        if auth.is_authenticated():
+            app.logger.info("Авто-авторизация успешна")
+            return True
+        app.logger.error("Нет сессии: укажите --api-url и --uid")
+        return False
+
+    try:
+        _, info, pairs = auth.login(url, uid)
+    except Exception as e:
+        app.logger.error("Авторизация ошибка", {"uid": uid, "error": str(e)})
+        return False
+    app.update_symbols(pairs)
+    try:
+        app.balance_service.master_balance = float(info.get("balance", 0))
+    except Exception:
+        app.balance_service.master_balance = 0.0
+    app.logger.info("Авторизация успешна", {"uid": uid})
+    return True
+
+
+def run(argv=None) -> int:
+    args = parse_args(argv)
+    app = build_app(args)
+
+    stop_event = threading.Event()
+
+    def _on_signal(signum, frame):
+        app.logger.info("Получен сигнал остановки", {"signal": signum})
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, _on_signal)
+    signal.signal(signal.SIGINT, _on_signal)
+
+    if not login(app, args):
+        app.db.close()
+        return 2
+
+    server = None
+    try:
+        app.configure_bybit()
+        app.start()
+        if args.ipc:
+            from core.ipc import EngineServer
+            server = EngineServer(app, Path(args.data_dir), port=args.ipc_port)
+            server.start()
+        app.logger.info("Headless-движок запущен")
+        # wait() с таймаутом, чтобы сигналы обрабатывались и на Windows
+        while not stop_event.wait(1.0):
+            pass
+    finally:
+        app.logger.info("Остановка движка...")
+        if server is not None:
+            server.stop()
+        app.stop()
+        app.events.close()
+        app.db.close()
+        app.logger.info("Движок остановлен")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
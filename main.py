@@ -1,3 +1,4 @@
+import argparse
 import sys
 import tkinter as tk
 from tkinter import ttk
@@ -14,6 +15,7 @@ from storage.settings import Settings
 
 from database.db import Database
 from database.migrations import run_migrations
+from config import IPC_PORT
 
 
 def get_base_dir():
@@ -54,19 +56,34 @@ logs_dir.mkdir(parents=True, exist_ok=True)
 data_dir.mkdir(parents=True, exist_ok=True)
 icons_dir.mkdir(parents=True, exist_ok=True)
 
-# Инициализация БД
-db = Database(data_dir / "terminal.db")
-run_migrations(db)
+def create_app(attach: bool = False, ipc_port: int = IPC_PORT):
+    """
+    Приложение окна: свой движок или подключение к уже запущенному
 
-logger = Logger(logs_dir, retention_days=30)
-settings = Settings(data_dir)
-auth = AuthManager(settings, logger)
-events = EventBus()
-scheduler = Scheduler(logger)
-app = App(auth, events, scheduler, settings, logger, db)
-logger.set_sink(lambda level, message, data, ts: events.emit("on_ui_log",
-                                                             {"level": level, "message": f"{message}", "data": data,
-                                                              "ts": ts}))
+    С attach окно подключается к движку python -m headless --ipc.
+    Возвращает (app, logger, events).
+    """
+    if attach:
+        from core.ipc import RemoteApp
+        app = RemoteApp(data_dir, port=ipc_port)
+        app.connect()
+        return app, app.logger, app.events
+
+    # Инициализация БД
+    db = Database(data_dir / "terminal.db")
+    run_migrations(db)
+
+    logger = Logger(logs_dir, retention_days=30)
+    settings = Settings(data_dir)
+    auth = AuthManager(settings, logger)
+    # Обработчики UI не выполняются в потоках планировщика и исполнения команд
+    events = EventBus(queued=True)
+    scheduler = Scheduler(logger)
+    app = App(auth, events, scheduler, settings, logger, db)
+    logger.set_sink(lambda level, message, data, ts: events.emit("on_ui_log",
+                                                                 {"level": level, "message": f"{message}", "data": data,
+                                                                  "ts": ts}))
+    return app, logger, events
 
 
 def show_splash(root):
@@ -98,7 +115,8 @@ def show_splash(root):
     return splash
 
 
-def run():
+def run(app, logger):
+    auth = app.auth
     root = tk.Tk()
     root.title("ManekiTerminal v0.0.1")
 
@@ -148,14 +166,25 @@ def run():
     root.mainloop()
 
 
-if __name__ == "__main__":
+def main():
+    cli = argparse.ArgumentParser(add_help=False)
+    cli.add_argument("--attach", action="store_true")
+    cli.add_argument("--ipc-port", type=int, default=IPC_PORT)
+    args, _ = cli.parse_known_args()
+
+    app, logger, events = create_app(args.attach, args.ipc_port)
     try:
-        run()
+        run(app, logger)
     except Exception as e:
         logger.error("Unhandled exception", {"error": str(e)})
     finally:
-        # Очистка ресурсов
+        # Очистка ресурсов (для --attach - только отключение от движка)
         try:
             app.stop()
         except:
-            pass
\ No newline at end of file
+            pass
+        events.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+from dataclasses import dataclass, field
+from typing import List
+
+
+@dataclass
+class Account:
+    name: str
+    api_key: str
+    api_secret: str
+    trading_balance: float = 0.0
+    # Фиксированный коэффициент; None - trading_balance / баланс мастера
+    ratio: float | None = None
+    # Пустой список - копируются все символы
+    symbols: List[str] = field(default_factory=list)
+    exclude: List[str] = field(default_factory=list)
+    enabled: bool = True
+
+    def allows(self, symbol: str) -> bool:
+        if symbol in self.exclude:
+            return False
+        return not self.symbols or symbol in self.symbols
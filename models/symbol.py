@@ -0,0 +1,78 @@
+import math
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from typing import Dict
+
+
+def _decimals(step: float) -> int:
+    """Число знаков после запятой у шага (0.001 -> 3, 0.5 -> 1, 10 -> 0)"""
+    if step <= 0:
+        return 0
+    try:
+        exponent = Decimal(str(step)).normalize().as_tuple().exponent
+    except InvalidOperation:
+        return 0
+    return max(0, -int(exponent))
+
+
+def _float(value) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+@dataclass(frozen=True)
+class SymbolSpec:
+    """Параметры торговли символом; неизменяемы - обновление заменяет объект целиком"""
+
+    symbol: str
+    min_order_qty: float = 0.0
+    min_price: float = 0.0
+    tick_size: float = 0.0
+    step_size: float = 0.0
+    status: bool = True
+    # Предвычисленные знаки для квантования объёма и цены
+    qty_decimals: int = field(init=False, repr=False, compare=False)
+    price_decimals: int = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "qty_decimals", _decimals(self.step_size))
+        object.__setattr__(self, "price_decimals", _decimals(self.tick_size))
+
+    @classmethod
+    def from_data(cls, symbol: str, data: Dict) -> "SymbolSpec":
+        """Из строки SymbolRepository или пары /terminal/init (qty_step или step_size)"""
+        return cls(
+            symbol=symbol,
+            min_order_qty=_float(data.get("min_order_qty")),
+            min_price=_float(data.get("min_price")),
+            tick_size=_float(data.get("tick_size")),
+            step_size=_float(data.get("qty_step")) or _float(data.get("step_size")),
+            status=bool(data.get("status", True)),
+        )
+
+    def quantize_qty(self, qty: float) -> float:
+        """Объём вниз до кратного step_size"""
+        step = self.step_size
+        if step <= 0:
+            return qty
+        # Допуск на двоичную погрешность: 0.3 / 0.1 = 2.9999999999999996
+        steps = math.floor(qty / step + 1e-9)
+        return round(steps * step, self.qty_decimals)
+
+    def quantize_price(self, price: float) -> float:
+        """Цена к ближайшему кратному tick_size"""
+        tick = self.tick_size
+        if tick <= 0:
+            return price
+        return round(round(price / tick) * tick, self.price_decimals)
+
+    def as_dict(self) -> Dict:
+        return {
+            "min_order_qty": self.min_order_qty,
+            "min_price": self.min_price,
+            "tick_size": self.tick_size,
+            "step_size": self.step_size,
+            "status": self.status,
+        }
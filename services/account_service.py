@@ -0,0 +1,106 @@
+from typing import Callable, Dict, List
+from api.bybit_api import BybitAPI
+from models.account import Account
+from services.trade_service import TradeService
+
+PRIMARY_ACCOUNT = "main"
+
+
+class AccountContext:
+    """Счёт, на котором исполняется команда мастера"""
+
+    def __init__(self, name: str, trade_service: TradeService, ratio: Callable[[], float],
+                 allows: Callable[[str], bool] = None, primary: bool = False):
+        self.name = name
+        self.trade_service = trade_service
+        self.ratio = ratio
+        self.allows = allows or (lambda symbol: True)
+        self.primary = primary
+
+
+class AccountService:
+    """
+    Дополнительные (follower) счета Bybit
+
+    Описываются в настройках списком "accounts":
+        [{"name": "acc2", "api_key": "...", "api_secret": "...",
+          "trading_balance": 500, "ratio": null,
+          "symbols": [], "exclude": [], "enabled": true}]
+    Ключи могут храниться зашифрованными (Settings.protect). Основной счёт
+    по-прежнему настраивается в окне настроек и живёт в App.
+    """
+
+    def __init__(self, logger):
+        self.logger = logger
+        self.accounts: List[Account] = []
+        self._contexts: Dict[str, AccountContext] = {}
+        self._apis: Dict[str, BybitAPI] = {}
+
+    def load(self, settings) -> List[Account]:
+        accounts = []
+        for raw in settings.get("accounts", []) or []:
+            try:
+                acc = Account(
+                    name=str(raw["name"]),
+                    api_key=settings.reveal(raw.get("api_key", "")),
+                    api_secret=settings.reveal(raw.get("api_secret", "")),
+                    trading_balance=float(raw.get("trading_balance", 0) or 0),
+                    ratio=float(raw["ratio"]) if raw.get("ratio") not in (None, "") else None,
+                    symbols=list(raw.get("symbols") or []),
+                    exclude=list(raw.get("exclude") or []),
+                    enabled=bool(raw.get("enabled", True)),
+                )
+            except (KeyError, TypeError, ValueError) as e:
+                self.logger.error("Некорректное описание счёта", {"account": raw.get("name") if isinstance(raw, dict) else None, "error": str(e)})
+                continue
+            if acc.name == PRIMARY_ACCOUNT or any(a.name == acc.name for a in accounts):
+                self.logger.error("Повторяющееся имя счёта", {"account": acc.name})
+                continue
+            accounts.append(acc)
+        self.accounts = accounts
+        return accounts
+
+    def configure(self, settings, balance_service, executor=None, market=None):
+        """Подключить все включённые счета; вызывается из App.configure_bybit"""
+        self.shutdown()
+        contexts = {}
+        for acc in self.load(settings):
+            if not acc.enabled:
+                continue
+            if not acc.api_key or not acc.api_secret:
+                self.logger.warning("Счёт без API ключей пропущен", {"account": acc.name})
+                continue
+            api = BybitAPI(acc.api_key, acc.api_secret, executor=executor, logger=self.logger)
+            api.connect()
+            if not api.test_connection():
+                self.logger.warning("Счёт: ошибка подключения к Bybit", {"account": acc.name, "error": api.last_error})
+                api.shutdown()
+                continue
+            self._apis[acc.name] = api
+            contexts[acc.name] = AccountContext(
+                acc.name,
+                TradeService(api, self.logger, market),
+                ratio=self._ratio_for(acc, balance_service),
+                allows=acc.allows,
+            )
+        self._contexts = contexts
+        if contexts:
+            self.logger.info("Дополнительные счета подключены", {"accounts": list(contexts.keys())})
+
+    def followers(self, symbol: str) -> List[AccountContext]:
+        return [ctx for ctx in self._contexts.values() if ctx.allows(symbol)]
+
+    def shutdown(self):
+        for api in self._apis.values():
+            api.shutdown()
+        self._apis = {}
+        self._contexts = {}
+
+    @staticmethod
+    def _ratio_for(acc: Account, balance_service) -> Callable[[], float]:
+        def ratio() -> float:
+            if acc.ratio is not None:
+                return acc.ratio
+            mb = float(balance_service.master_balance or 0.0)
+            return acc.trading_balance / mb if mb > 0 else 0.0
+        return ratio
@@ -1,3 +1,6 @@
+from utils.resilience import is_quiet
+
+
 class BalanceService:
     def __init__(self, logger):
         self.logger = logger
@@ -19,13 +22,27 @@ class BalanceService:
             self.wallet_balance = balance
             self.logger.debug(f"Wallet balance fetched: {balance}")
         except Exception as e:
-            error_str = str(e)
-            # Не логируем таймауты как ошибки
-            if "timed out" not in error_str.lower() and "timeout" not in error_str.lower():
-                self.logger.error("Error fetching wallet balance", {"error": error_str})
+            # Не логируем временные ошибки (таймауты, лимиты, отключённая цепь)
+            if not is_quiet(e):
+                self.logger.error("Error fetching wallet balance", {"error": str(e)})
             # При ошибке оставляем предыдущее значение вместо сброса в 0
             self.wallet_balance = 0.0
 
+    def apply_wallet_update(self, wallets: list) -> bool:
+        """Применить обновление кошелька из приватного потока (UNIFIED, totalEquity)"""
+        for w in wallets:
+            if w.get("accountType", "UNIFIED") != "UNIFIED":
+                continue
+            total = w.get("totalEquity")
+            if total in (None, ""):
+                continue
+            try:
+                self.wallet_balance = float(total)
+            except (TypeError, ValueError):
+                continue
+            return True
+        return False
+
     def set_trading_balance(self, amount: float):
         try:
             self.trading_balance = float(amount)
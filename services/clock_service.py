@@ -0,0 +1,177 @@
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Dict
+from utils.resilience import is_quiet
+from config import (
+    CLOCK_SAMPLES,
+    CLOCK_MAX_DRIFT_PPM,
+    CLOCK_RESYNC_MIN_INTERVAL,
+    CLOCK_SAMPLE_MAX_AGE_MS,
+    CLOCK_STEP_MS,
+)
+
+
+class ClockService:
+    """
+    Смещение локальных часов относительно Bybit и мастер-сервера
+
+    Bybit: время сервера (/v5/market/time) с компенсацией RTT - берётся
+    середина запроса, за основу - замер с наименьшим RTT в окне, дрейф -
+    наклон смещений по окну. Окно - не старше CLOCK_SAMPLE_MAX_AGE_MS;
+    замер, расходящийся с прогнозом больше чем на CLOCK_STEP_MS сверх RTT,
+    означает шаг часов - старые замеры отбрасываются. Подписи запросов pybit после install()
+    используют исправленное время, поэтому recv_window можно держать
+    узким. Мастер: заголовок Date ответов (точность - секунда), только
+    для контроля.
+    """
+
+    SOURCE_BYBIT = "bybit"
+    SOURCE_MASTER = "master"
+
+    def __init__(self, logger, samples: int = CLOCK_SAMPLES):
+        self.logger = logger
+        self.bybit = None
+        self._samples = {
+            self.SOURCE_BYBIT: deque(maxlen=samples),
+            self.SOURCE_MASTER: deque(maxlen=samples),
+        }
+        self._lock = threading.Lock()
+        self._base_local = 0.0
+        self._base_offset = 0.0
+        self.drift_ppm = 0.0
+        self.rtt_ms = None
+        self.synced = False
+        self.master_offset_ms = None
+        self._last_sync = 0.0
+        self.stats = {"samples": 0, "master_samples": 0, "errors": 0, "resyncs": 0, "steps": 0}
+
+    def set_bybit(self, bybit):
+        self.bybit = bybit
+
+    def install(self):
+        """Подписывать запросы pybit исправленным временем"""
+        from pybit import _helpers
+        _helpers.generate_timestamp = self.now_ms
+
+    def now_ms(self) -> int:
+        """Текущее время по часам Bybit, мс"""
+        local = time.time() * 1000
+        return int(local + self.offset_at(local))
+
+    def offset_at(self, local_ms: float) -> float:
+        """Смещение (сервер - локальные часы) на момент local_ms, мс"""
+        with self._lock:
+            if not self.synced:
+                return 0.0
+            return self._projected(local_ms)
+
+    def _projected(self, local_ms: float) -> float:
+        return self._base_offset + self.drift_ppm * 1e-6 * (local_ms - self._base_local)
+
+    @property
+    def offset_ms(self) -> float:
+        return self.offset_at(time.time() * 1000)
+
+    def sync(self) -> bool:
+        """Замер по времени сервера Bybit"""
+        if not self.bybit:
+            return False
+        try:
+            sent = time.time() * 1000
+            server = self.bybit.get_server_time_ms()
+            received = time.time() * 1000
+        except Exception as e:
+            self.stats["errors"] += 1
+            if not is_quiet(e):
+                self.logger.warning("Ошибка синхронизации времени", {"error": str(e)})
+            return False
+        self._last_sync = time.monotonic()
+        if not server:
+            self.stats["errors"] += 1
+            return False
+        self.add_sample(self.SOURCE_BYBIT, sent, received, server)
+        return True
+
+    def resync(self) -> bool:
+        """Внеочередной замер (биржа отклонила timestamp), не чаще CLOCK_RESYNC_MIN_INTERVAL"""
+        if time.monotonic() - self._last_sync < CLOCK_RESYNC_MIN_INTERVAL:
+            return False
+        self.stats["resyncs"] += 1
+        return self.sync()
+
+    def add_sample(self, source: str, sent_ms: float, received_ms: float, server_ms: float):
+        rtt = max(0.0, received_ms - sent_ms)
+        mid = (sent_ms + received_ms) / 2
+        offset = server_ms - mid
+        step = None
+        with self._lock:
+            if source == self.SOURCE_MASTER:
+                self._samples[source].append((mid, offset, rtt))
+                self.stats["master_samples"] += 1
+                offsets = sorted(s[1] for s in self._samples[source])
+                self.master_offset_ms = offsets[len(offsets) // 2]
+                return
+            if self.synced:
+                # Ошибка замера не больше половины RTT - своего и базового
+                jump = offset - self._projected(mid)
+                if abs(jump) > CLOCK_STEP_MS + (rtt + (self.rtt_ms or 0.0)) / 2:
+                    step = jump
+                    self._samples[source].clear()
+                    self.drift_ppm = 0.0
+                    self.stats["steps"] += 1
+            self._samples[source].append((mid, offset, rtt))
+            self.stats["samples"] += 1
+            self._estimate()
+        if step is not None:
+            self.logger.warning("Шаг локальных часов, замеры сброшены", {"jump_ms": round(step)})
+
+    def _estimate(self):
+        window = self._samples[self.SOURCE_BYBIT]
+        newest = window[-1][0]
+        while newest - window[0][0] > CLOCK_SAMPLE_MAX_AGE_MS:
+            window.popleft()
+        samples = list(window)
+        best = min(samples, key=lambda s: s[2])
+        self._base_local, self._base_offset, self.rtt_ms = best
+        self.synced = True
+
+        # Дрейф - только по замерам с RTT, близким к лучшему (шум меньше)
+        good = [s for s in samples if s[2] <= best[2] * 2 + 5]
+        if len(good) < 3 or good[-1][0] - good[0][0] < 60000:
+            return
+        n = len(good)
+        mean_t = sum(s[0] for s in good) / n
+        mean_o = sum(s[1] for s in good) / n
+        var = sum((s[0] - mean_t) ** 2 for s in good)
+        if var <= 0:
+            return
+        slope = sum((s[0] - mean_t) * (s[1] - mean_o) for s in good) / var
+        self.drift_ppm = max(-CLOCK_MAX_DRIFT_PPM, min(CLOCK_MAX_DRIFT_PPM, slope * 1e6))
+
+    def observe_master(self, response, *args, **kwargs):
+        """Хук requests для ответов мастер-API: замер по заголовку Date"""
+        try:
+            date = response.headers.get("Date")
+            if not date:
+                return
+            received = time.time() * 1000
+            sent = received - response.elapsed.total_seconds() * 1000
+            # Date округлён вниз до секунды - берём середину секунды
+            server = parsedate_to_datetime(date).timestamp() * 1000 + 500
+        except (AttributeError, TypeError, ValueError):
+            return
+        self.add_sample(self.SOURCE_MASTER, sent, received, server)
+
+    def snapshot(self) -> Dict:
+        return {
+            "synced": self.synced,
+            "offset_ms": round(self.offset_ms, 1),
+            "drift_ppm": round(self.drift_ppm, 2),
+            "rtt_ms": None if self.rtt_ms is None else round(self.rtt_ms, 1),
+            "master_offset_ms": None if self.master_offset_ms is None else round(self.master_offset_ms),
+        }
+
+    def get_stats(self) -> Dict:
+        return dict(self.stats, **self.snapshot())
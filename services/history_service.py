@@ -1,45 +1,213 @@
+import hashlib
 from typing import List, Dict, Optional
-from config import HISTORY_ORDERS_LIMIT
+from config import (
+    HISTORY_ORDERS_LIMIT,
+    HISTORY_PAGE_LIMIT,
+    HISTORY_WINDOW_MS,
+    HISTORY_SYNC_OVERLAP_MS,
+    HISTORY_BACKFILL_DAYS,
+)
+from utils.helpers import timestamp_ms
+from utils.resilience import is_quiet
 
 
 class HistoryService:
-    """Сервис для работы с открытыми ордерами (оптимизирован)"""
+    """
+    История исполненных ордеров
+
+    Хранится в SQLite (order_history) и переживает перезапуск. Синхронизация
+    инкрементальная: каждый опрос запрашивает только окно с последнего
+    известного updatedTime, старые страницы догружаются в фоне по одной
+    (backfill_step). Курсоры - в SyncStateRepository.
+    """
 
     def __init__(self, logger):
         self.logger = logger
         self.order_history: List[Dict] = []
         self.bybit = None
+        self.repo = None
+        self.state = None
 
     def set_bybit(self, bybit):
         """Установка ссылки на Bybit API"""
         self.bybit = bybit
 
-    def fetch_orders_history(self, symbol: Optional[str] = None, limit: int = HISTORY_ORDERS_LIMIT):
+    def set_repository(self, repo, state=None):
+        """Установка локального хранилища истории (OrderHistoryRepository) и курсоров"""
+        self.repo = repo
+        self.state = state
+        self._load_cached()
+
+    def _load_cached(self):
+        """Последние ордера из БД - вкладка не пустая ещё до первой синхронизации"""
+        if not self.repo:
+            return
+        try:
+            self.order_history = self.repo.fetch_latest(HISTORY_ORDERS_LIMIT)
+        except Exception as e:
+            self.logger.error("Ошибка чтения истории ордеров", {"error": str(e)})
+
+    def _persist(self, orders: List[Dict]):
+        if not self.repo or not orders:
+            return
+        try:
+            self.repo.upsert_orders(orders)
+        except Exception as e:
+            self.logger.error("Ошибка сохранения истории ордеров", {"error": str(e)})
+
+    def _key(self, name: str) -> str:
+        # Курсоры свои у каждого API-ключа; сам ключ в БД не пишем (в settings он зашифрован)
+        digest = hashlib.sha256(getattr(self.bybit, "api_key", "").encode("utf-8")).hexdigest()[:16]
+        return f"history:{digest}:{name}"
+
+    def _drop_plain_keys(self):
+        """Удалить курсоры старого формата с API-ключом в открытом виде"""
+        api_key = getattr(self.bybit, "api_key", "")
+        for name in ("newest", "backfill"):
+            self.state.delete(f"history:{api_key}:{name}")
+
+    def _ready(self) -> bool:
+        if not self.bybit or not getattr(self.bybit, "api_key", ""):
+            self.logger.warning("Bybit API не инициализирован")
+            return False
+        return self.repo is not None and self.state is not None
+
+    @staticmethod
+    def _newest(orders: List[Dict], current: int) -> int:
+        for o in orders:
+            try:
+                current = max(current, int(o.get("updatedTime") or o.get("createdTime") or 0))
+            except (TypeError, ValueError):
+                continue
+        return current
+
+    def sync_history(self) -> bool:
         """
-        Получить историю исполненных ордеров
+        Догрузить исполненные ордера, появившиеся с прошлой синхронизации
 
-        Args:
-            symbol: Символ для фильтрации
-            limit: Количество записей
+        Первая синхронизация берёт одну последнюю страницу и ставит курсор
+        фоновой догрузки. Дальше запрашивается только окно от последнего
+        updatedTime (с перекрытием HISTORY_SYNC_OVERLAP_MS) до текущего
+        момента. Курсор сдвигается только после успешной записи всех
+        страниц - до конца прочитанного окна за вычетом перекрытия, даже
+        если ордеров в окне не было; при ошибке история остаётся прежней.
+
+        Returns:
+            True, если синхронизация прошла
         """
-        if not self.bybit:
-            self.logger.warning("Bybit API не инициализирован")
-            return
+        if not self._ready():
+            return False
 
+        now = timestamp_ms()
+        newest = self.state.get(self._key("newest"))
         try:
-            orders_history = self.bybit.get_order_history(symbol, limit)
+            if newest is None:
+                self._drop_plain_keys()
+                start = now - HISTORY_WINDOW_MS
+                # Первая страница - самые свежие ордера окна, более старые догрузит backfill_step
+                orders, cursor = self.bybit.get_order_history_page(start, now, limit=HISTORY_PAGE_LIMIT)
+                self.repo.upsert_orders(orders)
+                self.state.set(self._key("backfill"), {"end": now, "cursor": cursor})
+                newest = self._newest(orders, now - HISTORY_SYNC_OVERLAP_MS)
+                fetched = len(orders)
+            else:
+                fetched = 0
+                start = max(int(newest) - HISTORY_SYNC_OVERLAP_MS, now - HISTORY_BACKFILL_DAYS * 86400000)
+                while start < now:
+                    end = min(start + HISTORY_WINDOW_MS, now)
+                    cursor = None
+                    while True:
+                        orders, cursor = self.bybit.get_order_history_page(
+                            start, end, cursor, limit=HISTORY_PAGE_LIMIT
+                        )
+                        self.repo.upsert_orders(orders)
+                        newest = self._newest(orders, int(newest))
+                        fetched += len(orders)
+                        if not cursor or not orders:
+                            break
+                    # Окно прочитано целиком - тихий счёт не перечитывает его снова
+                    newest = max(int(newest), end - HISTORY_SYNC_OVERLAP_MS)
+                    start = end
+            self.state.set(self._key("newest"), newest)
+        except Exception as e:
+            # Не логируем временные ошибки (это нормально при нестабильной сети)
+            if not is_quiet(e):
+                self.logger.error("Ошибка синхронизации истории ордеров", {"error": str(e)})
+            return False
+
+        self._load_cached()
+        self.logger.debug(f"Синхронизация истории: {fetched} новых исполненных")
+        return True
+
+    def backfill_step(self) -> bool:
+        """
+        Догрузить одну старую страницу истории (до HISTORY_BACKFILL_DAYS назад)
+
+        Returns:
+            True, если в БД добавились ордера
+        """
+        if not self._ready():
+            return False
+        state = self.state.get(self._key("backfill"))
+        if not state or state.get("done"):
+            return False
 
-            self.order_history = orders_history
+        end = int(state["end"])
+        horizon = timestamp_ms() - HISTORY_BACKFILL_DAYS * 86400000
+        if end <= horizon:
+            self.state.set(self._key("backfill"), {"end": end, "cursor": "", "done": True})
+            return False
+        start = max(end - HISTORY_WINDOW_MS, horizon)
 
-            self.logger.debug(
-                f"Загружено истории: {len(orders_history)} исполненных"
+        try:
+            orders, cursor = self.bybit.get_order_history_page(
+                start, end, state.get("cursor") or None, limit=HISTORY_PAGE_LIMIT
             )
+            self.repo.upsert_orders(orders)
         except Exception as e:
-            error_str = str(e)
-            # Не логируем таймауты как ошибки (это нормально при нестабильной сети)
-            if "timed out" not in error_str.lower() and "timeout" not in error_str.lower():
-                self.logger.error("Ошибка параллельной загрузки ордеров", {"error": error_str})
-            self.order_history = []
+            if not is_quiet(e):
+                self.logger.warning("Ошибка догрузки истории ордеров", {"error": str(e)})
+            return False
+
+        if cursor and orders:
+            state = {"end": end, "cursor": cursor}
+        else:
+            # Окно прочитано - следующее, более старое
+            state = {"end": start, "cursor": "", "done": start <= horizon}
+        self.state.set(self._key("backfill"), state)
+        return bool(orders)
+
+    def apply_order_updates(self, updates: List[Dict]) -> bool:
+        """
+        Добавить исполненные ордера из приватного потока в историю
+
+        Args:
+            updates: Список ордеров из топика order
+
+        Returns:
+            True, если история изменилась
+        """
+        filled = [
+            o for o in updates
+            if o.get("category", "linear") == "linear"
+            and o.get("orderStatus") == "Filled"
+            and o.get("orderId")
+        ]
+        if not filled:
+            return False
+
+        self._persist(filled)
+
+        orders = {o.get("orderId"): o for o in self.order_history}
+        for o in filled:
+            orders[o["orderId"]] = o
+
+        self.order_history = sorted(
+            orders.values(),
+            key=lambda o: int(o.get("updatedTime") or o.get("createdTime") or 0),
+            reverse=True
+        )[:HISTORY_ORDERS_LIMIT]
+        return True
 
     def get_all_orders_history(self) -> List[Dict]:
         """
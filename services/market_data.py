@@ -0,0 +1,105 @@
+import threading
+import time
+from typing import Dict, Tuple
+from config import MARKET_SNAPSHOT_TTL
+
+
+class MarketSnapshot:
+    """
+    Общий кэш последних цен linear-контрактов
+
+    Заполняется потоком тикеров (WebSocket) или одним bulk-запросом
+    get_tickers(category="linear") на все символы сразу. У каждой цены
+    своя метка времени; цена старше ttl считается устаревшей. Все
+    потребители (цены в UI, исполнение сделок) читают отсюда, поэтому
+    число REST-запросов тикеров не зависит от числа символов и потребителей.
+    """
+
+    def __init__(self, logger, ttl: float = MARKET_SNAPSHOT_TTL):
+        self.logger = logger
+        self.ttl = ttl
+        self.bybit = None
+        self._prices: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._last_refresh = 0.0
+        self.refresh_count = 0
+
+    def set_bybit(self, bybit):
+        self.bybit = bybit
+
+    def update(self, symbol: str, price: float, ts: float | None = None) -> bool:
+        """Записать цену символа; True, если она изменилась"""
+        if price <= 0:
+            return False
+        with self._lock:
+            old = self._prices.get(symbol)
+            self._prices[symbol] = (price, time.monotonic() if ts is None else ts)
+        return old is None or old[0] != price
+
+    def apply_ticker(self, symbol: str, data: Dict) -> bool:
+        """
+        Обновление из потока tickers.<SYMBOL>; True, если цена изменилась
+
+        Delta приходит без lastPrice, если цена не менялась, - но любое
+        сообщение по символу подтверждает, что цена актуальна, поэтому
+        метка времени обновляется всегда.
+        """
+        last = data.get("lastPrice")
+        try:
+            price = float(last) if last not in (None, "") else 0.0
+        except (TypeError, ValueError):
+            price = 0.0
+        if price > 0:
+            return self.update(symbol, price)
+        with self._lock:
+            item = self._prices.get(symbol)
+            if item is not None:
+                self._prices[symbol] = (item[0], time.monotonic())
+        return False
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Обновить все цены одним bulk-запросом, если прошлый старше ttl
+
+        Параллельные вызовы не дублируют запрос: пока один поток качает
+        снимок, остальные ждут и используют его результат.
+        """
+        if not self.bybit:
+            return False
+        with self._refresh_lock:
+            now = time.monotonic()
+            if not force and now - self._last_refresh < self.ttl:
+                return False
+            data = self.bybit.get_all_tickers()
+            if not data:
+                return False
+            ts = time.monotonic()
+            with self._lock:
+                for symbol, price in data.items():
+                    if price > 0:
+                        self._prices[symbol] = (price, ts)
+            self._last_refresh = ts
+            self.refresh_count += 1
+            return True
+
+    def get(self, symbol: str) -> Tuple[float, float]:
+        """(цена, возраст в секундах); для неизвестного символа (0.0, inf)"""
+        with self._lock:
+            item = self._prices.get(symbol)
+        if item is None:
+            return 0.0, float("inf")
+        return item[0], time.monotonic() - item[1]
+
+    def is_fresh(self, symbol: str, max_age: float | None = None) -> bool:
+        price, age = self.get(symbol)
+        return price > 0 and age <= (self.ttl if max_age is None else max_age)
+
+    def get_price(self, symbol: str, max_age: float | None = None) -> float:
+        """Свежая цена символа; при устаревшем кэше - один bulk-запрос на всех"""
+        if not self.is_fresh(symbol, max_age):
+            try:
+                self.refresh()
+            except Exception as e:
+                self.logger.warning("Market snapshot refresh error", {"error": str(e)})
+        return self.get(symbol)[0]
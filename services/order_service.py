@@ -1,4 +1,14 @@
+import threading
+from collections import OrderedDict
 from typing import List, Dict, Optional
+from utils.resilience import is_quiet
+
+
+# Статусы, при которых ордер остаётся в списке открытых
+OPEN_ORDER_STATUSES = ("New", "PartiallyFilled", "Untriggered")
+
+# Сколько последних завершённых исполнений помнить для сопоставления с командами
+FILLS_KEEP = 500
 
 
 class OrderService:
@@ -9,6 +19,10 @@ class OrderService:
         self.open_orders: List[Dict] = []
         self.order_history: List[Dict] = []
         self.bybit = None
+        # Исполнения из приватного потока: частичные (по orderId) и завершённые
+        self._partial_fills: Dict[str, Dict] = {}
+        self._fills: "OrderedDict[str, Dict]" = OrderedDict()
+        self._fills_lock = threading.Lock()
 
     def set_bybit(self, bybit):
         """Установка ссылки на Bybit API"""
@@ -38,10 +52,9 @@ class OrderService:
                 {"total": total}
             )
         except Exception as e:
-            error_str = str(e)
-            # Не логируем таймауты как ошибки (это нормально при нестабильной сети)
-            if "timed out" not in error_str.lower() and "timeout" not in error_str.lower():
-                self.logger.error("Ошибка параллельной загрузки ордеров", {"error": error_str})
+            # Не логируем временные ошибки (это нормально при нестабильной сети)
+            if not is_quiet(e):
+                self.logger.error("Ошибка параллельной загрузки ордеров", {"error": str(e)})
             self.open_orders = []
             self.order_history = []
 
@@ -84,6 +97,84 @@ class OrderService:
             self.logger.error("Ошибка загрузки истории ордеров", {"error": str(e)})
             self.order_history = []
 
+    def apply_order_updates(self, updates: List[Dict]) -> bool:
+        """
+        Применить инкрементальные обновления ордеров из приватного потока
+
+        Args:
+            updates: Список ордеров из топика order
+
+        Returns:
+            True, если список открытых ордеров изменился
+        """
+        orders = {o.get("orderId"): o for o in self.open_orders}
+        changed = False
+        for upd in updates:
+            if upd.get("category", "linear") != "linear":
+                continue
+            order_id = upd.get("orderId")
+            if not order_id:
+                continue
+            if upd.get("orderStatus") in OPEN_ORDER_STATUSES:
+                orders[order_id] = upd
+                changed = True
+            elif orders.pop(order_id, None) is not None:
+                changed = True
+
+        if changed:
+            # Новые сверху, как в ответе REST
+            self.open_orders = sorted(
+                orders.values(),
+                key=lambda o: int(o.get("createdTime") or 0),
+                reverse=True
+            )
+        return changed
+
+    def apply_executions(self, executions: List[Dict]) -> Dict[str, Dict]:
+        """
+        Накопить исполнения из топика execution
+
+        Returns:
+            {orderId: {"price", "qty", "fee"}} для ордеров, исполненных полностью
+            (leavesQty == 0); цена - средневзвешенная по всем частям
+        """
+        done = {}
+        with self._fills_lock:
+            for e in executions:
+                if e.get("category", "linear") != "linear" or e.get("execType", "Trade") != "Trade":
+                    continue
+                order_id = e.get("orderId")
+                if not order_id:
+                    continue
+                try:
+                    qty = float(e.get("execQty") or 0)
+                    price = float(e.get("execPrice") or 0)
+                    fee = float(e.get("execFee") or 0)
+                except (TypeError, ValueError):
+                    continue
+                acc = self._partial_fills.setdefault(order_id, {"qty": 0.0, "notional": 0.0, "fee": 0.0})
+                acc["qty"] += qty
+                acc["notional"] += qty * price
+                acc["fee"] += fee
+                if float(e.get("leavesQty") or 0) > 0:
+                    continue
+                acc = self._partial_fills.pop(order_id)
+                fill = {
+                    "price": acc["notional"] / acc["qty"] if acc["qty"] else price,
+                    "qty": acc["qty"],
+                    "fee": acc["fee"],
+                }
+                self._fills[order_id] = fill
+                while len(self._fills) > FILLS_KEEP:
+                    self._fills.popitem(last=False)
+                done[order_id] = fill
+        return done
+
+    def get_fill(self, order_id: str) -> Optional[Dict]:
+        """Завершённое исполнение ордера, если оно уже пришло из потока"""
+        with self._fills_lock:
+            return self._fills.get(order_id)
+
     def get_all_orders_combined(self) -> List[Dict]:
         """
         Объединить открытые и недавно исполненные ордера
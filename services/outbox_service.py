@@ -0,0 +1,242 @@
+import threading
+import time
+from typing import Callable, Dict
+from api.master_api import MasterRejectedError, is_rejection
+from database.repositories.outbox_repo import OutboxRepository
+from database.repositories.trade_repo import TradeRepository
+from config import (
+    OUTBOX_BATCH_SIZE,
+    OUTBOX_POLL_INTERVAL,
+    OUTBOX_RETRY_BASE,
+    OUTBOX_RETRY_MAX,
+    OUTBOX_DRAIN_TIMEOUT,
+    OUTBOX_MAX_ATTEMPTS,
+    OUTBOX_CLOSE_WAIT_TIMEOUT,
+)
+
+
+class UndeliverableError(RuntimeError):
+    """Отчёт не может быть доставлен - запись переводится в dead-letter"""
+
+
+class OutboxService:
+    """
+    Отчёты мастеру через персистентную очередь (таблица outbox)
+
+    Поток исполнения команд только записывает отчёт в SQLite и идёт дальше.
+    Фоновый воркер отправляет записи пачками, при ошибке откладывает запись
+    с экспоненциальной задержкой. Неотправленные записи переживают
+    перезапуск и недоступность мастера.
+
+    Доставка - "хотя бы один раз", поэтому открытие сделки несёт
+    постоянный client_trade_id. Отказ мастера по существу, исчерпанные
+    OUTBOX_MAX_ATTEMPTS и закрытие, не дождавшееся открытия, переводят
+    запись в dead-letter (dead_at): она остаётся в таблице для разбора.
+    """
+
+    KIND_LOG = "log"
+    KIND_TRADE_OPEN = "trade_open"
+    KIND_TRADE_CLOSE = "trade_close"
+
+    def __init__(self, logger, db, api_provider: Callable):
+        self.logger = logger
+        self.repo = OutboxRepository(db)
+        self.trade_repo = TradeRepository(db)
+        self.api_provider = api_provider
+        self._running = False
+        self._thread = None
+        self._wakeup = threading.Event()
+        self._handlers: Dict[str, Callable] = {
+            self.KIND_LOG: self._send_log,
+            self.KIND_TRADE_OPEN: self._send_trade_open,
+            self.KIND_TRADE_CLOSE: self._send_trade_close,
+        }
+
+    # Какие поля отчёта заполняются фактическим исполнением ордера
+    FILL_FIELDS = {
+        KIND_LOG: {"terminal_price": "price", "terminal_fee": "fee"},
+        KIND_TRADE_OPEN: {"entry_price": "price"},
+        KIND_TRADE_CLOSE: {"exit_price": "price", "total_fee": "fee"},
+    }
+
+    def enqueue(self, kind: str, payload: dict, ref: str | None = None, hold: float = 0) -> int:
+        """
+        Сохранить отчёт в очередь и разбудить воркер
+
+        ref - id ордера на бирже; с hold > 0 запись придерживается, пока
+        apply_fill не подставит цену исполнения (или пока не истечёт hold).
+        """
+        entry_id = self.repo.add(kind, payload, ref=ref or None, hold_ms=int(hold * 1000))
+        if not hold:
+            self._wakeup.set()
+        return entry_id
+
+    def apply_fill(self, ref: str, fill: dict) -> int:
+        """Подставить фактическую цену/комиссию исполнения в отчёты ордера ref и отпустить их"""
+        if not ref:
+            return 0
+        now = int(time.time() * 1000)
+        patched = 0
+        for entry in self.repo.fetch_unfilled(ref):
+            fields = self.FILL_FIELDS.get(entry["kind"], {})
+            payload = entry["payload"]
+            for field, key in fields.items():
+                if fill.get(key) is not None:
+                    payload[field] = fill[key]
+            # Придержанная запись уходит сразу; после ошибок отправки сохраняем backoff
+            next_at = entry["next_attempt_at"] if entry["attempts"] else now
+            self.repo.set_filled(entry["id"], payload, next_at)
+            self._update_local_trade(entry["kind"], payload)
+            patched += 1
+        if patched:
+            self._wakeup.set()
+        return patched
+
+    def _update_local_trade(self, kind: str, payload: dict):
+        local_id = payload.get("local_trade_id")
+        if not local_id:
+            return
+        if kind == self.KIND_TRADE_OPEN:
+            self.trade_repo.set_entry_price(local_id, payload.get("entry_price"))
+        elif kind == self.KIND_TRADE_CLOSE:
+            self.trade_repo.set_exit_price(local_id, payload.get("exit_price"))
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        pending = self.repo.count_pending()
+        if pending:
+            self.logger.info("Outbox: неотправленные отчёты после перезапуска", {"pending": pending})
+        dead = self.repo.count_dead()
+        if dead:
+            self.logger.warning("Outbox: недоставленные отчёты в dead-letter", {"dead": dead})
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self, drain_timeout: float = OUTBOX_DRAIN_TIMEOUT):
+        """Остановить воркер, предварительно попытавшись отправить готовые записи"""
+        if not self._running:
+            return
+        self._running = False
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=drain_timeout)
+        self._thread = None
+
+    def _loop(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                sent = self.flush()
+            except Exception as e:
+                self.logger.error("Outbox flush error", {"error": str(e)})
+                sent = 0
+            # Полная пачка - сразу берём следующую (в том числе при остановке)
+            if sent < OUTBOX_BATCH_SIZE:
+                if not self._running:
+                    break
+                self._wakeup.wait(OUTBOX_POLL_INTERVAL)
+
+    def flush(self) -> int:
+        """Отправить одну пачку готовых записей; возвращает число отправленных"""
+        now = int(time.time() * 1000)
+        entries = self.repo.fetch_due(now, OUTBOX_BATCH_SIZE)
+        if not entries:
+            return 0
+
+        sent = 0
+        failures = 0
+        for entry in entries:
+            handler = self._handlers.get(entry["kind"])
+            if handler is None:
+                self.logger.error("Outbox: неизвестный тип записи", {"id": entry["id"], "kind": entry["kind"]})
+                self.repo.delete(entry["id"])
+                continue
+            try:
+                done = handler(entry["payload"])
+            except (MasterRejectedError, UndeliverableError) as e:
+                self._dead_letter(entry, entry["attempts"] + 1, str(e))
+                continue
+            except Exception as e:
+                failures += 1
+                attempts = entry["attempts"] + 1
+                if attempts >= OUTBOX_MAX_ATTEMPTS:
+                    self._dead_letter(entry, attempts, str(e))
+                else:
+                    delay = min(OUTBOX_RETRY_BASE * (2 ** (attempts - 1)), OUTBOX_RETRY_MAX)
+                    self.repo.reschedule(entry["id"], now + int(delay * 1000), attempts, str(e))
+                    if attempts == 1:
+                        self.logger.warning("Outbox: отправка отложена", {"kind": entry["kind"], "error": str(e)})
+                # Несколько ошибок подряд - мастер, скорее всего, недоступен
+                if failures >= 3:
+                    break
+                continue
+
+            if done:
+                self.repo.delete(entry["id"])
+                sent += 1
+            elif now - (entry["created_at"] or now) >= OUTBOX_CLOSE_WAIT_TIMEOUT * 1000:
+                self._dead_letter(entry, entry["attempts"], "open not confirmed by master")
+            else:
+                # Запись ждёт зависимость (например, открытие сделки) - проверим позже
+                self.repo.reschedule(entry["id"], now + int(OUTBOX_POLL_INTERVAL * 1000), entry["attempts"], "waiting")
+        return sent
+
+    def _dead_letter(self, entry: dict, attempts: int, error: str):
+        """Перевести запись в dead-letter; закрытие сделки помечает её как несверенную"""
+        self.repo.mark_dead(entry["id"], attempts, error)
+        local_id = entry["payload"].get("local_trade_id")
+        if entry["kind"] == self.KIND_TRADE_CLOSE and local_id:
+            self.trade_repo.mark_unresolved(local_id)
+        self.logger.error("Outbox: отчёт не доставлен", {
+            "id": entry["id"], "kind": entry["kind"], "local_trade_id": local_id,
+            "attempts": attempts, "error": error,
+        })
+
+    def _send_log(self, payload: dict) -> bool:
+        res = self.api_provider().send_log(payload)
+        if isinstance(res, dict) and res.get("success") is False:
+            message = res.get("message", "Log send error")
+            if is_rejection(res.get("status", 200)):
+                raise MasterRejectedError(message)
+            raise RuntimeError(message)
+        return True
+
+    def _send_trade_open(self, payload: dict) -> bool:
+        local_id = payload.get("local_trade_id")
+        # Записи до появления ключа - ключ по локальной сделке
+        key = payload.get("client_trade_id") or f"trade-{local_id}"
+        data = {k: payload[k] for k in ("symbol", "side", "entry_qty", "entry_price") if k in payload}
+        data["client_trade_id"] = key
+        trade_resp = self.api_provider().open_trade(data, idempotency_key=key)
+        server_trade_id = trade_resp.get("trade_id")
+        if not server_trade_id:
+            # Повтор с тем же ключом вернёт ту же сделку; без trade_id закрытие не отправить
+            raise RuntimeError("Master returned no trade_id")
+        if local_id:
+            self.trade_repo.set_server_trade_id(local_id, server_trade_id)
+        self.logger.info("Trade opened and saved", {"trade_id": server_trade_id})
+        return True
+
+    def _send_trade_close(self, payload: dict) -> bool:
+        local_id = payload.get("local_trade_id")
+        row = self.trade_repo.get(local_id)
+        if row is None:
+            self.logger.warning("Outbox: сделка для закрытия не найдена", {"local_trade_id": local_id})
+            return True
+        trade_id = row["server_trade_id"]
+        if not trade_id:
+            if not self.repo.has_pending(self.KIND_TRADE_OPEN, local_id):
+                # Открытие не доставлено (dead-letter) - мастер сделку не знает
+                raise UndeliverableError("trade open was not delivered to master")
+            # Открытие ещё не подтверждено мастером
+            return False
+        self.api_provider().close_trade({
+            "trade_id": trade_id,
+            "exit_qty": payload.get("exit_qty"),
+            "exit_price": payload.get("exit_price"),
+            "total_fee": payload.get("total_fee"),
+        })
+        self.logger.info("Trade closed and updated", {"trade_id": trade_id})
+        return True
@@ -1,4 +1,5 @@
 from typing import List, Dict, Optional
+from utils.resilience import is_quiet
 
 class PositionService:
     def __init__(self, logger):
@@ -21,12 +22,44 @@ class PositionService:
             self.logger.debug(f"Загружено позиций: {len(self.positions)}",
                               {"symbol": symbol or "all"})
         except Exception as e:
-            error_str = str(e)
-            # Не логируем таймауты как ошибки
-            if "timed out" not in error_str.lower() and "timeout" not in error_str.lower():
+            # Не логируем временные ошибки (таймауты, лимиты, отключённая цепь)
+            if not is_quiet(e):
                 self.logger.error("Ошибка загрузки позиций", {"error": str(e)})
             self.positions = []
 
+    def apply_position_updates(self, updates: List[Dict]) -> bool:
+        """
+        Применить инкрементальные обновления позиций из приватного потока
+
+        Args:
+            updates: Список позиций из топика position
+
+        Returns:
+            True, если список позиций изменился
+        """
+        positions = {(p.get("symbol"), p.get("positionIdx", 0)): p for p in self.positions}
+        changed = False
+        for upd in updates:
+            if upd.get("category", "linear") != "linear":
+                continue
+            key = (upd.get("symbol"), upd.get("positionIdx", 0))
+            # В потоке цена входа приходит как entryPrice, в REST - avgPrice
+            if "avgPrice" not in upd and "entryPrice" in upd:
+                upd = dict(upd, avgPrice=upd["entryPrice"])
+            try:
+                size = float(upd.get("size") or 0)
+            except (TypeError, ValueError):
+                size = 0.0
+            if size != 0:
+                positions[key] = upd
+                changed = True
+            elif positions.pop(key, None) is not None:
+                changed = True
+
+        if changed:
+            self.positions = list(positions.values())
+        return changed
+
     def get_position(self, symbol: str, side: str) -> Optional[Dict]:
         for p in self.positions:
             if p.get("symbol") == symbol and p.get("side") == side:
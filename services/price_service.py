@@ -1,5 +1,5 @@
 from typing import Dict, List
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from utils.resilience import is_quiet
 
 
 class PriceService:
@@ -9,11 +9,15 @@ class PriceService:
         self.symbols: List[str] = []
         self.pairs: Dict[str, Dict] = {}
         self.bybit = None
-        self._executor = ThreadPoolExecutor(max_workers=5)
+        self.market = None
 
     def set_bybit(self, bybit):
         self.bybit = bybit
 
+    def set_market(self, market):
+        """Общий MarketSnapshot - единственный источник цен"""
+        self.market = market
+
     def update_symbols(self, pairs):
         if isinstance(pairs, dict):
             self.pairs = dict(pairs)
@@ -24,58 +28,35 @@ class PriceService:
             self.prices.setdefault(s, 0.0)
 
     def fetch_prices(self):
-        """Параллельная загрузка цен для всех символов"""
-        if not self.symbols or not self.bybit:
-            return
-
-        # Если символов мало (<=3), загружаем последовательно
-        if len(self.symbols) <= 3:
-            data = self.bybit.get_tickers(self.symbols)
-            if data:
-                self.prices.update(data)
+        """Обновление цен всех символов из общего снимка рынка (один bulk-запрос)"""
+        if not self.symbols or not self.market:
             return
-
-        # Если символов много - параллельно
         try:
-            futures = {
-                self._executor.submit(self._fetch_single_price, symbol): symbol
-                for symbol in self.symbols
-            }
-
-            updated_count = 0
-            for future in as_completed(futures):
-                try:
-                    symbol, price = future.result()
-                    if price > 0:
-                        self.prices[symbol] = price
-                        updated_count += 1
-                except Exception:
-                    pass
-
-            if updated_count > 0:
-                self.logger.info("Обновление цен по Bybit", {"symbols": updated_count})
-
+            self.market.refresh()
         except Exception as e:
-            error_str = str(e)
-            # Не логируем таймауты как ошибки
-            if "timed out" not in error_str.lower() and "timeout" not in error_str.lower():
-                self.logger.warning("Ошибка параллельной загрузки цен", {"error": error_str})
-            # Fallback на последовательную загрузку
-            try:
-                data = self.bybit.get_tickers(self.symbols)
-                if data:
-                    self.prices.update(data)
-            except Exception:
-                pass
+            # Не логируем временные ошибки (таймауты, лимиты, отключённая цепь)
+            if not is_quiet(e):
+                self.logger.warning("Ошибка загрузки цен", {"error": str(e)})
+        for symbol in self.symbols:
+            price, _ = self.market.get(symbol)
+            if price > 0:
+                self.prices[symbol] = price
 
-    def _fetch_single_price(self, symbol: str) -> tuple:
-        """Загрузка цены для одного символа"""
-        try:
-            ticker = self.bybit.get_ticker(symbol)
-            price = ticker.get("price", 0.0)
-            return symbol, price
-        except Exception:
-            return symbol, 0.0
+    def apply_ticker(self, symbol: str, data: Dict) -> bool:
+        """
+        Применить обновление тикера из WebSocket (разбор - в MarketSnapshot)
+
+        Returns:
+            True, если цена символа изменилась
+        """
+        if not self.market:
+            return False
+        self.market.apply_ticker(symbol, data)
+        price, _ = self.market.get(symbol)
+        if price <= 0 or self.prices.get(symbol) == price:
+            return False
+        self.prices[symbol] = price
+        return True
 
     def get_price(self, symbol: str) -> float:
         return float(self.prices.get(symbol, 0.0))
@@ -84,5 +65,4 @@ class PriceService:
         return dict(self.prices)
 
     def shutdown(self):
-        """Закрытие executor при остановке приложения"""
-        self._executor.shutdown(wait=False)
\ No newline at end of file
+        pass
\ No newline at end of file
@@ -0,0 +1,72 @@
+import threading
+from typing import Callable, Dict, List, Optional
+from models.symbol import SymbolSpec
+
+
+class SymbolRegistry:
+    """
+    Активные символы в памяти
+
+    Загружается из БД один раз; при смене пар из /terminal/init словарь
+    спецификаций собирается заново и подменяется целиком, поэтому
+    читатели (исполнение команд) берут спецификацию за O(1) без блокировок
+    и без запросов к БД. Подписчики получают новый набор и список
+    изменений только если что-то действительно поменялось.
+    """
+
+    def __init__(self, logger, repo=None):
+        self.logger = logger
+        self.repo = repo
+        self._specs: Dict[str, SymbolSpec] = {}
+        self._subscribers: List[Callable[[Dict[str, SymbolSpec], Dict[str, List[str]]], None]] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback: Callable[[Dict[str, SymbolSpec], Dict[str, List[str]]], None]):
+        self._subscribers.append(callback)
+
+    def load(self) -> int:
+        """Загрузить активные символы из БД"""
+        if self.repo is None:
+            return 0
+        data = self.repo.get_active_symbols_data()
+        self._replace({s: SymbolSpec.from_data(s, d) for s, d in data.items()})
+        return len(data)
+
+    def update(self, pairs: Dict[str, dict]):
+        """Сохранить пары мастера в БД и применить активные"""
+        if self.repo is not None:
+            self.repo.save_symbols(pairs)
+            # Статус/символы, отключённые ранее, хранит БД - берём итог оттуда
+            data = self.repo.get_active_symbols_data()
+        else:
+            data = {s: d for s, d in pairs.items() if d.get("status", True)}
+        self._replace({s: SymbolSpec.from_data(s, d) for s, d in data.items()})
+
+    def get(self, symbol: str) -> Optional[SymbolSpec]:
+        return self._specs.get(symbol)
+
+    def symbols(self) -> List[str]:
+        return list(self._specs)
+
+    def specs(self) -> Dict[str, SymbolSpec]:
+        """Текущий набор (не изменяется - при обновлении подменяется новым)"""
+        return self._specs
+
+    def _replace(self, specs: Dict[str, SymbolSpec]):
+        with self._lock:
+            old = self._specs
+            changes = {
+                "added": [s for s in specs if s not in old],
+                "removed": [s for s in old if s not in specs],
+                "changed": [s for s in specs if s in old and old[s] != specs[s]],
+            }
+            if not any(changes.values()):
+                return
+            self._specs = specs
+
+        self.logger.info("Символы обновлены", {k: len(v) for k, v in changes.items()})
+        for callback in list(self._subscribers):
+            try:
+                callback(specs, changes)
+            except Exception as e:
+                self.logger.error("Symbol subscriber error", {"error": str(e)})
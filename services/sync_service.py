@@ -1,7 +1,11 @@
+from concurrent.futures import CancelledError
 from typing import Dict, List
 from models.command import Command
 from api.master_api import MasterAPI
-from utils.helpers import timestamp_ms, round_step_size
+from services.account_service import PRIMARY_ACCOUNT
+from services.trade_service import RELIABLE_PRICE_SOURCES
+from utils.helpers import timestamp_ms, order_link_id
+from config import FILL_WAIT_TIMEOUT, ORDER_BATCH_LIMIT
 
 
 class SyncService:
@@ -9,6 +13,18 @@ class SyncService:
         self.logger = logger
         self.current_hash = ""
         self.executed_commands: Dict[str, bool] = {}
+        self.master_pool = None
+
+    def set_master_pool(self, pool):
+        """Установка общего пула HTTP-сессий мастер-API"""
+        self.master_pool = pool
+
+    def _api(self, auth) -> MasterAPI:
+        url = auth.settings.get("api_url", "")
+        token = auth.get_token()
+        if self.master_pool:
+            return self.master_pool.get(url, token)
+        return MasterAPI(url, token)
 
     def check_status(self, auth, app) -> bool:
         api_url = auth.settings.get("api_url", "")
@@ -17,7 +33,7 @@ class SyncService:
         if not api_url or not token:
             raise RuntimeError("API URL or token not configured")
 
-        api = MasterAPI(api_url, token)
+        api = self._api(auth)
         data = api.get_status()
 
         # В v1.0, status возвращает только hash, без pairs
@@ -30,7 +46,7 @@ class SyncService:
         return changed
 
     def fetch_commands(self, auth) -> List[Command]:
-        api = MasterAPI(auth.settings.get("api_url", ""), auth.get_token())
+        api = self._api(auth)
         data = api.get_orders()
         cmds = []
         for c in data.get("commands", []):
@@ -38,138 +54,241 @@ class SyncService:
         return cmds
 
     def process_commands(self, commands: List[Command], app):
+        """
+        Выполнить команды мастера
+
+        Каждая команда расходится на основной и дополнительные счета.
+        Разные (счёт, символ) выполняются параллельно, внутри одной пары -
+        строго по порядку (open перед close для FIFO-сопоставления).
+        Подряд идущие совместимые команды пары уходят одним пакетным
+        запросом. Метод возвращается, когда выполнена вся пачка.
+        """
+        lanes: Dict[tuple, list] = {}
         for cmd in commands:
-            if self.is_executed(cmd.id):
-                continue
-            
+            for ctx in app.command_targets(cmd.symbol):
+                if self.is_executed(cmd.id, ctx.name):
+                    continue
+                lanes.setdefault((ctx.name, cmd.symbol), (ctx, []))[1].append(cmd)
+
+        futures = [app.command_executor.submit(key, self._execute_lane, cmds, app, ctx)
+                   for key, (ctx, cmds) in lanes.items()]
+
+        for future in futures:
             try:
-                app.logger.info("Processing command", {"id": cmd.id, "symbol": cmd.symbol, "side": cmd.position_side})
-                received_at = timestamp_ms()
-                
-                # 1. Calculate Quantity
-                # Get symbol settings from App (loaded from DB)
-                symbol_data = app.symbol_repo.get_active_symbols_data().get(cmd.symbol, {})
-                qty_step = float(symbol_data.get("step_size", 0.0))
-                min_qty = float(symbol_data.get("min_order_qty", 0.0))
-                
-                # Calculate ratio
-                ratio = 0.0
-                try:
-                    mb = float(app.balance_service.master_balance or 0.0)
-                    tb = float(app.balance_service.trading_balance or 0.0)
-                    if mb > 0:
-                        ratio = tb / mb
-                except Exception:
-                    ratio = 0.0
-                
-                # Apply ratio
-                raw_qty = float(cmd.trade_qty) * ratio if ratio > 0 else float(cmd.trade_qty)
-                
-                # Round to step size
-                terminal_qty = round_step_size(raw_qty, qty_step)
-                
-                # Validation
-                status = "skipped"
-                result = {}
-                error_message = None
-                
-                if terminal_qty < min_qty:
-                    status = "skipped"
-                    error_message = f"Qty {terminal_qty} below min {min_qty}"
-                    app.logger.warning(error_message, {"id": cmd.id})
-                    result = {"status": "skipped", "message": error_message}
+                future.result()
+            except CancelledError:
+                app.logger.warning("Command lane cancelled on shutdown")
+            except Exception as e:
+                app.logger.error("Command lane error", {"error": str(e)})
+
+    def _execute_lane(self, cmds: List[Command], app, ctx):
+        """Команды одной пары (счёт, символ): группы совместимых - пакетом, остальные по одной"""
+        for group in self._batches(cmds, ctx):
+            if len(group) == 1:
+                self._execute_command(group[0], app, ctx)
+            else:
+                self._execute_batch(group, app, ctx)
+
+    @staticmethod
+    def _batches(cmds: List[Command], ctx) -> List[List[Command]]:
+        """
+        Разбить команды на группы для пакетного выставления
+
+        В группу попадают подряд идущие batchable-команды с одинаковым
+        position_side - порядок open/close между группами сохраняется.
+        """
+        batchable = getattr(ctx.trade_service, "batchable", None)
+        groups: List[List[Command]] = []
+        for cmd in cmds:
+            last = groups[-1] if groups else None
+            if (batchable and batchable(cmd) and last and batchable(last[-1])
+                    and last[-1].position_side == cmd.position_side and len(last) < ORDER_BATCH_LIMIT):
+                last.append(cmd)
+            else:
+                groups.append([cmd])
+        return groups
+
+    def _execute_command(self, cmd: Command, app, ctx):
+        try:
+            received_at, terminal_qty, result = self._prepare(cmd, app, ctx)
+            if result is None:
+                # 2. Execute on Exchange
+                if ctx.trade_service is not None:
+                    result = ctx.trade_service.execute_command(cmd, qty=terminal_qty,
+                                                               order_link_id=self._link_id(cmd, app))
                 else:
-                    # 2. Execute on Exchange
-                    if hasattr(app, "trade_service"):
-                        result = app.trade_service.execute_command(cmd, qty=terminal_qty)
-                        status = result.get("status", "failed")
-                        error_message = result.get("message")
-                    else:
-                        status = "failed"
-                        error_message = "Trade service unavailable"
-
-                executed_at = timestamp_ms()
-                terminal_price = result.get("price", 0.0)
-                terminal_fee = result.get("fee", 0.0)
-                
-                # 3. Send Log to Master
-                log_payload = {
-                    "order_id": cmd.id,
+                    result = {"status": "failed", "message": "Trade service unavailable"}
+            self._report(cmd, app, ctx, received_at, terminal_qty, result)
+        except Exception as e:
+            app.logger.error("Execute command error", {"id": cmd.id, "account": ctx.name, "error": str(e)})
+
+    def _execute_batch(self, cmds: List[Command], app, ctx):
+        prepared = []
+        for cmd in cmds:
+            try:
+                prepared.append((cmd,) + self._prepare(cmd, app, ctx))
+            except Exception as e:
+                app.logger.error("Execute command error", {"id": cmd.id, "account": ctx.name, "error": str(e)})
+
+        # 2. Execute on Exchange - один запрос на все прошедшие проверки
+        items = [(cmd, qty, self._link_id(cmd, app)) for cmd, _, qty, result in prepared if result is None]
+        if items:
+            app.logger.info("Batch order", {"symbol": cmds[0].symbol, "account": ctx.name,
+                                            "ids": [cmd.id for cmd, _, _ in items]})
+            try:
+                placed = iter(ctx.trade_service.execute_batch(items))
+            except Exception as e:
+                placed = iter([{"status": "failed", "message": str(e)} for _ in items])
+
+        for cmd, received_at, qty, result in prepared:
+            try:
+                if result is None:
+                    result = next(placed)
+                self._report(cmd, app, ctx, received_at, qty, result)
+            except Exception as e:
+                app.logger.error("Execute command error", {"id": cmd.id, "account": ctx.name, "error": str(e)})
+
+    @staticmethod
+    def _link_id(cmd: Command, app) -> str:
+        # Повтор той же команды на том же счёте даст тот же orderLinkId - без дубля
+        return order_link_id(app.settings.get("uid", ""), cmd.id)
+
+    def _prepare(self, cmd: Command, app, ctx) -> tuple:
+        """
+        Объём команды для счёта и проверки перед выставлением
+
+        Returns:
+            (received_at, terminal_qty, result); result не None - команда
+            пропущена и ордер выставлять не нужно
+        """
+        app.logger.info("Processing command", {"id": cmd.id, "symbol": cmd.symbol, "side": cmd.position_side,
+                                               "account": ctx.name})
+        received_at = timestamp_ms()
+
+        # 1. Calculate Quantity
+        # Спецификация символа из реестра в памяти (без запроса к БД)
+        spec = app.symbol_registry.get(cmd.symbol)
+        min_qty = spec.min_order_qty if spec else 0.0
+
+        # Calculate ratio
+        try:
+            ratio = float(ctx.ratio())
+        except Exception:
+            ratio = 0.0
+
+        # Apply ratio
+        raw_qty = float(cmd.trade_qty) * ratio if ratio > 0 else float(cmd.trade_qty)
+
+        # Round to step size
+        terminal_qty = spec.quantize_qty(raw_qty) if spec else raw_qty
+
+        # Validation
+        result = None
+        if not ctx.primary and ratio <= 0:
+            # Дополнительный счёт без коэффициента не копирует объём мастера 1:1
+            error_message = "Account ratio is not configured"
+            app.logger.warning(error_message, {"id": cmd.id, "account": ctx.name})
+            result = {"status": "skipped", "message": error_message}
+        elif terminal_qty < min_qty:
+            error_message = f"Qty {terminal_qty} below min {min_qty}"
+            app.logger.warning(error_message, {"id": cmd.id, "account": ctx.name})
+            result = {"status": "skipped", "message": error_message}
+        return received_at, terminal_qty, result
+
+    def _report(self, cmd: Command, app, ctx, received_at: int, terminal_qty: float, result: Dict):
+        """Отчёт мастеру и учёт сделки по результату выставления"""
+        # "unknown" - ордер мог быть принят биржей (исход не выяснен по orderLinkId):
+        # мастеру уходит как есть, а не "failed"; сделка не учитывается
+        status = result.get("status", "failed")
+        error_message = result.get("message")
+        executed_at = timestamp_ms()
+        terminal_price = result.get("price", 0.0)
+        terminal_fee = result.get("fee", 0.0)
+        if status == "success" and result.get("price_source") not in RELIABLE_PRICE_SOURCES:
+            # Устаревшая цена снимка или её нет: мастеру - без цены, пока её
+            # не подставит исполнение из приватного потока (apply_fill)
+            terminal_price = None
+
+        # 3. Send Log to Master
+        log_payload = {
+            "order_id": cmd.id,
+            "symbol": cmd.symbol,
+            "action": "open" if cmd.position_side == "open" else "close",
+            "side": cmd.side,
+            "order_type": cmd.order_type,
+            "position_side": cmd.position_side,
+            "master_qty": cmd.trade_qty,
+            "master_price": cmd.trade_price,
+            "terminal_qty": terminal_qty if status == "success" else 0.0,
+            "terminal_price": terminal_price,
+            "terminal_fee": terminal_fee,
+            "status": status,
+            "error_message": error_message,
+            "exchange_order_id": result.get("exchange_order_id", ""),
+            "received_at_ms": received_at,
+            "executed_at_ms": executed_at,
+        }
+        if not ctx.primary:
+            log_payload["account"] = ctx.name
+
+        # Рыночный ордер основного счёта: цена исполнения придёт из приватного
+        # потока, отчёты придерживаются до неё (не дольше FILL_WAIT_TIMEOUT)
+        exchange_order_id = result.get("exchange_order_id", "")
+        hold = 0
+        if (status == "success" and ctx.primary and cmd.order_type == "market"
+                and exchange_order_id and app.fills_streaming()):
+            hold = FILL_WAIT_TIMEOUT
+
+        # Отчёты мастеру уходят через outbox - следующая команда не ждёт HTTP
+        app.outbox.enqueue(app.outbox.KIND_LOG, log_payload, ref=exchange_order_id, hold=hold)
+
+        # 4. Handle Trade Lifecycle (Open/Close) - сделки мастер ведёт по основному счёту
+        if status == "success" and ctx.primary:
+            if cmd.position_side == "open":
+                # Локальная запись сразу, server_trade_id придёт из outbox
+                local_trade_id = app.trade_repo.open_local(
+                    cmd.symbol, cmd.side, terminal_qty, terminal_price, executed_at
+                )
+                app.outbox.enqueue(app.outbox.KIND_TRADE_OPEN, {
+                    "local_trade_id": local_trade_id,
+                    # Ключ идемпотентности открытия на мастере: команда терминала
+                    "client_trade_id": self._link_id(cmd, app),
                     "symbol": cmd.symbol,
-                    "action": "open" if cmd.position_side == "open" else "close",
                     "side": cmd.side,
-                    "order_type": cmd.order_type,
-                    "position_side": cmd.position_side,
-                    "master_qty": cmd.trade_qty,
-                    "master_price": cmd.trade_price,
-                    "terminal_qty": terminal_qty if status == "success" else 0.0,
-                    "terminal_price": terminal_price,
-                    "terminal_fee": terminal_fee,
-                    "status": status,
-                    "error_message": error_message,
-                    "exchange_order_id": result.get("exchange_order_id", ""),
-                    "received_at_ms": received_at,
-                    "executed_at_ms": executed_at,
-                }
-                
-                api = MasterAPI(app.settings.get("api_url", ""), app.auth.get_token())
-                try:
-                    api.send_log(log_payload)
-                except Exception as e:
-                    app.logger.error("Failed to send log", {"error": str(e)})
-                
-                # 4. Handle Trade Lifecycle (Open/Close)
-                if status == "success":
-                    if cmd.position_side == "open":
-                        # Register Open Trade
-                        trade_payload = {
-                            "symbol": cmd.symbol,
-                            "side": cmd.side,
-                            "entry_qty": terminal_qty,
-                            "entry_price": terminal_price
-                        }
-                        try:
-                            trade_resp = api.open_trade(trade_payload)
-                            server_trade_id = trade_resp.get("trade_id")
-                            if server_trade_id:
-                                # Save to DB
-                                app.db.execute(
-                                    "INSERT INTO trades (server_trade_id, symbol, side, entry_qty, entry_price, status, opened_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                                    (server_trade_id, cmd.symbol, cmd.side, terminal_qty, terminal_price, "open", executed_at)
-                                )
-                                app.logger.info("Trade opened and saved", {"trade_id": server_trade_id})
-                        except Exception as e:
-                            app.logger.error("Failed to register open trade", {"error": str(e)})
-
-                    elif cmd.position_side == "close":
-                        # Close Trade
-                        # Find open trade for this symbol (FIFO)
-                        row = app.db.fetch_one("SELECT * FROM trades WHERE symbol = ? AND status = 'open' ORDER BY opened_at ASC LIMIT 1", (cmd.symbol,))
-                        if row:
-                            trade_id = row["server_trade_id"]
-                            close_payload = {
-                                "trade_id": trade_id,
-                                "exit_qty": terminal_qty,
-                                "exit_price": terminal_price,
-                                "total_fee": terminal_fee
-                            }
-                            try:
-                                api.close_trade(close_payload)
-                                # Update DB
-                                app.db.execute("UPDATE trades SET status = 'closed', closed_at = ?, exit_price = ?, exit_qty = ? WHERE id = ?", (executed_at, terminal_price, terminal_qty, row["id"]))
-                                app.logger.info("Trade closed and updated", {"trade_id": trade_id})
-                            except Exception as e:
-                                app.logger.error("Failed to register close trade", {"error": str(e)})
-                        else:
-                            app.logger.warning("No open trade found to close in DB", {"symbol": cmd.symbol})
-
-                self.mark_executed(cmd.id)
-                
-            except Exception as e:
-                app.logger.error("Execute command error", {"id": cmd.id, "error": str(e)})
+                    "entry_qty": terminal_qty,
+                    "entry_price": terminal_price
+                }, ref=exchange_order_id, hold=hold)
+
+            elif cmd.position_side == "close":
+                # Find open trade for this symbol (FIFO)
+                row = app.trade_repo.find_oldest_open(cmd.symbol)
+                if row:
+                    app.trade_repo.close_local(row["id"], terminal_qty, terminal_price, executed_at)
+                    app.outbox.enqueue(app.outbox.KIND_TRADE_CLOSE, {
+                        "local_trade_id": row["id"],
+                        "exit_qty": terminal_qty,
+                        "exit_price": terminal_price,
+                        "total_fee": terminal_fee
+                    }, ref=exchange_order_id, hold=hold)
+                else:
+                    app.logger.warning("No open trade found to close in DB", {"symbol": cmd.symbol})
+
+        # Исполнение могло прийти раньше, чем отчёты попали в outbox
+        if hold:
+            fill = app.order_service.get_fill(exchange_order_id)
+            if fill:
+                app.outbox.apply_fill(exchange_order_id, fill)
+
+        self.mark_executed(cmd.id, ctx.name)
+
+    @staticmethod
+    def _executed_key(order_id: int, account: str = PRIMARY_ACCOUNT) -> str:
+        if account == PRIMARY_ACCOUNT:
+            return str(order_id)
+        return f"{account}:{order_id}"
 
-    def mark_executed(self, order_id: int):
-        self.executed_commands[str(order_id)] = True
+    def mark_executed(self, order_id: int, account: str = PRIMARY_ACCOUNT):
+        self.executed_commands[self._executed_key(order_id, account)] = True
 
-    def is_executed(self, order_id: int) -> bool:
-        return self.executed_commands.get(str(order_id), False)
+    def is_executed(self, order_id: int, account: str = PRIMARY_ACCOUNT) -> bool:
+        return self.executed_commands.get(self._executed_key(order_id, account), False)
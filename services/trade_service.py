@@ -1,67 +1,158 @@
-from typing import Dict
+from typing import Dict, List, Tuple
 from api.bybit_api import BybitAPI
 from models.command import Command
 
+# Типы ордеров, которые можно выставлять пакетом (без условных)
+BATCH_ORDER_TYPES = ("market", "limit")
+# Источники цены, которые можно отправлять мастеру как цену сделки;
+# "stale"/"none" - только ориентир, в отчёт не идут
+RELIABLE_PRICE_SOURCES = ("snapshot", "master", "execution")
+
 
 class TradeService:
-    def __init__(self, bybit: BybitAPI, logger):
+    def __init__(self, bybit: BybitAPI, logger, market=None):
         self.bybit = bybit
         self.logger = logger
+        # Общий MarketSnapshot - источник ориентировочной цены
+        self.market = market
 
-    def execute_command(self, command: Command, qty: float | None = None) -> Dict:
+    def execute_command(self, command: Command, qty: float | None = None, order_link_id: str | None = None) -> Dict:
         q = command.trade_qty if qty is None else qty
-        oid = ""
         price = 0.0
         
-        # Get current price for reference if needed
-        ticker = self.bybit.get_ticker(command.symbol)
-        current_price = ticker.get("price", 0.0)
+        # Ориентировочная цена без сетевых запросов: до ордера на бирже
+        # выполняется только сам ордер, фактическая цена придёт из потока execution
+        current_price, price_source = self._reference_price(command)
         
         try:
             if command.order_type == "market":
-                oid = self.open_position(command, q) if command.position_side == "open" else self.close_position(command, q)
-                price = current_price
+                if command.position_side == "open":
+                    placed = self.open_position(command, q, order_link_id)
+                else:
+                    placed = self.close_position(command, q, order_link_id)
             elif command.order_type == "limit":
-                oid = self.place_limit_order(command, q)
-                price = command.trade_price or current_price
+                placed = self.place_limit_order(command, q, order_link_id)
             elif command.order_type in ("stop_limit", "profit_limit"):
-                oid = self.place_conditional_order(command, q)
-                price = command.trade_price or current_price
+                placed = self.place_conditional_order(command, q, order_link_id)
             else:
-                oid = ""
+                placed = {}
             
+            oid = placed.get("order_id", "")
             if not oid:
-                return {"status": "failed", "message": "Order not placed"}
-                
+                return self._not_placed(placed)
+
+            price, price_source = self._order_price(command, current_price, price_source)
             return {
                 "status": "success", 
                 "exchange_order_id": oid,
                 "price": price,
+                "price_source": price_source,
                 "fee": 0.0 # Fee is unknown at placement time
             }
         except Exception as e:
              self.logger.error("Trade execution error", {"error": str(e)})
              return {"status": "failed", "message": str(e)}
 
+    @staticmethod
+    def _not_placed(placed: Dict) -> Dict:
+        """Результат без orderId: неясный исход - "unknown", ордер мог быть принят биржей"""
+        if placed.get("unknown"):
+            return {"status": "unknown", "message": placed.get("error") or "Order state unknown"}
+        return {"status": "failed", "message": placed.get("error") or "Order not placed"}
+
+    @staticmethod
+    def batchable(command: Command) -> bool:
+        return command.order_type in BATCH_ORDER_TYPES
+
+    def execute_batch(self, items: List[Tuple[Command, float, str]]) -> List[Dict]:
+        """
+        Выполнить несколько команд одним пакетным запросом
+
+        items - [(команда, объём, orderLinkId)], только batchable-команды.
+        Результаты - в формате execute_command и в том же порядке.
+        """
+        prices = [self._reference_price(command) for command, _, _ in items]
+        try:
+            placed = self.bybit.place_batch_order([self._order_params(c, q, link) for c, q, link in items])
+        except Exception as e:
+            self.logger.error("Trade execution error", {"error": str(e)})
+            return [{"status": "failed", "message": str(e)} for _ in items]
+
+        results = []
+        for (command, _, link_id), (current_price, price_source) in zip(items, prices):
+            r = placed.get(link_id) or {}
+            oid = r.get("order_id", "")
+            if not oid:
+                results.append(self._not_placed(r))
+                continue
+            price, source = self._order_price(command, current_price, price_source)
+            results.append({
+                "status": "success",
+                "exchange_order_id": oid,
+                "price": price,
+                "price_source": source,
+                "fee": 0.0
+            })
+        return results
+
+    @staticmethod
+    def _order_params(command: Command, qty: float, order_link_id: str) -> Dict:
+        """Параметры ордера как в open_position/close_position/place_limit_order"""
+        params = {"symbol": command.symbol, "side": command.side, "qty": str(qty), "orderLinkId": order_link_id}
+        if command.order_type == "limit":
+            params["orderType"] = "limit"
+            price = command.trade_price
+        elif command.position_side == "open":
+            params["orderType"] = command.order_type
+            price = command.trade_price
+        else:
+            params["orderType"] = "market"
+            price = None
+        if price is not None:
+            params["price"] = str(price)
+        return params
+
+    @staticmethod
+    def _order_price(command: Command, current_price: float, price_source: str) -> tuple:
+        """(цена, источник) для отчёта: у лимитных и условных - цена мастера, если задана"""
+        if command.order_type != "market" and command.trade_price:
+            return float(command.trade_price), "master"
+        return current_price, price_source
+
+    def _reference_price(self, command: Command) -> tuple:
+        """(цена, источник): свежая цена из снимка рынка, иначе цена мастера"""
+        if self.market is not None and self.market.is_fresh(command.symbol):
+            return self.market.get(command.symbol)[0], "snapshot"
+        if command.trade_price:
+            return float(command.trade_price), "master"
+        if self.market is not None:
+            # Устаревшая, но лучше нуля; всё равно будет заменена ценой исполнения
+            return self.market.get(command.symbol)[0], "stale"
+        return 0.0, "none"
+
     def calculate_qty(self, master_qty: float) -> float:
         return master_qty
 
-    def open_position(self, command: Command, qty: float | None = None) -> str:
+    def open_position(self, command: Command, qty: float | None = None, order_link_id: str | None = None) -> Dict:
         q = command.trade_qty if qty is None else qty
-        return self.bybit.place_order(command.symbol, command.side, q, command.order_type, command.trade_price)
+        return self.bybit.place_order(command.symbol, command.side, q, command.order_type, command.trade_price,
+                                      order_link_id=order_link_id)
 
-    def close_position(self, command: Command, qty: float | None = None) -> str:
+    def close_position(self, command: Command, qty: float | None = None, order_link_id: str | None = None) -> Dict:
         q = command.trade_qty if qty is None else qty
-        return self.bybit.place_order(command.symbol, command.side, q, "market")
+        return self.bybit.place_order(command.symbol, command.side, q, "market", order_link_id=order_link_id)
 
-    def place_limit_order(self, command: Command, qty: float | None = None) -> str:
+    def place_limit_order(self, command: Command, qty: float | None = None, order_link_id: str | None = None) -> Dict:
         q = command.trade_qty if qty is None else qty
-        return self.bybit.place_order(command.symbol, command.side, q, "limit", command.trade_price)
+        return self.bybit.place_order(command.symbol, command.side, q, "limit", command.trade_price,
+                                      order_link_id=order_link_id)
 
-    def place_conditional_order(self, command: Command, qty: float | None = None) -> str:
+    def place_conditional_order(self, command: Command, qty: float | None = None,
+                                order_link_id: str | None = None) -> Dict:
         q = command.trade_qty if qty is None else qty
         tp = command.trade_price or 0.0
-        return self.bybit.place_conditional_order(command.symbol, command.side, q, "stop_limit", tp)
+        return self.bybit.place_conditional_order(command.symbol, command.side, q, "stop_limit", tp,
+                                                  order_link_id=order_link_id)
 
     def cancel_order(self, order_id: str):
         return True
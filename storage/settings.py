@@ -16,19 +16,32 @@ class Settings:
 
     def get(self, key: str, default=None):
         val = self._data.get(key, default)
-        if key in ("bybit_api_key", "bybit_api_secret") and isinstance(val, dict) and "enc" in val:
+        if key in ("bybit_api_key", "bybit_api_secret"):
+            return self.reveal(val)
+        return val
+
+    def reveal(self, val):
+        """Расшифровать значение, сохранённое с secure=True (остальные - как есть)"""
+        if isinstance(val, dict) and "enc" in val:
             try:
                 return decrypt(val["enc"], self._key())
             except Exception:
                 return ""
         return val
 
+    def protect(self, value) -> dict:
+        """Зашифровать значение для хранения внутри составных настроек"""
+        return {"enc": encrypt(str(value), self._key())}
+
     def set(self, key: str, value, secure: bool = False):
         if secure and value:
             self._data[key] = {"enc": encrypt(str(value), self._key())}
         else:
             self._data[key] = value
 
+    def keys(self):
+        return list(self._data.keys())
+
     def delete(self, key: str):
         if key in self._data:
             del self._data[key]
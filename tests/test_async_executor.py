@@ -0,0 +1,60 @@
+import threading
+from concurrent.futures import CancelledError
+import pytest
+from utils.async_executor import KeyedExecutor, PriorityExecutor, PRIORITY_TRADE
+
+
+def _blocker():
+    started, release = threading.Event(), threading.Event()
+
+    def task():
+        started.set()
+        release.wait(5)
+        return "done"
+    return task, started, release
+
+
+def test_same_key_runs_in_order():
+    pool = PriorityExecutor(max_workers=4)
+    keyed = KeyedExecutor(executor=pool)
+    seen = []
+    futures = [keyed.submit("BTCUSDT", seen.append, i) for i in range(20)]
+    for f in futures:
+        f.result(timeout=5)
+    assert seen == list(range(20))
+    pool.shutdown()
+
+
+def test_queued_lane_tasks_cancelled_when_pool_stops():
+    pool = PriorityExecutor(max_workers=1, limits={PRIORITY_TRADE: 1})
+    keyed = KeyedExecutor(executor=pool)
+    task, started, release = _blocker()
+    running = keyed.submit("a", task)
+    assert started.wait(5)
+    # Разбор очереди ключа "b" стоит в очереди пула и не начнётся
+    queued = keyed.submit("b", lambda: "never")
+
+    pool.shutdown()
+    release.set()
+
+    with pytest.raises(CancelledError):
+        queued.result(timeout=2)
+    assert running.result(timeout=2) == "done"
+
+
+def test_shutdown_cancels_tasks_waiting_in_lane():
+    pool = PriorityExecutor(max_workers=2)
+    keyed = KeyedExecutor(executor=pool)
+    task, started, release = _blocker()
+    running = keyed.submit("a", task)
+    assert started.wait(5)
+    waiting = keyed.submit("a", lambda: "never")
+
+    keyed.shutdown()
+    release.set()
+
+    assert running.result(timeout=2) == "done"
+    with pytest.raises(CancelledError):
+        waiting.result(timeout=2)
+    assert keyed.submit("a", lambda: 1).cancelled()
+    pool.shutdown()
@@ -0,0 +1,237 @@
+import json
+import requests
+import pytest
+from pybit.exceptions import InvalidRequestError as PybitInvalidRequest
+from api import bybit_api
+from api.bybit_api import BybitAPI, ERR_DUPLICATE_LINK_ID
+from config import ORDER_BATCH_LIMIT
+from utils.async_executor import PRIORITY_STATE, PRIORITY_TRADE
+from utils.resilience import RateLimitedError, TransientError
+
+
+def _response(request, payload: dict, status: int = 200, headers: dict | None = None):
+    response = requests.Response()
+    response.status_code = status
+    response._content = json.dumps(payload).encode()
+    response.headers.update(headers or {})
+    response.request = request
+    response.url = request.url
+    return response
+
+
+class FakeClock:
+    def __init__(self):
+        self.resyncs = 0
+
+    def resync(self):
+        self.resyncs += 1
+        return True
+
+
+@pytest.fixture
+def api():
+    client = BybitAPI("key", "secret", clock=FakeClock())
+    client.connect()
+    assert client.session is not None, client.last_error
+    return client
+
+
+def _reply_with(session, payload, calls):
+    def send(request, **kwargs):
+        calls.append(request)
+        return _response(request, payload, headers={"X-Bapi-Limit-Reset-Timestamp": "0"})
+    session.client.send = send
+
+
+def test_rate_limit_reaches_classify_without_pybit_retries(api):
+    calls = []
+    _reply_with(api.session, {"retCode": 10006, "retMsg": "Too many visits!", "result": {}}, calls)
+
+    with pytest.raises(RateLimitedError) as info:
+        api._call(PRIORITY_STATE, api.session.get_wallet_balance, accountType="UNIFIED")
+
+    assert info.value.code == 10006
+    assert len(calls) == 1
+
+
+def test_timestamp_error_triggers_clock_resync(api):
+    calls = []
+    _reply_with(api.order_session, {"retCode": 10002, "retMsg": "invalid request, check server timestamp"}, calls)
+
+    with pytest.raises(TransientError) as info:
+        api._call(PRIORITY_TRADE, api.order_session.get_open_orders, category="linear", symbol="BTCUSDT")
+
+    assert info.value.code == 10002
+    assert len(calls) == 1
+    assert api.clock.resyncs == 1
+    # recv_window не расширен pybit
+    assert calls[0].headers["X-BAPI-RECV-WINDOW"] == str(api.session.recv_window)
+
+
+class FakeOrderSession:
+    """Сессия pybit для ордеров: place_order отвечает по очереди из replies"""
+
+    def __init__(self):
+        self.replies = []
+        self.placed = []
+        self.batches = []
+        self.batch_reply = None
+        self.open_orders = []
+
+    def place_order(self, **params):
+        self.placed.append(params)
+        reply = self.replies.pop(0) if self.replies else None
+        if reply is None and any(o["orderLinkId"] == params["orderLinkId"] for o in self.open_orders):
+            # Биржа не принимает второй ордер с тем же orderLinkId
+            reply = _rejected(ERR_DUPLICATE_LINK_ID)
+        if isinstance(reply, Exception):
+            raise reply
+        if reply is None:
+            reply = {"result": {"orderId": f"id-{params['orderLinkId']}"}}
+        return reply
+
+    def get_open_orders(self, **params):
+        items = [o for o in self.open_orders if o["orderLinkId"] == params.get("orderLinkId")]
+        return {"result": {"list": items}}
+
+    def get_order_history(self, **params):
+        return {"result": {"list": []}}
+
+    def place_batch_order(self, category, request):
+        self.batches.append(request)
+        if isinstance(self.batch_reply, Exception):
+            raise self.batch_reply
+        if self.batch_reply is not None:
+            return self.batch_reply(request)
+        return {
+            "result": {"list": [{"orderLinkId": o["orderLinkId"], "orderId": f"id-{o['orderLinkId']}"}
+                                for o in request]},
+            "retExtInfo": {"list": [{"code": 0, "msg": "OK"} for _ in request]},
+        }
+
+
+def _rejected(code):
+    return PybitInvalidRequest("POST /v5/order/create", "rejected", code, "00:00:00", {})
+
+
+@pytest.fixture
+def orders_api(monkeypatch):
+    monkeypatch.setattr(bybit_api.time, "sleep", lambda s: None)
+    client = BybitAPI("key", "secret")
+    client.session = client.order_session = FakeOrderSession()
+    return client
+
+
+def _params(link_id="L1"):
+    return {"category": "linear", "symbol": "BTCUSDT", "side": "Buy", "orderType": "Market",
+            "qty": "1", "orderLinkId": link_id}
+
+
+def test_unresolved_timeout_is_unknown_not_failed(orders_api):
+    session = orders_api.session
+    session.replies = [requests.exceptions.ReadTimeout()] * 10
+
+    result = orders_api._place_idempotent(_params())
+
+    assert result["order_id"] == ""
+    assert result["unknown"]
+    assert result["error"]
+
+
+def test_rate_limited_order_was_never_accepted(orders_api):
+    session = orders_api.session
+    session.replies = [_rejected(10006)] * 10
+
+    result = orders_api._place_idempotent(_params())
+
+    assert result["order_id"] == "" and not result["unknown"]
+
+
+def _batch(count):
+    return [{k: v for k, v in _params(f"L{i}").items() if k != "category"} for i in range(count)]
+
+
+def test_timeout_resolves_by_link_id_without_resending(orders_api):
+    session = orders_api.session
+    session.replies = [requests.exceptions.ReadTimeout()]
+    session.open_orders = [{"orderLinkId": "L1", "orderId": "exchange-1"}]
+
+    assert orders_api._place_idempotent(_params())["order_id"] == "exchange-1"
+    assert len(session.placed) == 1
+
+
+def test_timeout_not_accepted_is_resent_with_same_link_id(orders_api):
+    session = orders_api.session
+    session.replies = [requests.exceptions.ReadTimeout()]
+
+    assert orders_api._place_idempotent(_params())["order_id"] == "id-L1"
+    assert [p["orderLinkId"] for p in session.placed] == ["L1", "L1"]
+
+
+def test_duplicate_link_id_returns_existing_order(orders_api):
+    session = orders_api.session
+    session.replies = [requests.exceptions.ReadTimeout(), _rejected(ERR_DUPLICATE_LINK_ID)]
+    # Первый запрос дошёл, но ордер появился в выдаче не сразу
+    lookups = iter([[], [{"orderLinkId": "L1", "orderId": "exchange-1"}]])
+    session.get_open_orders = lambda **params: {"result": {"list": next(lookups)}}
+
+    assert orders_api._place_idempotent(_params())["order_id"] == "exchange-1"
+    assert len(session.placed) == 2
+
+
+def test_rejection_is_not_retried(orders_api):
+    session = orders_api.session
+    session.replies = [_rejected(110007)]
+
+    result = orders_api._place_idempotent(_params())
+    assert result["order_id"] == "" and not result["unknown"]
+    assert "110007" in result["error"]
+    assert len(session.placed) == 1
+
+
+def test_batch_is_split_by_limit(orders_api):
+    orders = _batch(ORDER_BATCH_LIMIT + 3)
+
+    results = orders_api.place_batch_order(orders)
+
+    assert [len(b) for b in orders_api.session.batches] == [ORDER_BATCH_LIMIT, 3]
+    assert all(r == {"order_id": f"id-{k}", "error": None, "unknown": False} for k, r in results.items())
+    assert orders_api.session.placed == []
+
+
+def test_failed_batch_falls_back_to_single_orders(orders_api):
+    session = orders_api.session
+    session.batch_reply = requests.exceptions.ReadTimeout()
+    session.open_orders = [{"orderLinkId": "L0", "orderId": "exchange-0"}]
+    orders = _batch(2)
+
+    results = orders_api.place_batch_order(orders)
+
+    # L0 уже принят биржей - дубль отклонён, id найден по orderLinkId, L1 выставлен заново
+    assert results == {"L0": {"order_id": "exchange-0", "error": None, "unknown": False},
+                       "L1": {"order_id": "id-L1", "error": None, "unknown": False}}
+
+
+def test_batch_item_errors_are_reported_per_order(orders_api):
+    session = orders_api.session
+    session.batch_reply = lambda request: {
+        "result": {"list": [{"orderLinkId": "L0", "orderId": "id-L0"}, {"orderLinkId": "L1", "orderId": ""}]},
+        "retExtInfo": {"list": [{"code": 0}, {"code": 110007, "msg": "Insufficient balance"}]},
+    }
+    orders = _batch(2)
+
+    results = orders_api.place_batch_order(orders)
+
+    assert results["L0"] == {"order_id": "id-L0", "error": None, "unknown": False}
+    assert results["L1"] == {"order_id": "", "error": "Insufficient balance", "unknown": False}
+    assert session.placed == []
+
+
+def test_shutdown_closes_both_sessions(api):
+    closed = []
+    api.session.client.close = lambda: closed.append("session")
+    api.order_session.client.close = lambda: closed.append("order")
+
+    api.shutdown()
+
+    assert closed == ["session", "order"]
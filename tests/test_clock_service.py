@@ -0,0 +1,69 @@
+import pytest
+from services.clock_service import ClockService
+from config import CLOCK_SAMPLE_MAX_AGE_MS
+
+
+class FakeLogger:
+    def __init__(self):
+        self.records = []
+
+    def warning(self, message, data=None):
+        self.records.append(("warning", message, data))
+
+    def info(self, message, data=None):
+        self.records.append(("info", message, data))
+
+
+def _sample(clock, local_ms, offset_ms, rtt_ms=20.0):
+    """Замер: запрос ушёл в local_ms, ответ через rtt_ms, сервер впереди на offset_ms"""
+    clock.add_sample(ClockService.SOURCE_BYBIT, local_ms, local_ms + rtt_ms, local_ms + rtt_ms / 2 + offset_ms)
+
+
+@pytest.fixture
+def clock():
+    return ClockService(FakeLogger())
+
+
+def test_base_is_lowest_rtt_sample(clock):
+    _sample(clock, 1_000_000, 250, rtt_ms=80)
+    _sample(clock, 1_060_000, 210, rtt_ms=10)
+    _sample(clock, 1_120_000, 260, rtt_ms=90)
+
+    assert clock.synced
+    assert clock.rtt_ms == 10
+    assert clock.offset_at(1_060_010) == pytest.approx(210)
+
+
+def test_drift_from_slope_of_offsets(clock):
+    # +1 мс каждые 60 с = ~16.7 ppm
+    for i in range(5):
+        _sample(clock, 1_000_000 + i * 60_000, 100 + i)
+
+    assert clock.drift_ppm == pytest.approx(1 / 60_000 * 1e6, rel=1e-3)
+
+
+def test_step_resets_window(clock):
+    _sample(clock, 1_000_000, 100, rtt_ms=5)
+    _sample(clock, 1_060_000, 101, rtt_ms=50)
+    # NTP сдвинул локальные часы на 2 с: прежний замер с лучшим RTT больше не годится
+    _sample(clock, 1_120_000, 2100, rtt_ms=50)
+
+    assert clock.stats["steps"] == 1
+    assert clock.offset_at(1_120_025) == pytest.approx(2100)
+    assert clock.logger.records[-1][0] == "warning"
+
+
+def test_noise_within_rtt_is_not_a_step(clock):
+    _sample(clock, 1_000_000, 100, rtt_ms=5)
+    _sample(clock, 1_060_000, 180, rtt_ms=200)
+
+    assert clock.stats["steps"] == 0
+    assert clock.rtt_ms == 5
+
+
+def test_old_samples_age_out(clock):
+    _sample(clock, 1_000_000, 100, rtt_ms=5)
+    _sample(clock, 1_000_000 + CLOCK_SAMPLE_MAX_AGE_MS + 60_000, 150, rtt_ms=40)
+
+    assert clock.rtt_ms == 40
+    assert len(clock._samples[ClockService.SOURCE_BYBIT]) == 1
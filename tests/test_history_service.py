@@ -0,0 +1,150 @@
+import pytest
+from database.db import Database
+from database.migrations import run_migrations
+from database.repositories.order_history_repo import OrderHistoryRepository
+from database.repositories.sync_state_repo import SyncStateRepository
+from services import history_service
+from services.history_service import HistoryService
+from config import HISTORY_WINDOW_MS, HISTORY_SYNC_OVERLAP_MS, HISTORY_BACKFILL_DAYS
+
+NOW = 1_700_000_000_000
+DAY = 86400000
+
+
+class FakeLogger:
+    def debug(self, message, data=None):
+        pass
+
+    info = warning = error = debug
+
+
+class FakeBybit:
+    """Страницы истории: pages[(start, end, cursor)] -> (orders, next_cursor)"""
+
+    api_key = "key"
+
+    def __init__(self):
+        self.pages = {}
+        self.calls = []
+        self.error = None
+
+    def get_order_history_page(self, start, end, cursor=None, limit=50):
+        self.calls.append((start, end, cursor))
+        if self.error:
+            raise self.error
+        return self.pages.get((start, end, cursor), ([], None))
+
+
+def _order(order_id, updated):
+    return {"orderId": order_id, "symbol": "BTCUSDT", "side": "Buy", "orderType": "Market",
+            "qty": "1", "avgPrice": "100", "orderStatus": "Filled",
+            "createdTime": str(updated), "updatedTime": str(updated)}
+
+
+@pytest.fixture
+def now(monkeypatch):
+    clock = [NOW]
+    monkeypatch.setattr(history_service, "timestamp_ms", lambda: clock[0])
+    return clock
+
+
+@pytest.fixture
+def service(tmp_path, now):
+    db = Database(tmp_path / "terminal.db")
+    run_migrations(db)
+    service = HistoryService(FakeLogger())
+    service.set_bybit(FakeBybit())
+    service.set_repository(OrderHistoryRepository(db), SyncStateRepository(db))
+    yield service
+    db.close()
+
+
+def _newest(service):
+    return service.state.get(service._key("newest"))
+
+
+def test_first_sync_reads_last_page_and_sets_backfill(service):
+    start = NOW - HISTORY_WINDOW_MS
+    service.bybit.pages[(start, NOW, None)] = ([_order("a", NOW - 5000)], "next")
+
+    assert service.sync_history()
+    assert _newest(service) == NOW - 5000
+    assert service.state.get(service._key("backfill")) == {"end": NOW, "cursor": "next"}
+    assert [o["orderId"] for o in service.order_history] == ["a"]
+
+
+def test_incremental_sync_follows_cursor_from_overlap(service, now):
+    service.state.set(service._key("newest"), NOW - 10000)
+    now[0] = NOW + 1000
+    start = NOW - 10000 - HISTORY_SYNC_OVERLAP_MS
+    end = NOW + 1000
+    service.bybit.pages[(start, end, None)] = ([_order("a", NOW - 2000)], "p2")
+    service.bybit.pages[(start, end, "p2")] = ([_order("b", NOW)], None)
+
+    assert service.sync_history()
+    assert service.bybit.calls == [(start, end, None), (start, end, "p2")]
+    assert _newest(service) == NOW
+    assert service.repo.count() == 2
+
+
+def test_long_gap_is_split_into_windows(service):
+    service.state.set(service._key("newest"), NOW - HISTORY_WINDOW_MS - DAY)
+
+    assert service.sync_history()
+    starts = [c[0] for c in service.bybit.calls]
+    assert len(starts) == 2
+    assert starts[1] == starts[0] + HISTORY_WINDOW_MS
+    assert service.bybit.calls[-1][1] == NOW
+    # Пустые окна тоже сдвигают курсор - следующий опрос читает только хвост
+    assert _newest(service) == NOW - HISTORY_SYNC_OVERLAP_MS
+
+    service.bybit.calls.clear()
+    assert service.sync_history()
+    assert service.bybit.calls == [(NOW - 2 * HISTORY_SYNC_OVERLAP_MS, NOW, None)]
+
+
+def test_quiet_account_does_not_reread_first_window(service, now):
+    assert service.sync_history()
+    assert _newest(service) == NOW - HISTORY_SYNC_OVERLAP_MS
+
+    now[0] = NOW + 70000
+    service.bybit.calls.clear()
+    assert service.sync_history()
+    assert service.bybit.calls == [(NOW - 2 * HISTORY_SYNC_OVERLAP_MS, NOW + 70000, None)]
+
+
+def test_cursor_keys_do_not_store_api_key(service):
+    service.state.set("history:key:newest", NOW - 10000)
+
+    assert service.sync_history()
+    keys = [r["key"] for r in service.repo.db.fetchall("SELECT key FROM settings")]
+    assert keys and all(":key:" not in k for k in keys)
+    # Курсор старого формата удалён
+    assert service.state.get("history:key:newest") is None
+
+
+def test_cursor_is_not_advanced_on_error(service):
+    service.state.set(service._key("newest"), NOW - 10000)
+    service.bybit.error = RuntimeError("boom")
+
+    assert not service.sync_history()
+    assert _newest(service) == NOW - 10000
+
+
+def test_backfill_walks_back_to_horizon(service):
+    horizon = NOW - HISTORY_BACKFILL_DAYS * DAY
+    service.state.set(service._key("backfill"), {"end": NOW, "cursor": "c1"})
+    service.bybit.pages[(NOW - HISTORY_WINDOW_MS, NOW, "c1")] = ([_order("old", NOW - DAY)], None)
+
+    assert service.backfill_step()
+    assert service.state.get(service._key("backfill")) == {
+        "end": NOW - HISTORY_WINDOW_MS, "cursor": "", "done": False
+    }
+
+    steps = 0
+    while not service.state.get(service._key("backfill")).get("done"):
+        service.backfill_step()
+        steps += 1
+        assert steps < 100
+    assert service.bybit.calls[-1][0] == horizon
+    assert not service.backfill_step()
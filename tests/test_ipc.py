@@ -0,0 +1,44 @@
+from types import SimpleNamespace
+from core.ipc import EngineServer, _RemoteSettings
+from storage.settings import Settings
+
+
+def _engine(tmp_path, settings):
+    auth = SimpleNamespace(login=None, logout=None)
+    app = SimpleNamespace(logger=None, auth=auth, settings=settings, update_symbols=None)
+    return EngineServer(app, tmp_path)
+
+
+def test_snapshot_settings_carry_no_secrets(tmp_path):
+    settings = Settings(tmp_path)
+    settings.set("api_url", "https://master")
+    settings.set("token", "tok")
+    settings.set("bybit_api_key", "key", secure=True)
+    settings.set("bybit_api_secret", "secret", secure=True)
+    settings.set("accounts", [{"name": "acc2", "api_key": settings.protect("k2"),
+                               "api_secret": settings.protect("s2"), "ratio": 0.5}])
+
+    public = _engine(tmp_path, settings)._public_settings()
+
+    assert public == {"api_url": "https://master", "accounts": [{"name": "acc2", "ratio": 0.5}]}
+
+
+class FakeRemoteApp:
+    def __init__(self):
+        self.calls = []
+
+    def call(self, method, *args, **kwargs):
+        self.calls.append((method,) + args)
+
+
+def test_remote_settings_keep_hidden_secret_on_empty_field():
+    app = FakeRemoteApp()
+    settings = _RemoteSettings(app)
+    settings._secrets = {"bybit_api_key"}
+
+    settings.set("bybit_api_key", "", secure=True)
+    settings.set("bybit_api_secret", "new", secure=True)
+
+    assert app.calls == [("settings_set", "bybit_api_secret", "new")]
+    # Секрет не остаётся в копии окна
+    assert settings.get("bybit_api_secret") is None
@@ -0,0 +1,41 @@
+from services import market_data
+from services.market_data import MarketSnapshot
+from services.price_service import PriceService
+
+
+class FakeLogger:
+    def warning(self, message, data=None):
+        pass
+
+
+def test_delta_without_last_price_keeps_price_fresh(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(market_data.time, "monotonic", lambda: clock[0])
+    market = MarketSnapshot(FakeLogger(), ttl=5)
+
+    assert market.apply_ticker("BTCUSDT", {"symbol": "BTCUSDT", "lastPrice": "100.5"})
+    clock[0] += 4
+    assert not market.apply_ticker("BTCUSDT", {"symbol": "BTCUSDT", "bid1Price": "100.4"})
+    clock[0] += 4
+    # Цена не менялась 8 с, но поток подтверждал её - она не устарела
+    assert market.is_fresh("BTCUSDT")
+    assert market.get("BTCUSDT") == (100.5, 4)
+
+
+def test_delta_for_unknown_symbol_is_ignored():
+    market = MarketSnapshot(FakeLogger())
+    assert not market.apply_ticker("ETHUSDT", {"bid1Price": "1"})
+    assert market.get("ETHUSDT")[0] == 0.0
+
+
+def test_price_service_reads_ticker_through_snapshot():
+    market = MarketSnapshot(FakeLogger())
+    prices = PriceService(FakeLogger())
+    prices.set_market(market)
+
+    assert prices.apply_ticker("BTCUSDT", {"lastPrice": "100"})
+    assert not prices.apply_ticker("BTCUSDT", {"bid1Price": "99"})
+    assert not prices.apply_ticker("BTCUSDT", {"lastPrice": "100"})
+    assert prices.apply_ticker("BTCUSDT", {"lastPrice": "101"})
+    assert prices.get_price("BTCUSDT") == 101.0
+    assert market.get("BTCUSDT")[0] == 101.0
@@ -0,0 +1,14 @@
+from api.master_api import MasterAPIPool
+
+
+def test_pool_shares_session_but_not_token():
+    pool = MasterAPIPool()
+    try:
+        poller = pool.get("https://master.example", "token-a")
+        login = pool.get("https://master.example/api/", None)
+
+        assert poller.session is login.session
+        assert poller._headers()["Authorization"] == "Bearer token-a"
+        assert "Authorization" not in login._headers()
+    finally:
+        pool.close()
@@ -0,0 +1,42 @@
+import threading
+from database.db import Database
+from database.migrations import run_migrations
+from database.repositories.order_history_repo import OrderHistoryRepository
+
+
+def _order(order_id, status="Filled", symbol="BTCUSDT"):
+    return {"orderId": order_id, "symbol": symbol, "side": "Buy", "orderType": "Market", "qty": "1",
+            "price": "0", "avgPrice": "100", "orderStatus": status, "createdTime": "1", "updatedTime": "2"}
+
+
+def test_statuses_come_from_table(tmp_path):
+    db = Database(tmp_path / "terminal.db")
+    run_migrations(db)
+    repo = OrderHistoryRepository(db)
+    repo.upsert_orders([_order("a"), _order("b", symbol="ETHUSDT")])
+
+    assert repo.get_statuses() == ["Filled"]
+    assert repo.get_symbols() == ["BTCUSDT", "ETHUSDT"]
+    db.close()
+
+
+def test_readonly_view_does_not_wait_for_writer(tmp_path):
+    db = Database(tmp_path / "terminal.db")
+    run_migrations(db)
+    OrderHistoryRepository(db).upsert_orders([_order("a")])
+    view = OrderHistoryRepository(Database(db.db_path, readonly=True))
+
+    # Пишущее соединение занято (как при пакетной записи синхронизации)
+    released = threading.Event()
+    with db._lock:
+        db.conn.execute("BEGIN IMMEDIATE")
+        db.conn.execute("DELETE FROM order_history")
+        worker = threading.Thread(target=lambda: (view.count(), released.set()))
+        worker.start()
+        assert released.wait(2)
+        db.conn.rollback()
+    worker.join()
+
+    assert view.count() == 1
+    view.db.close()
+    db.close()
@@ -0,0 +1,198 @@
+import pytest
+from api.master_api import MasterRejectedError
+from database.db import Database
+from database.migrations import run_migrations
+from services.outbox_service import OutboxService
+from config import OUTBOX_MAX_ATTEMPTS, OUTBOX_CLOSE_WAIT_TIMEOUT
+
+
+class FakeLogger:
+    def __init__(self):
+        self.records = []
+
+    def _log(self, level, message, data=None):
+        self.records.append((level, message, data))
+
+    def info(self, message, data=None):
+        self._log("info", message, data)
+
+    def warning(self, message, data=None):
+        self._log("warning", message, data)
+
+    def error(self, message, data=None):
+        self._log("error", message, data)
+
+
+class FakeMaster:
+    """Мастер-API: ответы по очереди из replies (исключение - бросается)"""
+
+    def __init__(self):
+        self.calls = []
+        self.replies = []
+
+    def _reply(self, name, data, default):
+        self.calls.append((name, data))
+        reply = self.replies.pop(0) if self.replies else default
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    def send_log(self, data):
+        return self._reply("log", data, {"success": True})
+
+    def open_trade(self, data, idempotency_key=None):
+        self.calls.append(("open_key", idempotency_key))
+        return self._reply("open", data, {"success": True, "trade_id": 77})
+
+    def close_trade(self, data):
+        return self._reply("close", data, {"success": True})
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(tmp_path / "terminal.db")
+    run_migrations(database)
+    yield database
+    database.close()
+
+
+@pytest.fixture
+def master():
+    return FakeMaster()
+
+
+@pytest.fixture
+def outbox(db, master):
+    return OutboxService(FakeLogger(), db, lambda: master)
+
+
+def _due_all(outbox):
+    """Сделать все живые записи готовыми к отправке"""
+    outbox.repo.db.execute("UPDATE outbox SET next_attempt_at = 0")
+
+
+def _open_trade(outbox):
+    local_id = outbox.trade_repo.open_local("BTCUSDT", "Buy", 1.0, 100.0, 0)
+    outbox.enqueue(outbox.KIND_TRADE_OPEN, {
+        "local_trade_id": local_id, "client_trade_id": "mtabc-1-0",
+        "symbol": "BTCUSDT", "side": "Buy", "entry_qty": 1.0, "entry_price": 100.0,
+    })
+    return local_id
+
+
+def test_flush_sends_in_order_and_deletes(outbox, master):
+    outbox.enqueue(outbox.KIND_LOG, {"order_id": 1})
+    outbox.enqueue(outbox.KIND_LOG, {"order_id": 2})
+
+    assert outbox.flush() == 2
+    assert [c[1]["order_id"] for c in master.calls] == [1, 2]
+    assert outbox.repo.count_pending() == 0
+
+
+def test_open_close_chain_uses_server_trade_id(outbox, master):
+    local_id = _open_trade(outbox)
+    outbox.enqueue(outbox.KIND_TRADE_CLOSE, {"local_trade_id": local_id, "exit_qty": 1.0, "exit_price": 110.0})
+
+    assert outbox.flush() == 2
+    assert ("open_key", "mtabc-1-0") in master.calls
+    close = [c for c in master.calls if c[0] == "close"][0][1]
+    assert close["trade_id"] == 77
+    assert outbox.trade_repo.get(local_id)["server_trade_id"] == 77
+
+
+def test_transient_error_reschedules_with_backoff(outbox, master):
+    master.replies = [RuntimeError("master down")]
+    outbox.enqueue(outbox.KIND_LOG, {"order_id": 1})
+
+    assert outbox.flush() == 0
+    assert outbox.repo.count_pending() == 1
+    # Отложена - в ближайшую пачку не попадает
+    assert outbox.flush() == 0
+    assert len(master.calls) == 1
+
+    _due_all(outbox)
+    assert outbox.flush() == 1
+
+
+def test_rejection_goes_to_dead_letter(outbox, master):
+    master.replies = [{"success": False, "message": "bad symbol", "status": 422}]
+    outbox.enqueue(outbox.KIND_LOG, {"order_id": 1})
+
+    outbox.flush()
+    _due_all(outbox)
+    outbox.flush()
+
+    assert len(master.calls) == 1
+    assert outbox.repo.count_pending() == 0
+    assert outbox.repo.count_dead() == 1
+
+
+def test_attempts_exhausted_goes_to_dead_letter(outbox, master):
+    master.replies = [RuntimeError("master down")] * OUTBOX_MAX_ATTEMPTS
+    outbox.enqueue(outbox.KIND_LOG, {"order_id": 1})
+
+    for _ in range(OUTBOX_MAX_ATTEMPTS + 2):
+        _due_all(outbox)
+        outbox.flush()
+
+    assert len(master.calls) == OUTBOX_MAX_ATTEMPTS
+    assert outbox.repo.count_dead() == 1
+
+
+def test_missing_trade_id_is_retried_with_same_key(outbox, master):
+    master.replies = [{"success": True}, {"success": True, "trade_id": 5}]
+    local_id = _open_trade(outbox)
+
+    outbox.flush()
+    _due_all(outbox)
+    outbox.flush()
+
+    keys = [c[1] for c in master.calls if c[0] == "open_key"]
+    assert keys == ["mtabc-1-0", "mtabc-1-0"]
+    assert outbox.trade_repo.get(local_id)["server_trade_id"] == 5
+
+
+def test_close_of_undelivered_open_is_unresolved(outbox, master):
+    master.replies = [MasterRejectedError("trades disabled")]
+    local_id = _open_trade(outbox)
+    outbox.enqueue(outbox.KIND_TRADE_CLOSE, {"local_trade_id": local_id, "exit_qty": 1.0, "exit_price": 110.0})
+
+    outbox.flush()
+
+    assert outbox.repo.count_dead() == 2
+    assert outbox.trade_repo.get(local_id)["status"] == "unresolved"
+    assert not [c for c in master.calls if c[0] == "close"]
+
+
+def test_close_waits_then_times_out(outbox, master):
+    local_id = _open_trade(outbox)
+    outbox.enqueue(outbox.KIND_TRADE_CLOSE, {"local_trade_id": local_id, "exit_qty": 1.0, "exit_price": 110.0})
+    # Открытие отложено (мастер недоступен), закрытие ждёт его
+    outbox.repo.db.execute("UPDATE outbox SET next_attempt_at = 9e15 WHERE kind = 'trade_open'")
+
+    due_close = "UPDATE outbox SET next_attempt_at = 0 WHERE kind = 'trade_close'"
+    outbox.repo.db.execute(due_close)
+    outbox.flush()
+    assert outbox.repo.count_dead() == 0
+
+    outbox.repo.db.execute("UPDATE outbox SET created_at = created_at - ? WHERE kind = 'trade_close'",
+                           (OUTBOX_CLOSE_WAIT_TIMEOUT * 1000,))
+    outbox.repo.db.execute(due_close)
+    outbox.flush()
+
+    assert outbox.repo.count_dead() == 1
+    assert outbox.trade_repo.get(local_id)["status"] == "unresolved"
+    errors = [r for r in outbox.logger.records if r[0] == "error"]
+    assert len(errors) == 1
+
+
+def test_fill_patches_held_report_once_without_internal_marker(outbox, master):
+    outbox.enqueue(outbox.KIND_LOG, {"order_id": 1, "terminal_price": None}, ref="ex-1", hold=60)
+    assert outbox.flush() == 0
+
+    assert outbox.apply_fill("ex-1", {"price": 101.5, "fee": 0.1}) == 1
+    # Повторное исполнение того же ордера уже подставленную цену не трогает
+    assert outbox.apply_fill("ex-1", {"price": 99.0}) == 0
+
+    assert outbox.flush() == 1
+    assert master.calls == [("log", {"order_id": 1, "terminal_price": 101.5, "terminal_fee": 0.1})]
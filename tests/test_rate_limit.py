@@ -0,0 +1,61 @@
+import time
+import pytest
+import requests
+from utils.async_executor import PRIORITY_TRADE, PRIORITY_UI
+from utils.rate_limit import RateGovernor, RateLimitShed
+
+
+def _response(path, headers):
+    response = requests.Response()
+    response.headers.update(headers)
+    response.request = requests.Request("GET", "https://api-testnet.bybit.com" + path).prepare()
+    return response
+
+
+def test_reserve_is_kept_for_trading():
+    governor = RateGovernor(limits={"order": 10}, reserve=0.3, defer=0)
+
+    # Не торговые запросы останавливаются, когда остаётся резерв (3 токена)
+    for _ in range(7):
+        governor.acquire("order", PRIORITY_UI)
+    with pytest.raises(RateLimitShed):
+        governor.acquire("order", PRIORITY_UI)
+
+    for _ in range(3):
+        governor.acquire("order", PRIORITY_TRADE)
+    stats = governor.headroom()["order"]
+    assert stats["shed"] == 1
+    assert stats["acquired"] == 10
+
+
+def test_unknown_group_is_not_limited():
+    governor = RateGovernor(limits={"order": 1}, defer=0)
+    for _ in range(5):
+        governor.acquire(None, PRIORITY_UI)
+
+
+def test_exchange_headers_tighten_bucket():
+    governor = RateGovernor(limits={"order_query": 50}, reserve=0.3, defer=0)
+    reset_ms = int((time.time() + 60) * 1000)
+    governor.observe(_response("/v5/order/realtime", {
+        "X-Bapi-Limit-Status": "0",
+        "X-Bapi-Limit": "50",
+        "X-Bapi-Limit-Reset-Timestamp": str(reset_ms),
+    }))
+
+    with pytest.raises(RateLimitShed):
+        governor.acquire("order_query", PRIORITY_UI)
+    stats = governor.headroom()["order_query"]
+    assert stats["remaining"] == 0
+    assert stats["exhausted"] == 1
+    assert stats["blocked_for"] > 50
+
+
+def test_trade_waits_for_refill():
+    governor = RateGovernor(limits={"order": 20}, reserve=0, defer=0)
+    for _ in range(20):
+        governor.acquire("order", PRIORITY_TRADE)
+    started = time.monotonic()
+    governor.acquire("order", PRIORITY_TRADE)
+    # Один токен при 20/с - около 50 мс
+    assert 0.02 < time.monotonic() - started < 1.0
@@ -0,0 +1,120 @@
+import pytest
+import requests
+from pybit.exceptions import FailedRequestError, InvalidRequestError as PybitInvalidRequest
+from utils import resilience
+from utils.rate_limit import RateLimitShed
+from utils.resilience import (
+    AmbiguousOrderError,
+    AuthError,
+    CircuitBreaker,
+    CircuitOpenError,
+    InvalidRequestError,
+    RateLimitedError,
+    TransientError,
+    classify,
+    retry_call,
+)
+
+
+def _bybit(code):
+    return PybitInvalidRequest("POST /v5/order/create", "error", code, "00:00:00", {})
+
+
+def _http(status):
+    return FailedRequestError("POST /v5/order/create", "http error", status, "00:00:00", {})
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(resilience.time, "sleep", lambda s: None)
+
+
+@pytest.mark.parametrize("exc, expected, code", [
+    (_bybit(10006), RateLimitedError, 10006),
+    (_bybit(10003), AuthError, 10003),
+    (_bybit(10002), TransientError, 10002),
+    (_bybit(110007), InvalidRequestError, 110007),
+    (_http(403), RateLimitedError, 403),
+    (_http(401), AuthError, 401),
+    (_http(404), InvalidRequestError, 404),
+    (_http(502), TransientError, 502),
+    (RateLimitShed("shed"), RateLimitedError, None),
+])
+def test_classify(exc, expected, code):
+    err = classify(exc)
+    assert type(err) is expected
+    assert err.code == code
+
+
+def test_classify_order_outcome_is_ambiguous_after_send():
+    assert isinstance(classify(requests.exceptions.ReadTimeout(), order=True), AmbiguousOrderError)
+    assert isinstance(classify(_bybit(10016), order=True), AmbiguousOrderError)
+    # Соединение не установлено - запрос точно не дошёл
+    err = classify(requests.exceptions.ConnectTimeout(), order=True)
+    assert type(err) is TransientError
+
+
+def _flaky(failures):
+    calls = []
+
+    def func():
+        calls.append(1)
+        if len(calls) <= len(failures):
+            raise failures[len(calls) - 1]
+        return "ok"
+    return func, calls
+
+
+def test_retry_call_retries_transient_errors():
+    func, calls = _flaky([requests.exceptions.ConnectionError(), _bybit(10006)])
+    assert retry_call(func, attempts=3) == "ok"
+    assert len(calls) == 3
+
+
+def test_retry_call_does_not_retry_rejections():
+    func, calls = _flaky([_bybit(110007)])
+    with pytest.raises(InvalidRequestError):
+        retry_call(func, attempts=3)
+    assert len(calls) == 1
+
+
+def test_retry_call_does_not_retry_ambiguous_orders():
+    func, calls = _flaky([AmbiguousOrderError("timeout")])
+    with pytest.raises(AmbiguousOrderError):
+        retry_call(func, attempts=3)
+    assert len(calls) == 1
+
+
+def test_retry_call_gives_up_after_attempts():
+    func, calls = _flaky([_http(502)] * 5)
+    with pytest.raises(TransientError):
+        retry_call(func, attempts=3)
+    assert len(calls) == 3
+
+
+def test_breaker_opens_and_probes(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: clock[0])
+    breaker = CircuitBreaker("order", failures=3, reset_timeout=10)
+
+    for _ in range(3):
+        breaker.check()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+    clock[0] += 10
+    breaker.check()  # пробный запрос
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.check()  # второй - пока проба не завершилась
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock[0] += 10
+    breaker.check()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.snapshot()["opened"] == 2
@@ -0,0 +1,85 @@
+import threading
+import time
+import pytest
+from core.scheduler import Scheduler
+
+
+class FakeLogger:
+    def __init__(self):
+        self.errors = []
+
+    def warning(self, message, data=None):
+        pass
+
+    def error(self, message, data=None):
+        self.errors.append((message, data))
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = Scheduler(FakeLogger(), max_workers=2)
+    scheduler.start()
+    yield scheduler
+    scheduler.stop()
+
+
+def _wait(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_slow_task_does_not_delay_others(scheduler):
+    release = threading.Event()
+    fast = []
+    scheduler.add_task("slow", 0.02, release.wait)
+    scheduler.add_task("fast", 0.02, lambda: fast.append(1))
+
+    assert _wait(lambda: len(fast) >= 5)
+    stats = scheduler.get_stats()
+    # Медленная задача не запускается повторно, пока идёт прошлый запуск
+    assert stats["slow"]["running"]
+    assert stats["slow"]["runs"] == 0
+    assert stats["slow"]["skipped"] > 0
+    release.set()
+    assert _wait(lambda: scheduler.get_stats()["slow"]["runs"] >= 1)
+
+
+def test_errors_are_counted_and_task_keeps_running(scheduler):
+    def fail():
+        raise RuntimeError("boom")
+
+    scheduler.add_task("fail", 0.02, fail)
+    assert _wait(lambda: scheduler.get_stats()["fail"]["errors"] >= 2)
+    assert scheduler.logger.errors[0][1]["task"] == "fail"
+
+
+def test_remove_and_replace_task(scheduler):
+    calls = []
+    scheduler.add_task("job", 0.02, lambda: calls.append("old"))
+    scheduler.add_task("job", 0.02, lambda: calls.append("new"))
+    assert _wait(lambda: len(calls) >= 2)
+    assert set(calls) == {"new"}
+
+    scheduler.remove_task("job")
+    time.sleep(0.05)
+    count = len(calls)
+    time.sleep(0.1)
+    assert len(calls) == count
+    assert "job" not in scheduler.get_stats()
+
+
+def test_dedicated_task_does_not_wait_for_busy_pool(scheduler):
+    release = threading.Event()
+    polls = []
+    # Все воркеры пула заняты задачами, висящими на "HTTP"
+    for i in range(scheduler.max_workers + 1):
+        scheduler.add_task(f"slow{i}", 0.01, release.wait)
+    scheduler.add_task("poll", 0.02, lambda: polls.append(1), dedicated=True)
+    try:
+        assert _wait(lambda: len(polls) >= 3)
+    finally:
+        release.set()
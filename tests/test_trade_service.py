@@ -0,0 +1,79 @@
+import pytest
+from models.command import Command
+from services.trade_service import TradeService, RELIABLE_PRICE_SOURCES
+
+
+class FakeBybit:
+    def __init__(self, placed=None):
+        self.placed = placed or {"order_id": "oid-1", "error": None, "unknown": False}
+
+    def place_order(self, *args, **kwargs):
+        return dict(self.placed)
+
+    def place_batch_order(self, orders):
+        if not self.placed["order_id"]:
+            return {o["orderLinkId"]: dict(self.placed) for o in orders}
+        return {o["orderLinkId"]: {"order_id": "oid-" + o["orderLinkId"], "error": None, "unknown": False}
+                for o in orders}
+
+
+class FakeMarket:
+    def __init__(self, price, fresh):
+        self.price = price
+        self.fresh = fresh
+
+    def is_fresh(self, symbol):
+        return self.fresh
+
+    def get(self, symbol):
+        return self.price, 0.0 if self.fresh else 60.0
+
+
+class FakeLogger:
+    def error(self, message, data=None):
+        pass
+
+
+def _command(order_type="market", trade_price=None):
+    return Command(id=1, symbol="BTCUSDT", side="Buy", position_side="open", order_type=order_type,
+                   trade_qty=1.0, trade_price=trade_price, status="new")
+
+
+@pytest.mark.parametrize("order_type, trade_price, fresh, expected", [
+    ("market", None, True, (100.0, "snapshot")),
+    ("market", 95.0, False, (95.0, "master")),
+    # Устаревшая цена снимка совпадает с ценой мастера - источник всё равно "master"
+    ("market", 100.0, False, (100.0, "master")),
+    ("market", None, False, (100.0, "stale")),
+    ("limit", 90.0, True, (90.0, "master")),
+    ("limit", None, False, (100.0, "stale")),
+])
+def test_price_source_is_explicit(order_type, trade_price, fresh, expected):
+    service = TradeService(FakeBybit(), FakeLogger(), market=FakeMarket(100.0, fresh))
+    command = _command(order_type, trade_price)
+
+    single = service.execute_command(command, order_link_id="link")
+    batch = service.execute_batch([(command, 1.0, "link")])[0]
+
+    assert (single["price"], single["price_source"]) == expected
+    assert (batch["price"], batch["price_source"]) == expected
+
+
+def test_without_market_price_is_not_reliable():
+    service = TradeService(FakeBybit(), FakeLogger())
+    result = service.execute_command(_command())
+
+    assert result["price_source"] == "none"
+    assert result["price_source"] not in RELIABLE_PRICE_SOURCES
+
+
+@pytest.mark.parametrize("placed, expected", [
+    ({"order_id": "", "error": "timeout", "unknown": True}, {"status": "unknown", "message": "timeout"}),
+    ({"order_id": "", "error": "rejected", "unknown": False}, {"status": "failed", "message": "rejected"}),
+])
+def test_unresolved_order_is_not_reported_failed(placed, expected):
+    service = TradeService(FakeBybit(placed), FakeLogger(), market=FakeMarket(100.0, True))
+    command = _command()
+
+    assert service.execute_command(command, order_link_id="link") == expected
+    assert service.execute_batch([(command, 1.0, "link")]) == [expected]
@@ -0,0 +1,163 @@
+import json
+import queue
+import threading
+import time
+import pytest
+from api.websocket_client import PrivateWebSocketClient, WebSocketClient
+from config import WS_SUBSCRIBE_BATCH
+
+sync_server = pytest.importorskip("websockets.sync.server")
+
+
+class FakeLogger:
+    def debug(self, message, data=None):
+        pass
+
+    info = warning = error = debug
+
+
+class StandInServer:
+    """Локальная замена потока Bybit: пишет запросы клиентов, шлёт сообщения по команде"""
+
+    def __init__(self, auth_ok=True):
+        self.auth_ok = auth_ok
+        self.connections = []
+        self.messages = queue.Queue()
+        self.received = []
+        # Обрыв со стороны сервера не ждёт ответного close от клиента
+        self._server = sync_server.serve(self._handler, "127.0.0.1", 0, close_timeout=0.1)
+        self.url = "ws://127.0.0.1:%d" % self._server.socket.getsockname()[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def _handler(self, ws):
+        self.connections.append(ws)
+        conn = len(self.connections)
+        for raw in ws:
+            msg = json.loads(raw)
+            self.received.append(msg)
+            self.messages.put((conn, msg))
+            if msg.get("op") == "auth":
+                ws.send(json.dumps({"op": "auth", "success": self.auth_ok, "ret_msg": ""}))
+            elif msg.get("op") == "subscribe":
+                ws.send(json.dumps({"op": "subscribe", "success": True}))
+
+    def next(self, op, timeout=5):
+        """Следующий запрос клиента с данным op (ping пропускаются)"""
+        deadline = time.monotonic() + timeout
+        while True:
+            conn, msg = self.messages.get(timeout=max(0.01, deadline - time.monotonic()))
+            if msg.get("op") == op:
+                return conn, msg
+
+    def push(self, payload):
+        self.connections[-1].send(json.dumps(payload))
+
+    def drop(self):
+        self.connections[-1].close()
+
+    def close(self):
+        self._server.shutdown()
+        self._thread.join(timeout=5)
+
+
+@pytest.fixture
+def server():
+    server = StandInServer()
+    yield server
+    server.close()
+
+
+def _client(cls, server, **kwargs):
+    return cls(FakeLogger(), url=server.url, ping_interval=5, reconnect_delay=0.05,
+               max_reconnect_delay=0.1, **kwargs)
+
+
+def _wait(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_subscribes_in_batches_and_dispatches_tickers(server):
+    client = _client(WebSocketClient, server)
+    symbols = [f"S{i:02d}USDT" for i in range(WS_SUBSCRIBE_BATCH + 2)]
+    client.set_symbols(symbols)
+    tickers = queue.Queue()
+    client.on_ticker(lambda symbol, data: tickers.put((symbol, data["lastPrice"])))
+    client.start()
+    try:
+        first = server.next("subscribe")[1]["args"]
+        second = server.next("subscribe")[1]["args"]
+        assert len(first) == WS_SUBSCRIBE_BATCH
+        assert sorted(first + second) == sorted(f"tickers.{s}" for s in symbols)
+        assert _wait(client.is_connected)
+
+        server.push({"topic": "tickers.S01USDT", "data": {"symbol": "S01USDT", "lastPrice": "1.5"}})
+        assert tickers.get(timeout=5) == ("S01USDT", "1.5")
+    finally:
+        client.stop()
+
+
+def test_reconnects_and_resubscribes_current_topics(server):
+    client = _client(WebSocketClient, server)
+    statuses = []
+    client.on_status(statuses.append)
+    client.set_symbols(["BTCUSDT"])
+    client.start()
+    try:
+        assert server.next("subscribe")[1]["args"] == ["tickers.BTCUSDT"]
+        assert _wait(client.is_connected)
+
+        # Дельта при живом соединении - только изменения
+        client.set_symbols(["ETHUSDT"])
+        assert server.next("unsubscribe")[1]["args"] == ["tickers.BTCUSDT"]
+        assert server.next("subscribe")[1]["args"] == ["tickers.ETHUSDT"]
+
+        server.drop()
+        conn, msg = server.next("subscribe")
+        assert conn == 2
+        assert msg["args"] == ["tickers.ETHUSDT"]
+        assert _wait(client.is_connected)
+        assert client.reconnects == 1
+        assert statuses == [True, False, True]
+    finally:
+        client.stop()
+    assert not client.is_connected()
+
+
+def test_private_stream_authenticates_before_subscribe(server):
+    client = _client(PrivateWebSocketClient, server, api_key="key", api_secret="secret")
+    updates = queue.Queue()
+    client.on_topic("order", updates.put)
+    client.start()
+    try:
+        conn, auth = server.next("auth")
+        assert auth["args"][0] == "key"
+        assert sorted(server.next("subscribe")[1]["args"]) == sorted(PrivateWebSocketClient.TOPICS)
+
+        server.push({"topic": "order.linear", "data": [{"orderId": "1"}]})
+        assert updates.get(timeout=5) == [{"orderId": "1"}]
+
+        server.drop()
+        assert server.next("auth")[0] == 2
+    finally:
+        client.stop()
+
+
+def test_private_stream_retries_after_rejected_auth():
+    server = StandInServer(auth_ok=False)
+    client = _client(PrivateWebSocketClient, server, api_key="key", api_secret="secret")
+    client.start()
+    try:
+        assert server.next("auth")[0] == 1
+        # Отказ авторизации - переподключение без подписки
+        assert server.next("auth")[0] == 2
+        assert not client.is_connected()
+        assert all(msg.get("op") != "subscribe" for msg in server.received)
+    finally:
+        client.stop()
+        server.close()
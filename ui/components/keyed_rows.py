@@ -0,0 +1,39 @@
+class KeyedRows:
+    """
+    Индекс строк Treeview по ключу (например, символу)
+
+    Хранит key -> iid и последние отрисованные значения, поэтому при
+    обновлении Tk трогается только для новых/удалённых строк и ячеек,
+    текст которых действительно изменился.
+    """
+
+    def __init__(self, tree, columns):
+        self.tree = tree
+        self.columns = tuple(columns)
+        self._iids = {}
+        self._rendered = {}
+
+    def sync(self, rows: dict):
+        """Привести таблицу к rows = {key: values}; порядок новых строк - порядок rows"""
+        for key, values in rows.items():
+            values = tuple(values)
+            old = self._rendered.get(key)
+            if old is None:
+                self._iids[key] = self.tree.insert("", "end", values=values)
+            elif old != values:
+                iid = self._iids[key]
+                for col, old_v, new_v in zip(self.columns, old, values):
+                    if old_v != new_v:
+                        self.tree.set(iid, col, new_v)
+            self._rendered[key] = values
+
+        # Удалить лишние
+        for key in [k for k in self._iids if k not in rows]:
+            self.tree.delete(self._iids.pop(key))
+            del self._rendered[key]
+
+    def clear(self):
+        for iid in self._iids.values():
+            self.tree.delete(iid)
+        self._iids.clear()
+        self._rendered.clear()
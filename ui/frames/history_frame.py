@@ -1,25 +1,84 @@
+import threading
+import tkinter as tk
 from tkinter import ttk
-from datetime import datetime
-from config import HISTORY_ORDERS_LIMIT
+from datetime import datetime, timedelta
+from config import HISTORY_ORDERS_LIMIT, HISTORY_VIEW_MARGIN
+
+
+ALL = "Все"
+PERIODS = {
+    "Всё время": None,
+    "Сегодня": 0,
+    "7 дней": 7,
+    "30 дней": 30,
+}
+
 
 class HistoryFrame(ttk.Frame):
-    """Фрейм для отображения истории исполненных ордеров"""
+    """
+    Фрейм для отображения истории исполненных ордеров
+
+    Таблица виртуальная: строки читаются страницами из локальной таблицы
+    order_history по мере прокрутки, в Treeview живут только видимые
+    строки. Сортировка (клик по заголовку) и фильтры выполняются в SQL.
+    Чтение - через отдельное соединение только для чтения
+    (history_view_repo), поэтому запись синхронизации его не блокирует.
+    Перечитывание по событиям идёт в фоновом потоке, не больше одного
+    запроса за раз: обновления, пришедшие во время запроса, схлопываются
+    в один следующий.
+    """
 
     def __init__(self, parent, app):
         super().__init__(parent)
         self.app = app
+        self.repo = getattr(app, "history_view_repo", None)
+
+        # Отображаемые строки: iid -> (values, tag), порядок iid в дереве
+        # и кэш отформатированных ордеров orderId -> (версия, строка)
+        self._rows = {}
+        self._order = []
+        self._format_cache = {}
+
+        # Состояние виртуальной прокрутки
+        self._total = 0
+        self._offset = 0
+        self._visible = 12
+        self._sort = "time"
+        self._descending = True
+        # Кэш страницы из БД: строки [page_offset, page_offset + len(page_rows))
+        self._page_offset = 0
+        self._page_rows = []
+        # Фоновое перечитывание: идёт запрос / нужен ещё один после него
+        self._querying = False
+        self._refresh_pending = False
+
+        # === Фильтры ===
+        filters = ttk.Frame(self)
+        filters.pack(side="top", fill="x", pady=(0, 2))
+        self.symbol_var = tk.StringVar(value=ALL)
+        self.side_var = tk.StringVar(value=ALL)
+        self.status_var = tk.StringVar(value=ALL)
+        self.period_var = tk.StringVar(value="Всё время")
+        self.symbol_box = self._filter_box(filters, "Символ:", self.symbol_var, (ALL,), 12)
+        self._filter_box(filters, "Сторона:", self.side_var, (ALL, "Buy", "Sell"), 6)
+        self.status_box = self._filter_box(filters, "Статус:", self.status_var, (ALL,), 14)
+        self._filter_box(filters, "Период:", self.period_var, tuple(PERIODS), 10)
+
+        body = ttk.Frame(self)
+        body.pack(side="top", fill="both", expand=True)
 
         # Создаем Treeview
         columns = ("id", "time", "symbol", "side", "type", "qty", "price", "status")
+        self.columns = columns
         self.tree = ttk.Treeview(
-            self,
+            body,
             columns=columns,
             show="headings",
             height=12
         )
 
         # Настройка заголовков
-        headers = {
+        self.headers = {
             "id": "ID",
             "time": "Время",
             "symbol": "Символ",
@@ -30,12 +89,12 @@ class HistoryFrame(ttk.Frame):
             "status": "Статус"
         }
 
-        for col, header in headers.items():
-            self.tree.heading(col, text=header)
+        for col, header in self.headers.items():
+            self.tree.heading(col, text=header, command=lambda c=col: self._on_sort(c))
 
         # Настройка ширины колонок
         self.tree.column("id", width=80, anchor="center", stretch=True)
-        self.tree.column("time", width=80, anchor="center", stretch=True)
+        self.tree.column("time", width=110, anchor="center", stretch=True)
         self.tree.column("symbol", width=70, anchor="center", stretch=True)
         self.tree.column("side", width=50, anchor="center", stretch=True)
         self.tree.column("type", width=50, anchor="center", stretch=True)
@@ -43,95 +102,314 @@ class HistoryFrame(ttk.Frame):
         self.tree.column("price", width=80, anchor="e", stretch=True)
         self.tree.column("status", width=60, anchor="center", stretch=True)
 
-        # Вертикальный скроллбар
-        vs = ttk.Scrollbar(self, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=vs.set)
+        # Вертикальный скроллбар управляет смещением в БД, а не Treeview
+        self.vs = ttk.Scrollbar(body, orient="vertical", command=self._on_scrollbar)
 
         # Layout
         self.tree.pack(side="left", fill="both", expand=True)
-        vs.pack(side="right", fill="y")
+        self.vs.pack(side="right", fill="y")
+
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<MouseWheel>", self._on_wheel)
+        self.tree.bind("<Button-4>", lambda e: self._scroll_to(self._offset - 3))
+        self.tree.bind("<Button-5>", lambda e: self._scroll_to(self._offset + 3))
 
         # Тэги для раскраски
         self.tree.tag_configure("filled", foreground="green")
         self.tree.tag_configure("cancelled", foreground="red")
         self.tree.tag_configure("rejected", foreground="orange")
 
+        self._update_heading()
+        self.refresh()
+
+    def _filter_box(self, parent, label, var, values, width):
+        ttk.Label(parent, text=label).pack(side="left", padx=(4, 2))
+        box = ttk.Combobox(parent, textvariable=var, values=values, state="readonly", width=width)
+        box.pack(side="left")
+        box.bind("<<ComboboxSelected>>", lambda e: self._on_filter())
+        return box
+
     def update(self, orders: list):
-        """Обновить историю ордеров"""
-        # Сортируем ордера по времени (новые первыми)
-        sorted_orders = sorted(
-            orders,
-            key=lambda o: int(o.get("updatedTime") or o.get("createdTime") or 0),
-            reverse=True
-        )
+        """Обновить историю ордеров: данные уже сохранены в БД, перечитываем текущее окно"""
+        if self.repo is None:
+            self._update_from_list(orders)
+            return
+        self.refresh()
+
+    def refresh(self):
+        """Перечитать варианты фильтров, количество строк и текущее окно из БД (в фоне)"""
+        if self.repo is None:
+            return
+        if self._querying:
+            self._refresh_pending = True
+            return
+        self._querying = True
+        self._refresh_pending = False
+        params = (self._filters(), self._sort, self._descending, self._offset, self._visible)
+        threading.Thread(target=self._query, args=params, daemon=True).start()
+
+    def _query(self, filters, sort, descending, offset, visible):
+        """Фоновый поток: все запросы перечитывания; результат применяется в потоке Tk"""
+        try:
+            # Варианты фильтров - только то, что реально есть в таблице
+            symbols = self.repo.get_symbols()
+            statuses = self.repo.get_statuses()
+            total = self.repo.count(filters)
+            offset = max(0, min(offset, total - visible))
+            page_offset = max(0, offset - HISTORY_VIEW_MARGIN)
+            page = self.repo.fetch_page(filters, sort, descending, offset=page_offset,
+                                        limit=visible + 2 * HISTORY_VIEW_MARGIN)
+            result = (symbols, statuses, total, page_offset, page)
+        except Exception as e:
+            self.app.logger.error("History query error", {"error": str(e)})
+            result = None
+        try:
+            self.after(0, self._apply, result)
+        except (RuntimeError, tk.TclError):
+            # Окно уже закрыто
+            pass
+
+    def _apply(self, result):
+        self._querying = False
+        if self._refresh_pending or result is None:
+            # Пока шёл запрос, сменились фильтры/данные - результат устарел
+            if self._refresh_pending:
+                self.refresh()
+            return
+        symbols, statuses, total, page_offset, page = result
+        self.symbol_box.configure(values=(ALL,) + tuple(symbols))
+        self.status_box.configure(values=(ALL,) + tuple(statuses))
+        self._total = total
+        self._page_offset = page_offset
+        self._page_rows = page
+        self._offset = max(0, min(self._offset, self._total - self._visible))
+        self._render()
+
+    def _filters(self) -> dict:
+        filters = {}
+        if self.symbol_var.get() != ALL:
+            filters["symbol"] = self.symbol_var.get()
+        if self.side_var.get() != ALL:
+            filters["side"] = self.side_var.get()
+        if self.status_var.get() != ALL:
+            filters["status"] = self.status_var.get()
+        days = PERIODS.get(self.period_var.get())
+        if days is not None:
+            start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days)
+            filters["since_ms"] = int(start.timestamp() * 1000)
+        return filters
+
+    def _window(self) -> list:
+        """Строки видимого окна; страница из БД берётся с запасом HISTORY_VIEW_MARGIN"""
+        end = self._offset + self._visible
+        page_end = self._page_offset + len(self._page_rows)
+        page_complete = page_end >= self._total
+        if not (self._page_offset <= self._offset and (end <= page_end or page_complete)):
+            self._page_offset = max(0, self._offset - HISTORY_VIEW_MARGIN)
+            self._page_rows = self.repo.fetch_page(
+                self._filters(), self._sort, self._descending,
+                offset=self._page_offset,
+                limit=self._visible + 2 * HISTORY_VIEW_MARGIN
+            )
+        start = self._offset - self._page_offset
+        return self._page_rows[start:start + self._visible]
+
+    def _render(self):
+        try:
+            window = self._window()
+        except Exception as e:
+            self.app.logger.error("History query error", {"error": str(e)})
+            return
+
+        target = []
+        for order in window:
+            values, tag, _ = self._format_row(order)
+            target.append((order["orderId"], values, tag))
+        self._reconcile(target)
+
+        keep = {iid for iid, _, _ in target}
+        for oid in [oid for oid in self._format_cache if oid not in keep]:
+            del self._format_cache[oid]
 
-        # Собираем данные для отображения
-        orders_data = []
-        for order in sorted_orders[:HISTORY_ORDERS_LIMIT]:  # Берем максимум 100 записей
+        if self._total > 0:
+            first = self._offset / self._total
+            last = min(1.0, (self._offset + self._visible) / self._total)
+            self.vs.set(first, last)
+        else:
+            self.vs.set(0.0, 1.0)
+
+    def _scroll_to(self, offset: int):
+        offset = max(0, min(int(offset), self._total - self._visible))
+        if offset != self._offset:
+            self._offset = offset
+            self._render()
+        return "break"
+
+    def _on_scrollbar(self, *args):
+        if not args:
+            return
+        if args[0] == "moveto":
+            self._scroll_to(float(args[1]) * self._total)
+        elif args[0] == "scroll":
+            step = int(args[1])
+            if len(args) > 2 and args[2] == "pages":
+                step *= self._visible
+            self._scroll_to(self._offset + step)
+
+    def _on_wheel(self, e):
+        return self._scroll_to(self._offset - int(e.delta / 120) * 3)
+
+    @staticmethod
+    def _row_height() -> int:
+        """Высота строки Treeview из текущего стиля"""
+        try:
+            return int(ttk.Style().lookup("Treeview", "rowheight") or 0) or 20
+        except (tk.TclError, ValueError):
+            return 20
+
+    def _on_resize(self, e):
+        # Одна строка уходит на заголовок
+        visible = max(1, e.height // self._row_height() - 1)
+        if visible != self._visible:
+            self._visible = visible
+            if self.repo is not None:
+                self._offset = max(0, min(self._offset, self._total - self._visible))
+                self._render()
+
+    def _on_filter(self):
+        self._offset = 0
+        self.refresh()
+
+    def _on_sort(self, col: str):
+        if self._sort == col:
+            self._descending = not self._descending
+        else:
+            self._sort = col
+            self._descending = col == "time"
+        self._update_heading()
+        self._offset = 0
+        self.refresh()
+
+    def _update_heading(self):
+        for col, header in self.headers.items():
+            mark = (" ▼" if self._descending else " ▲") if col == self._sort else ""
+            self.tree.heading(col, text=header + mark)
+
+    def _update_from_list(self, orders: list):
+        """Режим без БД: последние HISTORY_ORDERS_LIMIT ордеров из переданного списка"""
+        rows = {}
+        for order in orders:
             order_id = order.get("orderId")
             if not order_id:
                 continue
+            rows[order_id] = self._format_row(order)
+
+        # Сортируем ордера по времени (новые первыми)
+        target_ids = sorted(rows, key=lambda oid: rows[oid][2], reverse=True)[:HISTORY_ORDERS_LIMIT]
+        self._reconcile([(oid, rows[oid][0], rows[oid][1]) for oid in target_ids])
 
-            symbol = order.get("symbol", "")
-            side = order.get("side", "")
-            order_type = order.get("orderType", "")
-            qty = float(order.get("qty", 0))
+        # В кэше форматирования держим только отображаемые ордера
+        keep = set(target_ids)
+        for oid in [oid for oid in self._format_cache if oid not in keep]:
+            del self._format_cache[oid]
 
-            # Для истории берем среднюю цену исполнения
-            avg_price = float(order.get("avgPrice") or 0)
-            order_price = float(order.get("price") or 0)
-            display_price = avg_price if avg_price > 0 else order_price
+    def _format_row(self, order: dict) -> tuple:
+        """(values, tag, timestamp) для ордера; пересчитывается только при изменении ордера"""
+        order_id = order["orderId"]
+        version = (
+            order.get("updatedTime"),
+            order.get("orderStatus"),
+            order.get("qty"),
+            order.get("avgPrice"),
+            order.get("price"),
+        )
+        cached = self._format_cache.get(order_id)
+        if cached and cached[0] == version:
+            return cached[1]
 
-            status = order.get("orderStatus", "")
+        symbol = order.get("symbol", "")
+        side = order.get("side", "")
+        order_type = order.get("orderType", "")
+        qty = float(order.get("qty", 0))
 
-            # Используем время обновления для истории
-            timestamp = int(order.get("updatedTime") or order.get("createdTime") or 0)
-            time_str = (
-                datetime.fromtimestamp(timestamp / 1000).strftime("%H:%M:%S")
-                if timestamp else "-"
-            )
+        # Для истории берем среднюю цену исполнения
+        avg_price = float(order.get("avgPrice") or 0)
+        order_price = float(order.get("price") or 0)
+        display_price = avg_price if avg_price > 0 else order_price
 
-            values = (
-                order_id[-8:],
-                time_str,
-                symbol,
-                side,
-                order_type,
-                f"{qty:.4f}",
-                f"{display_price:.2f}" if display_price > 0 else "Market",
-                status
-            )
+        status = order.get("orderStatus", "")
 
-            # Определяем тег по статусу
-            tag = ""
-            if status == "Filled":
-                tag = "filled"
-            elif status == "Cancelled":
-                tag = "cancelled"
-            elif status == "Rejected":
-                tag = "rejected"
+        # Используем время обновления для истории
+        timestamp = int(order.get("updatedTime") or order.get("createdTime") or 0)
+        time_str = (
+            datetime.fromtimestamp(timestamp / 1000).strftime("%d.%m %H:%M:%S")
+            if timestamp else "-"
+        )
+
+        values = (
+            order_id[-8:],
+            time_str,
+            symbol,
+            side,
+            order_type,
+            f"{qty:.4f}",
+            f"{display_price:.2f}" if display_price > 0 else "Market",
+            status
+        )
 
-            orders_data.append((order_id, values, tag, timestamp))
+        # Определяем тег по статусу
+        tag = ""
+        if status == "Filled":
+            tag = "filled"
+        elif status == "Cancelled":
+            tag = "cancelled"
+        elif status == "Rejected":
+            tag = "rejected"
 
-        # Получаем текущие ID
-        existing_ids = {self.tree.item(iid)["values"][0]: iid for iid in self.tree.get_children()}
-        new_order_ids = {data[0][-8:] for data in orders_data}
+        row = (values, tag, timestamp)
+        self._format_cache[order_id] = (version, row)
+        return row
 
-        # Удаляем устаревшие записи
-        for short_id, iid in list(existing_ids.items()):
-            if short_id not in new_order_ids:
+    def _reconcile(self, target: list):
+        """
+        Привести Treeview к списку target = [(iid, values, tag), ...]
+
+        Новые строки вставляются на свою позицию, у изменённых обновляются
+        только изменившиеся ячейки, неизменённые строки не трогаются.
+        """
+        target_ids = {iid for iid, _, _ in target}
+
+        for iid in self._order:
+            if iid not in target_ids:
                 self.tree.delete(iid)
+                del self._rows[iid]
+        current = [iid for iid in self._order if iid in target_ids]
 
-        # Обновляем или добавляем записи
-        # Очищаем дерево и заполняем заново в правильном порядке
-        # Это предотвращает "прыжки" списка
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        for index, (iid, values, tag) in enumerate(target):
+            old = self._rows.get(iid)
+            if old is None:
+                self.tree.insert("", index, iid=iid, values=values, tags=(tag,))
+                current.insert(index, iid)
+            else:
+                old_values, old_tag = old
+                if old_values != values:
+                    for col, old_v, new_v in zip(self.columns, old_values, values):
+                        if old_v != new_v:
+                            self.tree.set(iid, col, new_v)
+                if old_tag != tag:
+                    self.tree.item(iid, tags=(tag,))
+                if current[index] != iid:
+                    self.tree.move(iid, "", index)
+                    current.remove(iid)
+                    current.insert(index, iid)
+            self._rows[iid] = (values, tag)
 
-        for order_id, values, tag, timestamp in orders_data:
-            self.tree.insert("", "end", iid=order_id, values=values, tags=(tag,))
+        self._order = current
 
     def clear(self):
         """Очистить всю историю"""
         for item in self.tree.get_children():
-            self.tree.delete(item)
\ No newline at end of file
+            self.tree.delete(item)
+        self._rows.clear()
+        self._order = []
+        self._format_cache.clear()
\ No newline at end of file
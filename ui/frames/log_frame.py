@@ -1,8 +1,27 @@
 import tkinter as tk
+from collections import deque
 from tkinter import ttk
+from config import (
+    LOG_VIEW_MAX_LINES,
+    LOG_VIEW_FLUSH_MS,
+    LOG_VIEW_MAX_LINES_PER_TICK,
+    LOG_VIEW_MAX_PENDING,
+)
+
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR")
 
 
 class LogFrame(ttk.Frame):
+    """
+    Лог в нижней части окна
+
+    Сообщения из любых потоков складываются во входную очередь, а в поток
+    Tk переносятся пачкой раз в LOG_VIEW_FLUSH_MS: добавляются только новые
+    строки, старые срезаются сверху. За один тик вставляется не больше
+    LOG_VIEW_MAX_LINES_PER_TICK строк, переполнение входной очереди
+    отбрасывает самые старые сообщения.
+    """
+
     def __init__(self, parent, app):
         super().__init__(parent)
         self.app = app
@@ -10,10 +29,34 @@ class LogFrame(ttk.Frame):
         self.text = tk.Text(self, height=4, state="disabled")
         vs = ttk.Scrollbar(self, orient="vertical", command=self.text.yview)
         self.text.configure(yscrollcommand=vs.set)
+
+        # Минимальный уровень отображаемых сообщений
+        self.level_var = tk.StringVar(value=LOG_LEVELS[0])
+        level_box = ttk.Combobox(self, textvariable=self.level_var, values=LOG_LEVELS,
+                                 state="readonly", width=9)
+        level_box.bind("<<ComboboxSelected>>", lambda e: self._rerender())
+
         self.text.pack(side="left", fill="both", expand=True)
+        level_box.pack(side="right", anchor="n", padx=(2, 0))
         vs.pack(side="right", fill="y")
-        self.buffer = []
+
+        # Кольцевой буфер (level, line) - источник для перерисовки при смене фильтра
+        self.buffer = deque(maxlen=LOG_VIEW_MAX_LINES)
+        # Входная очередь из других потоков (append/popleft у deque потокобезопасны)
+        self._incoming = deque()
+        self._dropped = 0
+
         self.app.events.subscribe("on_ui_log", self._on_log)
+        self._flush_after = self.after(LOG_VIEW_FLUSH_MS, self._flush)
+
+    def destroy(self):
+        # Иначе при пересоздании окна (перелогин) подписчик и его поток доставки остаются
+        self.app.events.unsubscribe("on_ui_log", self._on_log)
+        # Тик отрисовки не должен срабатывать на уничтоженном виджете
+        if self._flush_after is not None:
+            self.after_cancel(self._flush_after)
+            self._flush_after = None
+        super().destroy()
 
     def _on_log(self, data):
         level = data.get("level", "INFO")
@@ -29,17 +72,65 @@ class LogFrame(ttk.Frame):
         self._append(level, tstr + msg, extra)
 
     def _append(self, level, message, data):
+        line = f"[{level}] {message}"
+        if data:
+            line += f" {data}"
+        self._incoming.append((level, line))
+        if len(self._incoming) > LOG_VIEW_MAX_PENDING:
+            try:
+                self._incoming.popleft()
+                self._dropped += 1
+            except IndexError:
+                pass
+
+    def _visible(self, level) -> bool:
         try:
-            line = f"[{level}] {message}"
-            if data:
-                line += f" {data}"
-            self.buffer.append(line)
-            if len(self.buffer) > 100:
-                self.buffer = self.buffer[-100:]
-            self.text.configure(state="normal")
-            self.text.delete("1.0", "end")
-            self.text.insert("end", "\n".join(self.buffer) + "\n")
-            self.text.configure(state="disabled")
-            self.text.see("end")
+            return LOG_LEVELS.index(level) >= LOG_LEVELS.index(self.level_var.get())
+        except ValueError:
+            return True
+
+    def _flush(self):
+        if not self.winfo_exists():
+            return
+        try:
+            batch = []
+            if self._dropped:
+                batch.append(("WARNING", f"[WARNING] ... пропущено строк лога: {self._dropped}"))
+                self._dropped = 0
+            while self._incoming and len(batch) < LOG_VIEW_MAX_LINES_PER_TICK:
+                batch.append(self._incoming.popleft())
+
+            if batch:
+                self.buffer.extend(batch)
+                lines = [line for level, line in batch if self._visible(level)]
+                if lines:
+                    self._insert(lines)
         except Exception:
-            pass
\ No newline at end of file
+            pass
+        self._flush_after = self.after(LOG_VIEW_FLUSH_MS, self._flush)
+
+    def _insert(self, lines):
+        # Автопрокрутка только если пользователь и так внизу
+        at_bottom = self.text.yview()[1] >= 0.999
+        self.text.configure(state="normal")
+        self.text.insert("end", "\n".join(lines) + "\n")
+        # Считаем строки текста, а не сообщения: трейсбек или dict занимают несколько
+        excess = self._line_count() - LOG_VIEW_MAX_LINES
+        if excess > 0:
+            self.text.delete("1.0", f"{excess + 1}.0")
+        self.text.configure(state="disabled")
+        if at_bottom:
+            self.text.see("end")
+
+    def _line_count(self) -> int:
+        # Текст всегда заканчивается переводом строки - последняя строка пустая
+        return int(self.text.index("end-1c").split(".")[0]) - 1
+
+    def _rerender(self):
+        lines = [line for level, line in self.buffer if self._visible(level)]
+        self.text.configure(state="normal")
+        self.text.delete("1.0", "end")
+        self.text.configure(state="disabled")
+        if lines:
+            self._insert(lines)
+        self.text.see("end")
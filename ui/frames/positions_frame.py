@@ -1,4 +1,5 @@
 from tkinter import ttk
+from ui.components.keyed_rows import KeyedRows
 
 
 class PositionsFrame(ttk.Frame):
@@ -18,19 +19,12 @@ class PositionsFrame(ttk.Frame):
         self.tree.configure(yscrollcommand=vs.set)
         self.tree.pack(side="left", fill="both", expand=True)
         vs.pack(side="right", fill="y")
+        self.rows = KeyedRows(self.tree, ("symbol", "side", "size", "avg", "pnl"))
 
     def update(self, positions: list):
-        # Обновление без мерцания: только изменённые строки
-        items = {self.tree.item(i, "values")[0]: i for i in self.tree.get_children()}
+        # Обновление без мерцания: только изменённые ячейки
+        rows = {}
         for p in positions:
             symbol = p.get("symbol", "")
-            values = (symbol, p.get("side", ""), p.get("size", 0), p.get("avg_price", 0), p.get("unrealised_pnl", 0))
-            if symbol in items:
-                self.tree.item(items[symbol], values=values)
-            else:
-                self.tree.insert("", "end", values=values)
-        # Удалить лишние
-        symbols = {p.get("symbol") for p in positions}
-        for i in list(items.values()):
-            if self.tree.item(i, "values")[0] not in symbols:
-                self.tree.delete(i)
\ No newline at end of file
+            rows[symbol] = (symbol, p.get("side", ""), p.get("size", 0), p.get("avg_price", 0), p.get("unrealised_pnl", 0))
+        self.rows.sync(rows)
@@ -1,4 +1,5 @@
 from tkinter import ttk
+from ui.components.keyed_rows import KeyedRows
 
 
 class PricesFrame(ttk.Frame):
@@ -16,21 +17,11 @@ class PricesFrame(ttk.Frame):
         self.tree.pack(side="left", fill="both", expand=True)
         vs.pack(side="right", fill="y")
         self.bind("<Configure>", self._on_resize)
+        self.rows = KeyedRows(self.tree, ("symbol", "price"))
 
     def update_prices(self, data: dict):
-        # Обновление без мерцания: только изменённые строки
-        items = {self.tree.item(i, "values")[0]: i for i in self.tree.get_children()}
-        for symbol, price in data.items():
-            values = (symbol, f"{price:,.2f}")
-            if symbol in items:
-                self.tree.item(items[symbol], values=values)
-            else:
-                self.tree.insert("", "end", values=values)
-        # Удалить лишние
-        symbols = set(data.keys())
-        for i in list(items.values()):
-            if self.tree.item(i, "values")[0] not in symbols:
-                self.tree.delete(i)
+        # Обновление без мерцания: только изменённые ячейки
+        self.rows.sync({symbol: (symbol, f"{price:,.2f}") for symbol, price in data.items()})
 
     def _on_resize(self, e):
         try:
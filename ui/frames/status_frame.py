@@ -1,4 +1,5 @@
 from tkinter import ttk
+from config import CLOCK_SKEW_WARN_MS
 
 
 class StatusFrame(ttk.Frame):
@@ -9,11 +10,13 @@ class StatusFrame(ttk.Frame):
         self.bybit_label = ttk.Label(self, text="Bybit: ● Отключено")
         self.balance_label = ttk.Label(self, text="Кошелёк: $0.00")
         self.trading_label = ttk.Label(self, text="Торговый: $0.00")
+        self.clock_label = ttk.Label(self, text="Часы: —")
         self.api_label.grid(row=0, column=0, sticky="w", padx=(0, 12))
         self.bybit_label.grid(row=0, column=1, sticky="w", padx=(0, 12))
         self.balance_label.grid(row=0, column=2, sticky="w", padx=(0, 12))
-        self.trading_label.grid(row=0, column=3, sticky="w")
-        self.columnconfigure(4, weight=1)
+        self.trading_label.grid(row=0, column=3, sticky="w", padx=(0, 12))
+        self.clock_label.grid(row=0, column=4, sticky="w")
+        self.columnconfigure(5, weight=1)
         
         # Initialize status from app state
         self.set_api_status(app.connected_api)
@@ -30,6 +33,15 @@ class StatusFrame(ttk.Frame):
         else:
             self.api_label.config(text="API: ● Ошибка", foreground="red")
 
+    def set_clock_skew(self, data: dict):
+        """Смещение локальных часов относительно Bybit"""
+        if not data.get("synced"):
+            self.clock_label.config(text="Часы: —", foreground="")
+            return
+        offset = data.get("offset_ms", 0.0)
+        color = "red" if abs(offset) > CLOCK_SKEW_WARN_MS else ""
+        self.clock_label.config(text=f"Часы: {offset:+.0f} мс", foreground=color)
+
     def set_bybit_status(self, connected: bool):
         if connected:
             self.bybit_label.config(text="Bybit: ● Подключено", foreground="green")
@@ -6,6 +6,7 @@ from ui.frames.positions_frame import PositionsFrame
 from ui.frames.orders_frame import OrdersFrame
 from ui.frames.history_frame import HistoryFrame
 from ui.frames.log_frame import LogFrame
+from config import UI_RENDER_FPS
 import threading
 
 
@@ -96,14 +97,37 @@ class MainWindow:
         self.log.grid(row=2, column=0, sticky="ew", padx=4, pady=2)
         root.rowconfigure(2, weight=0)
 
+        # === Отрисовка: обработчики событий только запоминают последнее состояние,
+        # единый тик UI_RENDER_FPS раз в секунду применяет его за один проход ===
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._renderers = {
+            "api_status": self.status.set_api_status,
+            "bybit_status": self.status.set_bybit_status,
+            "clock": self.status.set_clock_skew,
+            "balance": lambda b: self.status.update_balance(*b),
+            "prices": self.prices.update_prices,
+            "positions": self.positions.update,
+            "orders": self.orders.update,
+            "history": self.history.update,
+        }
+        self._render_interval = max(1, 1000 // UI_RENDER_FPS)
+
         # === Подписываемся на события ===
-        self.app.events.subscribe("on_price_updated", self._on_price_updated)
-        self.app.events.subscribe("on_balance_updated", self._on_balance_updated)
-        self.app.events.subscribe("on_positions_updated", self._on_positions_updated)
-        self.app.events.subscribe("on_orders_updated", self._on_orders_updated)
-        self.app.events.subscribe("on_history_updated", self._on_history_updated)
-        self.app.events.subscribe("on_api_status", self._on_api_status)
-        self.app.events.subscribe("on_bybit_status", self._on_bybit_status)
+        self._subscriptions = {
+            "on_price_updated": self._on_price_updated,
+            "on_balance_updated": self._on_balance_updated,
+            "on_positions_updated": self._on_positions_updated,
+            "on_orders_updated": self._on_orders_updated,
+            "on_history_updated": self._on_history_updated,
+            "on_api_status": self._on_api_status,
+            "on_bybit_status": self._on_bybit_status,
+            "on_clock_skew": self._on_clock_skew,
+        }
+        for event_name, handler in self._subscriptions.items():
+            self.app.events.subscribe(event_name, handler)
+
+        self.root.after(self._render_interval, self._render_tick)
 
         # Запускаем инициализацию в фоновом потоке
         threading.Thread(target=self._initialize_async, daemon=True).start()
@@ -111,8 +135,10 @@ class MainWindow:
     def _initialize_async(self):
         """Асинхронная инициализация приложения"""
         try:
-            # 1. Настройка Bybit (это может занять время)
-            self.app.configure_bybit()
+            # 1. Настройка Bybit (это может занять время);
+            # движок в другом процессе уже настроен - не переподключаем его
+            if not getattr(self.app, "remote", False):
+                self.app.configure_bybit()
 
             # 2. Старт приложения (запуск scheduler и задач)
             self.app.start()
@@ -121,35 +147,56 @@ class MainWindow:
         except Exception as e:
             self.app.logger.error("Ошибка инициализации MainWindow", {"error": str(e)})
 
+    def _mark_dirty(self, panel, data):
+        with self._pending_lock:
+            self._pending[panel] = data
+
+    def _render_tick(self):
+        # Окно закрыто (например, после выхода из аккаунта) - останавливаем цикл
+        if not self.prices.winfo_exists():
+            for event_name, handler in self._subscriptions.items():
+                self.app.events.unsubscribe(event_name, handler)
+            return
+
+        with self._pending_lock:
+            pending = self._pending
+            self._pending = {}
+
+        for panel, data in pending.items():
+            try:
+                self._renderers[panel](data)
+            except Exception as e:
+                self.app.logger.error("Render error", {"panel": panel, "error": str(e)})
+
+        self.root.after(self._render_interval, self._render_tick)
+
     def _on_bybit_status(self, data):
-        status = data.get("status", False)
-        self.root.after(0, lambda s=status: self.status.set_bybit_status(s))
+        self._mark_dirty("bybit_status", data.get("status", False))
+
+    def _on_clock_skew(self, data):
+        self._mark_dirty("clock", dict(data))
 
     def _on_api_status(self, data):
-        status = data.get("status", False)
-        self.root.after(0, lambda s=status: self.status.set_api_status(s))
+        self._mark_dirty("api_status", data.get("status", False))
 
     def _on_price_updated(self, data):
-        self.root.after(0, lambda d=dict(data): self.prices.update_prices(d))
+        self._mark_dirty("prices", dict(data))
 
     def _on_balance_updated(self, data):
         wallet = data.get("wallet", 0.0)
         trading = self.app.balance_service.trading_balance
-        self.root.after(0, lambda w=wallet, t=trading: self.status.update_balance(w, t))
+        self._mark_dirty("balance", (wallet, trading))
 
     def _on_positions_updated(self, data):
-        positions = list(data)
-        self.root.after(0, lambda p=positions: self.positions.update(p))
+        self._mark_dirty("positions", list(data))
 
     def _on_orders_updated(self, data):
         """Обработчик обновления ордеров"""
-        orders = list(data)
-        self.root.after(0, lambda o=orders: self.orders.update(o))
+        self._mark_dirty("orders", list(data))
 
     def _on_history_updated(self, data):
         """Обработчик обновления истории ордеров"""
-        history = list(data)
-        self.root.after(0, lambda h=history: self.history.update(h))
+        self._mark_dirty("history", list(data))
 
     def open_settings(self):
         from ui.windows.settings_window import SettingsWindow
@@ -1,21 +1,203 @@
 """
 Утилита для выполнения функций в отдельных потоках
 """
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Callable, List, Any, Dict
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Any, Dict, Hashable, Iterable
 import threading
+import time
+from config import (
+    EXECUTOR_WORKERS,
+    EXECUTOR_PRIORITIES,
+    EXECUTOR_CLASS_LIMITS,
+    EXECUTOR_QUEUE_SIZES,
+)
+
+PRIORITY_TRADE = "trade"
+PRIORITY_STATE = "state"
+PRIORITY_UI = "ui"
+
+
+class ExecutorQueueFull(RuntimeError):
+    """Очередь класса приоритета переполнена - задача отклонена"""
+
+
+class PriorityExecutor:
+    """
+    Общий пул потоков с классами приоритета
+
+    Свободный поток берёт задачу из самого важного класса, у которого есть
+    очередь и не исчерпан лимит одновременных задач (EXECUTOR_CLASS_LIMITS),
+    поэтому опрос цен не может занять все потоки, пока ждёт сделка.
+    Очереди ограничены: при переполнении future сразу завершается
+    ExecutorQueueFull. Для каждого класса ведутся метрики очереди и
+    времени ожидания.
+    """
+
+    def __init__(self, max_workers: int = EXECUTOR_WORKERS, priorities=EXECUTOR_PRIORITIES,
+                 limits: Dict[str, int] = EXECUTOR_CLASS_LIMITS, queue_sizes: Dict[str, int] = EXECUTOR_QUEUE_SIZES):
+        self.priorities = tuple(priorities)
+        self.limits = {p: limits.get(p, max_workers) for p in self.priorities}
+        self.queue_sizes = {p: queue_sizes.get(p, 1000) for p in self.priorities}
+        self._queues = {p: deque() for p in self.priorities}
+        self._running = {p: 0 for p in self.priorities}
+        self._stats = {p: self._empty_stats() for p in self.priorities}
+        self._cond = threading.Condition()
+        self._shutdown = False
+        self._threads = []
+        for i in range(max_workers):
+            t = threading.Thread(target=self._worker, daemon=True, name=f"executor-{i}")
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, priority: str, func: Callable, *args, **kwargs) -> Future:
+        """Поставить задачу в очередь класса priority"""
+        future = Future()
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            queue = self._queues[priority]
+            stats = self._stats[priority]
+            if len(queue) >= self.queue_sizes[priority]:
+                stats["rejected"] += 1
+                future.set_exception(ExecutorQueueFull(f"{priority} queue is full"))
+                return future
+            queue.append((future, func, args, kwargs, time.monotonic()))
+            stats["submitted"] += 1
+            stats["max_depth"] = max(stats["max_depth"], len(queue))
+            self._cond.notify()
+        return future
+
+    def wait(self, futures: Iterable[Future], timeout: float | None = None):
+        """
+        Дождаться futures
+
+        Задачи, которые ещё стоят в очереди, выполняются прямо в ожидающем
+        потоке - так вложенное ожидание из потока пула не блокирует пул.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for future in futures:
+            entry = self._steal(future)
+            if entry is not None:
+                self._execute(entry)
+                continue
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                future.exception(timeout=remaining)
+            except Exception:
+                # Таймаут/отмена - результат разбирает вызывающий
+                pass
+
+    def get_stats(self) -> Dict[str, dict]:
+        """Метрики по классам: глубина очереди, выполняется, время ожидания"""
+        with self._cond:
+            out = {}
+            for p in self.priorities:
+                s = dict(self._stats[p])
+                s["queued"] = len(self._queues[p])
+                s["running"] = self._running[p]
+                s["wait_avg"] = s["wait_total"] / s["started"] if s["started"] else 0.0
+                out[p] = s
+            return out
+
+    def shutdown(self, wait: bool = False):
+        """Остановить пул; задачи, не начавшие выполнение, отменяются"""
+        with self._cond:
+            self._shutdown = True
+            pending = [entry for p in self.priorities for entry in self._queues[p]]
+            for p in self.priorities:
+                self._queues[p].clear()
+            self._cond.notify_all()
+        for entry in pending:
+            entry[0].cancel()
+        if wait:
+            for t in self._threads:
+                if t is not threading.current_thread():
+                    t.join()
+
+    @staticmethod
+    def _empty_stats():
+        return {
+            "submitted": 0,
+            "started": 0,
+            "completed": 0,
+            "rejected": 0,
+            "errors": 0,
+            "max_depth": 0,
+            "wait_total": 0.0,
+            "wait_max": 0.0,
+        }
+
+    def _next(self):
+        for p in self.priorities:
+            if self._queues[p] and self._running[p] < self.limits[p]:
+                return p, self._queues[p].popleft()
+        return None
+
+    def _steal(self, future: Future):
+        with self._cond:
+            for p in self.priorities:
+                queue = self._queues[p]
+                for entry in queue:
+                    if entry[0] is future:
+                        queue.remove(entry)
+                        self._started(p, entry)
+                        return p, entry
+        return None
+
+    def _started(self, priority, entry):
+        waited = time.monotonic() - entry[4]
+        stats = self._stats[priority]
+        stats["started"] += 1
+        stats["wait_total"] += waited
+        stats["wait_max"] = max(stats["wait_max"], waited)
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while True:
+                    item = self._next()
+                    if item is not None:
+                        break
+                    if self._shutdown:
+                        return
+                    self._cond.wait()
+                priority, entry = item
+                self._running[priority] += 1
+                self._started(priority, entry)
+            try:
+                self._execute(item)
+            finally:
+                with self._cond:
+                    self._running[priority] -= 1
+                    # Освободился лимит класса - задачи этого класса могли ждать
+                    self._cond.notify()
+
+    def _execute(self, item):
+        priority, (future, func, args, kwargs, _) = item
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(func(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+            with self._cond:
+                self._stats[priority]["errors"] += 1
+        finally:
+            with self._cond:
+                self._stats[priority]["completed"] += 1
 
 
 class AsyncExecutor:
-    """Executor для параллельного выполнения задач"""
+    """Параллельное выполнение задач одного класса приоритета на общем пуле"""
 
-    def __init__(self, max_workers: int = 5):
-        self.executor = ThreadPoolExecutor(max_workers=max_workers)
-        self._lock = threading.Lock()
+    def __init__(self, pool: PriorityExecutor, priority: str = PRIORITY_STATE):
+        self.pool = pool
+        self.priority = priority
 
     def submit(self, func: Callable, *args, **kwargs):
         """Отправить задачу на выполнение"""
-        return self.executor.submit(func, *args, **kwargs)
+        return self.pool.submit(self.priority, func, *args, **kwargs)
 
     def map_parallel(self, func: Callable, items: List[Any]) -> List[Any]:
         """
@@ -28,21 +210,23 @@ class AsyncExecutor:
         Returns:
             Список результатов
         """
-        futures = [self.executor.submit(func, item) for item in items]
+        futures = [self.submit(func, item) for item in items]
+        self.pool.wait(futures)
         results = []
-        for future in as_completed(futures):
+        for future in futures:
             try:
-                results.append(future.result())
+                results.append(future.result(timeout=0))
             except Exception:
                 results.append(None)
         return results
 
-    def run_parallel(self, tasks: Dict[str, Callable]) -> Dict[str, Any]:
+    def run_parallel(self, tasks: Dict[str, Callable], timeout: float = 15) -> Dict[str, Any]:
         """
         Выполнить несколько разных задач параллельно
 
         Args:
             tasks: Словарь {название: функция}
+            timeout: Общее время ожидания всех задач
 
         Returns:
             Словарь {название: результат}
@@ -53,32 +237,123 @@ class AsyncExecutor:
         futures = {}
         for name, func in tasks.items():
             try:
-                futures[name] = self.executor.submit(func)
+                futures[name] = self.submit(func)
             except Exception as e:
                 print(f"ERROR submitting task {name}: {e}")
                 futures[name] = None
 
+        self.pool.wait([f for f in futures.values() if f is not None], timeout=timeout)
+
         results = {}
         for name, future in futures.items():
-            if future is None:
+            if future is None or not future.done():
+                # Таймауты не логируем - это нормально
                 results[name] = None
                 continue
             try:
-                # Даем каждой задаче максимум 15 секунд (увеличен с 10)
-                result = future.result(timeout=15)
-                results[name] = result
-            except TimeoutError:
-                # Таймауты не логируем - это нормально
-                results[name] = None
+                results[name] = future.result(timeout=0)
             except Exception as e:
-                error_str = str(e)
-                # Логируем только не-таймаут ошибки
-                if "timed out" not in error_str.lower() and "timeout" not in error_str.lower():
+                # Логируем только не временные ошибки (resilience импортирует этот модуль)
+                from utils.resilience import is_quiet
+                if not is_quiet(e):
                     print(f"ERROR executing task {name}: {e}")
                 results[name] = None
 
         return results
 
     def shutdown(self):
-        """Завершить executor"""
-        self.executor.shutdown(wait=False)
\ No newline at end of file
+        """Пул общий - его останавливает владелец (App)"""
+        pass
+
+
+class KeyedExecutor:
+    """
+    Executor с очередью на каждый ключ
+
+    Задачи с разными ключами выполняются параллельно, задачи с одним
+    ключом - строго в порядке отправки. Пока очередь ключа не пуста,
+    её обрабатывает один рабочий поток. С executor очереди разбираются
+    потоками общего пула в классе priority. Задачи, не начавшие
+    выполнение к остановке (shutdown или остановка пула), отменяются -
+    их future завершаются CancelledError, а не зависают.
+    """
+
+    def __init__(self, max_workers: int = 5, executor: PriorityExecutor | None = None,
+                 priority: str = PRIORITY_TRADE):
+        self.pool = executor
+        self.priority = priority
+        self.executor = ThreadPoolExecutor(max_workers=max_workers) if executor is None else None
+        self._queues: Dict[Hashable, deque] = {}
+        self._lock = threading.Lock()
+        self._shutdown = False
+
+    def submit(self, key: Hashable, func: Callable, *args, **kwargs) -> Future:
+        """Отправить задачу в очередь ключа"""
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                future.cancel()
+                return future
+            queue = self._queues.get(key)
+            start = queue is None
+            if start:
+                queue = deque()
+                self._queues[key] = queue
+            queue.append((future, func, args, kwargs))
+        if start:
+            try:
+                if self.pool is not None:
+                    drain = self.pool.submit(self.priority, self._drain, key)
+                else:
+                    drain = self.executor.submit(self._drain, key)
+                drain.add_done_callback(lambda f, k=key: self._drain_done(k, f))
+            except RuntimeError as e:
+                # Пул уже остановлен
+                self._abort(key, e)
+        return future
+
+    def _drain_done(self, key: Hashable, drain: Future):
+        """Разбор очереди не запустился (отменён при остановке, очередь пула полна)"""
+        if drain.cancelled():
+            self._abort(key)
+        elif drain.exception() is not None:
+            self._abort(key, drain.exception())
+
+    def _abort(self, key: Hashable, error: BaseException | None = None):
+        """Очередь ключа не удалось запустить - отменить её задачи или завершить ошибкой"""
+        with self._lock:
+            queue = self._queues.pop(key, deque())
+        for future, _, _, _ in queue:
+            if error is None:
+                future.cancel()
+            elif future.set_running_or_notify_cancel():
+                future.set_exception(error)
+
+    def _drain(self, key: Hashable):
+        while True:
+            with self._lock:
+                queue = self._queues[key]
+                if not queue:
+                    del self._queues[key]
+                    return
+                future, func, args, kwargs = queue.popleft()
+
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def shutdown(self):
+        """Завершить executor; задачи, не начавшие выполнение, отменяются"""
+        with self._lock:
+            self._shutdown = True
+            pending = [entry for queue in self._queues.values() for entry in queue]
+            # Очереди пустеют - работающий _drain завершится после текущей задачи
+            for queue in self._queues.values():
+                queue.clear()
+        for future, _, _, _ in pending:
+            future.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
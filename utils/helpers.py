@@ -1,4 +1,5 @@
 from time import time
+import hashlib
 import math
 
 
@@ -45,3 +46,15 @@ def calculate_pnl_percent(entry: float, current: float, side: str) -> float:
 
 def timestamp_ms() -> int:
     return int(time() * 1000)
+
+
+def order_link_id(uid: str, command_id, leg: int = 0) -> str:
+    """
+    Детерминированный orderLinkId ордера команды мастера
+
+    Один и тот же (терминал, команда, нога) всегда даёт один и тот же id,
+    поэтому повторная отправка не создаёт второй ордер. Bybit: до 36
+    символов, буквы/цифры/"-"/"_".
+    """
+    prefix = hashlib.sha1((uid or "").encode("utf-8")).hexdigest()[:12]
+    return f"mt{prefix}-{command_id}-{leg}"
@@ -0,0 +1,175 @@
+"""
+Учёт лимитов запросов Bybit по группам эндпоинтов
+"""
+from typing import Dict
+import threading
+import time
+from config import BYBIT_RATE_LIMITS, BYBIT_RATE_RESERVE, BYBIT_RATE_DEFER
+from utils.async_executor import PRIORITY_TRADE
+
+# Метод pybit -> группа лимита
+METHOD_GROUPS = {
+    "place_order": "order",
+    "place_batch_order": "order",
+    "amend_order": "order",
+    "cancel_order": "order",
+    "cancel_all_orders": "order",
+    "get_open_orders": "order_query",
+    "get_order_history": "order_query",
+    "get_executions": "order_query",
+    "get_positions": "position",
+    "get_wallet_balance": "account",
+    "get_api_key_information": "account",
+    "get_tickers": "market",
+    "get_server_time": "market",
+}
+
+# Префикс пути REST -> группа лимита (для заголовков ответа)
+PATH_GROUPS = (
+    ("/v5/order/realtime", "order_query"),
+    ("/v5/order/history", "order_query"),
+    ("/v5/execution", "order_query"),
+    ("/v5/order/", "order"),
+    ("/v5/position", "position"),
+    ("/v5/account", "account"),
+    ("/v5/user", "account"),
+    ("/v5/market", "market"),
+)
+
+
+class RateLimitShed(RuntimeError):
+    """Низкоприоритетный запрос отброшен: лимит группы бережётся для торговли"""
+
+
+class _Bucket:
+    def __init__(self, rate: float):
+        self.rate = float(rate)
+        self.capacity = float(rate)
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+        # Данные из заголовков X-Bapi-Limit*
+        self.limit = None
+        self.remaining = None
+        self.reset_at = 0.0
+        self.stats = {"acquired": 0, "deferred": 0, "shed": 0, "exhausted": 0}
+
+    def refill(self, now: float):
+        if now < self.reset_at:
+            # Биржа сообщила, что лимит исчерпан до reset
+            self.updated = now
+            return
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class RateGovernor:
+    """
+    Токен-бакеты на группы эндпоинтов одного аккаунта Bybit
+
+    Перед запросом берётся токен группы. Торговые вызовы (PRIORITY_TRADE)
+    ждут токен, остальные могут брать его, только пока в бакете остаётся
+    больше резерва BYBIT_RATE_RESERVE; иначе ждут не дольше BYBIT_RATE_DEFER
+    и отбрасываются RateLimitShed. Заголовки X-Bapi-Limit-Status /
+    X-Bapi-Limit / X-Bapi-Limit-Reset-Timestamp из ответов уточняют бакет:
+    биржа знает о запросах, которых не видел этот процесс.
+    """
+
+    def __init__(self, limits: Dict[str, float] = BYBIT_RATE_LIMITS, reserve: float = BYBIT_RATE_RESERVE,
+                 defer: float = BYBIT_RATE_DEFER):
+        self.reserve = reserve
+        self.defer = defer
+        self._buckets = {group: _Bucket(rate) for group, rate in limits.items()}
+        self._cond = threading.Condition()
+
+    @staticmethod
+    def group_for_path(path: str) -> str | None:
+        for prefix, group in PATH_GROUPS:
+            if path.startswith(prefix):
+                return group
+        return None
+
+    def acquire(self, group: str | None, priority: str, timeout: float | None = None):
+        """Взять токен группы; RateLimitShed если запрос надо отбросить"""
+        bucket = self._buckets.get(group)
+        if bucket is None:
+            return
+        trade = priority == PRIORITY_TRADE
+        floor = 1.0 if trade else 1.0 + bucket.capacity * self.reserve
+        wait_limit = timeout if timeout is not None else (None if trade else self.defer)
+        deadline = None if wait_limit is None else time.monotonic() + wait_limit
+        waited = False
+
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                bucket.refill(now)
+                if bucket.tokens >= floor:
+                    bucket.tokens -= 1.0
+                    bucket.stats["acquired"] += 1
+                    if waited:
+                        bucket.stats["deferred"] += 1
+                    return
+                if now >= bucket.reset_at:
+                    delay = (floor - bucket.tokens) / bucket.rate
+                else:
+                    delay = bucket.reset_at - now
+                if deadline is not None and now + delay > deadline:
+                    bucket.stats["shed"] += 1
+                    raise RateLimitShed(f"{group} rate limit headroom exhausted")
+                waited = True
+                self._cond.wait(delay)
+
+    def observe(self, response, *args, **kwargs):
+        """Хук requests: учесть заголовки лимита из ответа"""
+        try:
+            headers = response.headers
+            status = headers.get("X-Bapi-Limit-Status")
+            if status is None:
+                return
+            group = self.group_for_path(response.request.path_url)
+            bucket = self._buckets.get(group)
+            if bucket is None:
+                return
+            remaining = int(status)
+            limit = headers.get("X-Bapi-Limit")
+            reset_ms = headers.get("X-Bapi-Limit-Reset-Timestamp")
+        except (AttributeError, TypeError, ValueError):
+            return
+
+        with self._cond:
+            now = time.monotonic()
+            bucket.refill(now)
+            bucket.remaining = remaining
+            if limit:
+                bucket.limit = int(limit)
+            # Свой бакет не должен быть щедрее биржи
+            bucket.tokens = min(bucket.tokens, float(remaining))
+            if remaining <= 0 and reset_ms:
+                # Время reset - по часам биржи; переводим в monotonic через разницу с локальными
+                bucket.reset_at = now + max(0.0, int(reset_ms) / 1000.0 - time.time())
+                bucket.tokens = 0.0
+                bucket.stats["exhausted"] += 1
+            self._cond.notify_all()
+
+    def attach(self, session):
+        """Подписаться на ответы HTTP-сессии pybit"""
+        client = getattr(session, "client", None)
+        if client is not None and self.observe not in client.hooks["response"]:
+            client.hooks["response"].append(self.observe)
+
+    def headroom(self) -> Dict[str, dict]:
+        """Текущий запас по группам"""
+        with self._cond:
+            now = time.monotonic()
+            out = {}
+            for group, bucket in self._buckets.items():
+                bucket.refill(now)
+                out[group] = dict(
+                    bucket.stats,
+                    tokens=round(bucket.tokens, 2),
+                    capacity=bucket.capacity,
+                    remaining=bucket.remaining,
+                    limit=bucket.limit,
+                    blocked_for=round(max(0.0, bucket.reset_at - now), 3),
+                )
+            return out
@@ -0,0 +1,213 @@
+"""
+Классификация ошибок биржи, повторы с backoff и circuit breaker
+"""
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Dict
+import random
+import threading
+import time
+import requests
+from config import (
+    RETRY_ATTEMPTS,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_DELAY,
+    RETRY_DEADLINE,
+    BREAKER_FAILURES,
+    BREAKER_RESET_TIMEOUT,
+)
+from utils.rate_limit import RateLimitShed
+
+# retCode Bybit по классам
+RATE_LIMIT_CODES = {10006, 10018, 10429}
+AUTH_CODES = {10003, 10004, 10005, 10007, 10009, 10010, 33004}
+# Запрос не исполнен, повтор имеет смысл (10002 - timestamp/recv_window)
+TRANSIENT_CODES = {10002}
+# Ошибка на стороне биржи: ордер мог быть как принят, так и нет
+SERVER_CODES = {10000, 10016, 10019}
+
+
+class ExchangeError(RuntimeError):
+    """Ошибка запроса к бирже; code - retCode Bybit или HTTP-статус"""
+
+    def __init__(self, message: str, code: int | None = None):
+        super().__init__(message)
+        self.code = code
+
+
+class TransientError(ExchangeError):
+    """Временная ошибка сети/биржи - запрос можно повторить"""
+
+
+class RateLimitedError(TransientError):
+    """Превышен лимит запросов"""
+
+
+class AuthError(ExchangeError):
+    """Ключи, подпись или права доступа"""
+
+
+class InvalidRequestError(ExchangeError):
+    """Биржа отклонила запрос - повтор не поможет"""
+
+
+class AmbiguousOrderError(TransientError):
+    """Торговый запрос оборвался: неизвестно, принят ли ордер"""
+
+
+class CircuitOpenError(ExchangeError):
+    """Эндпоинт временно отключён circuit breaker - запрос не отправлялся"""
+
+
+def classify(exc: BaseException, order: bool = False) -> ExchangeError:
+    """
+    Привести исключение pybit/requests к классу ExchangeError
+
+    order=True - торговый запрос: обрыв после отправки означает
+    неизвестный исход (AmbiguousOrderError), а не просто повтор.
+    """
+    if isinstance(exc, ExchangeError):
+        return exc
+    if isinstance(exc, RateLimitShed):
+        return RateLimitedError(str(exc))
+
+    from pybit.exceptions import InvalidRequestError as PybitInvalidRequest, FailedRequestError
+    ambiguous = AmbiguousOrderError if order else TransientError
+    message = str(exc)
+
+    if isinstance(exc, PybitInvalidRequest):
+        code = _int(exc.status_code)
+        if code in RATE_LIMIT_CODES:
+            return RateLimitedError(message, code)
+        if code in AUTH_CODES:
+            return AuthError(message, code)
+        if code in TRANSIENT_CODES:
+            return TransientError(message, code)
+        if code in SERVER_CODES:
+            return ambiguous(message, code)
+        return InvalidRequestError(message, code)
+
+    if isinstance(exc, FailedRequestError):
+        code = _int(exc.status_code)
+        if code == 403 or code == 429:
+            return RateLimitedError(message, code)
+        if code == 401:
+            return AuthError(message, code)
+        if code is not None and 400 < code < 500:
+            return InvalidRequestError(message, code)
+        # 5xx и "Retries exceeded" (pybit ставит 400)
+        return ambiguous(message, code)
+
+    if isinstance(exc, requests.exceptions.ConnectTimeout):
+        # Соединение не установлено - запрос точно не дошёл
+        return TransientError(message)
+    if isinstance(exc, (requests.exceptions.RequestException, FutureTimeoutError, TimeoutError, ConnectionError)):
+        return ambiguous(message)
+    return InvalidRequestError(message)
+
+
+def is_quiet(exc: BaseException) -> bool:
+    """Ожидаемая при нестабильной сети ошибка - не стоит логировать как ошибку"""
+    return isinstance(classify(exc), (TransientError, CircuitOpenError))
+
+
+def backoff_delay(attempt: int, base: float = RETRY_BASE_DELAY, cap: float = RETRY_MAX_DELAY) -> float:
+    """Задержка перед повтором attempt (с 1): экспонента с полным джиттером"""
+    return random.uniform(0, min(cap, base * (2 ** (attempt - 1))))
+
+
+def retry_call(func: Callable, *args, attempts: int = RETRY_ATTEMPTS, deadline: float = RETRY_DEADLINE,
+               retry_on=(TransientError,), **kwargs):
+    """
+    Вызвать func, повторяя при ошибках retry_on
+
+    Повторы прекращаются по числу попыток или когда следующая задержка
+    вышла бы за deadline (секунд от первого вызова). Наружу выходит
+    классифицированная последняя ошибка.
+    """
+    end = time.monotonic() + deadline
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            err = classify(e)
+            delay = backoff_delay(attempt)
+            # Неясный исход ордера повтором не решается - его разбирает вызывающий
+            if (not isinstance(err, retry_on) or isinstance(err, AmbiguousOrderError)
+                    or attempt >= attempts or time.monotonic() + delay >= end):
+                if err is e:
+                    raise
+                raise err from e
+            time.sleep(delay)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker эндпоинта
+
+    После BREAKER_FAILURES временных ошибок подряд запросы не отправляются
+    (CircuitOpenError) BREAKER_RESET_TIMEOUT секунд; затем пропускается один
+    пробный запрос: успех закрывает цепь, ошибка снова открывает.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failures: int = BREAKER_FAILURES, reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failures
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe = False
+        self._lock = threading.Lock()
+        self.stats = {"failures": 0, "opened": 0, "rejected": 0}
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probe = False
+            if self.state == self.HALF_OPEN and not self._probe:
+                self._probe = True
+                return True
+            self.stats["rejected"] += 1
+            return False
+
+    def check(self):
+        """CircuitOpenError, если запрос отправлять нельзя"""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+            self._probe = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self.stats["failures"] += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.stats["opened"] += 1
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe = False
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return dict(self.stats, state=self.state, consecutive=self._failures)
+
+
+def _int(value) -> int | None:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None